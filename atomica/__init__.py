@@ -84,6 +84,7 @@ warnings.filterwarnings(action="ignore", category=UserWarning, module=".*openpyx
 
 
 # The Atomica user interface -- import from submodules
+from .cache import *
 from .calibration import *
 from .cascade import *
 from .data import *
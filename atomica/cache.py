@@ -0,0 +1,292 @@
+"""
+Cache simulation results and parsed workbooks
+
+This module implements :class:`ResultCache`, which stores the outputs of
+simulations keyed by the content of their inputs. When the same inputs are
+simulated again, the stored :class:`Result` is returned instead of re-running
+the model.
+
+It also implements an optional on-disk cache for parsed Excel workbooks (see
+:func:`set_workbook_cache`) so that unchanged frameworks do not need to be
+read and validated every time they are loaded.
+
+"""
+
+import os
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+
+import sciris as sc
+from .system import logger
+from .utils import content_hash
+from .version import version
+
+__all__ = ["ResultCache", "set_workbook_cache"]
+
+# Folder for cached workbooks, or None if the workbook cache is disabled. This is stored in an environment
+# variable so that worker processes (which may not inherit module state) use the same cache
+_workbook_cache_path = Path(os.environ["ATOMICA_WORKBOOK_CACHE"]) if os.environ.get("ATOMICA_WORKBOOK_CACHE") else None
+
+
+def set_workbook_cache(path=None) -> None:
+    """
+    Enable or disable the workbook cache
+
+    Reading a large framework requires parsing every sheet with ``openpyxl`` and then validating
+    the framework, which can take several seconds. If the workbook cache is enabled, the parsed
+    content is stored in the specified folder keyed by a hash of the workbook contents (and the
+    Atomica version), and subsequent loads of the same file are restored directly from the cache.
+    The cache folder is also recorded in the ``ATOMICA_WORKBOOK_CACHE`` environment variable, so
+    worker processes started after this function is called will use the same cache. Setting that
+    environment variable before importing Atomica is equivalent to calling this function.
+
+    Example usage:
+
+    >>> at.set_workbook_cache('./atomica_cache')
+    >>> F = at.ProjectFramework('framework.xlsx') # Parses and validates the workbook
+    >>> F = at.ProjectFramework('framework.xlsx') # Restored from the cache
+
+    :param path: Folder to store cached workbooks. Set to ``None`` to disable the cache
+
+    """
+
+    global _workbook_cache_path
+    if path is None:
+        _workbook_cache_path = None
+        os.environ.pop("ATOMICA_WORKBOOK_CACHE", None)
+    else:
+        _workbook_cache_path = Path(path)
+        _workbook_cache_path.mkdir(parents=True, exist_ok=True)
+        os.environ["ATOMICA_WORKBOOK_CACHE"] = str(_workbook_cache_path)
+
+
+def _workbook_key(kind: str, spreadsheet, *objs) -> str:
+    """
+    Return the cache key for a workbook
+
+    :param kind: The type of workbook e.g., 'framework'
+    :param spreadsheet: A ``sc.Spreadsheet`` instance
+    :param objs: Any other inputs that affect the parsed output
+    :return: A string digest, or ``None`` if the workbook cache is disabled
+
+    """
+
+    if _workbook_cache_path is None:
+        return None
+    return content_hash(kind, version, spreadsheet.blob, *objs)
+
+
+def _workbook_cache_get(key: str):
+    """
+    Load a cached workbook
+
+    :param key: Cache key returned by :func:`_workbook_key`
+    :return: The stored object, or ``None`` if not present
+
+    """
+
+    if key is None:
+        return None
+    fname = _workbook_cache_path / f"{key}.pkl"
+    if not fname.exists():
+        return None
+    try:
+        with open(fname, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        logger.warning('Could not load cached workbook "%s" - %s', fname, e)
+        return None
+
+
+def _workbook_cache_put(key: str, obj) -> None:
+    """
+    Store a parsed workbook
+
+    The file is written under a temporary name and then renamed, so that other processes
+    reading the cache never see a partially written file.
+
+    :param key: Cache key returned by :func:`_workbook_key`
+    :param obj: The object to store
+
+    """
+
+    if key is None:
+        return
+    fname = _workbook_cache_path / f"{key}.pkl"
+    tmp = fname.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, fname)
+
+
+def _shallow_copy(result):
+    # Return a new Result sharing the same Model. This is much faster than a deepcopy, and
+    # avoids ``copy.copy()`` because ``Result.__setstate__`` would share the instance ``__dict__``
+    new = result.__class__.__new__(result.__class__)
+    new.__dict__ = dict(result.__dict__)
+    return new
+
+
+class ResultCache:
+    """
+    Store results keyed by the content of the simulation inputs
+
+    A :class:`ResultCache` is an opt-in store that can be passed to :meth:`Project.run_sim`. The
+    cache key is a content hash of the :class:`ProjectSettings`, :class:`ProjectFramework`,
+    :class:`ParameterSet`, :class:`ProgramSet` and :class:`ProgramInstructions`, so modifying any
+    of the inputs (e.g., changing a y-factor) results in a cache miss, while running an identical
+    simulation returns immediately.
+
+    Results are kept in memory, with the least recently used results discarded once
+    ``max_size`` results are stored. If a ``path`` is provided, results are also written to that
+    folder, so they persist across sessions and can be shared between processes.
+
+    Cached results share their underlying :class:`Model` with the cache. The returned ``Result``
+    can be renamed or stored in a project, but its model should be treated as read-only.
+
+    Example usage:
+
+    >>> cache = at.ResultCache(max_size=10)
+    >>> res = P.run_sim(cache=cache) # Runs the model
+    >>> res = P.run_sim(cache=cache) # Returns immediately
+    >>> cache.stats
+
+    :param max_size: Maximum number of results to keep in memory
+    :param path: Optionally specify a folder to store cached results on disk
+
+    """
+
+    def __init__(self, max_size: int = 32, path=None):
+        assert max_size > 0, "Cache size must be at least 1"
+        self.max_size = max_size  #: Maximum number of results to store in memory
+        self.path = Path(path) if path is not None else None  #: Optional folder for on-disk storage
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+        self._results = OrderedDict()  # Results in order of use, with the most recently used at the end
+        self.hits = 0  #: Number of lookups returning a stored result
+        self.misses = 0  #: Number of lookups that required running the model
+        self.disk_hits = 0  #: Number of hits that were loaded from disk
+
+    def __repr__(self):
+        return sc.prepr(self)
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._results or (self.path is not None and self._fname(key).exists())
+
+    @staticmethod
+    def key(settings, framework, parset, progset=None, instructions=None, record=None) -> str:
+        """
+        Return the cache key for a set of simulation inputs
+
+        Programs are only used if both the progset and instructions are provided, so the progset
+        does not contribute to the key if there are no instructions.
+
+        :param settings: A :class:`ProjectSettings` instance
+        :param framework: A :class:`ProjectFramework` instance
+        :param parset: A :class:`ParameterSet` instance
+        :param progset: Optionally a :class:`ProgramSet` instance
+        :param instructions: Optionally a :class:`ProgramInstructions` instance
+        :param record: Optionally a :class:`RecordSpec` instance
+        :return: A string digest
+
+        """
+
+        if instructions is None:
+            progset = None
+        # The names are included because they are recorded in the Result
+        inputs = [settings, framework, parset.name, parset, progset.name if progset is not None else None, progset, instructions]
+        if record is not None:
+            inputs.append(record)
+        return content_hash(*inputs)
+
+    @property
+    def stats(self) -> dict:
+        """
+        Return cache metrics
+
+        :return: A dict with the number of hits, misses, disk hits, hit rate, and stored results
+
+        """
+
+        n = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits, "hit_rate": self.hits / n if n else 0.0, "size": len(self)}
+
+    def _fname(self, key: str) -> Path:
+        return self.path / f"{key}.res"
+
+    def get(self, key: str, name: str = None):
+        """
+        Retrieve a result
+
+        :param key: The cache key, as returned by :meth:`ResultCache.key`
+        :param name: Optionally set the name of the returned result
+        :return: A new :class:`Result` sharing the cached model, or ``None`` if the key is not present
+
+        """
+
+        if key in self._results:
+            self._results.move_to_end(key)
+            result = self._results[key]
+        elif self.path is not None and self._fname(key).exists():
+            try:
+                result = sc.loadobj(self._fname(key))
+            except Exception as e:
+                logger.warning('Could not load cached result "%s" - %s', self._fname(key), e)
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, result)
+        else:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        result = _shallow_copy(result)
+        result.uid = sc.uuid()
+        if name is not None:
+            result.name = name
+        return result
+
+    def put(self, key: str, result) -> None:
+        """
+        Add a result to the cache
+
+        :param key: The cache key, as returned by :meth:`ResultCache.key`
+        :param result: A :class:`Result` instance
+
+        """
+
+        self._store(key, _shallow_copy(result))
+        if self.path is not None:
+            # Write under a temporary name and then rename, so that a crash or a concurrent
+            # reader never sees a partially written entry
+            fname = self._fname(key)
+            tmp = fname.with_suffix(f".{os.getpid()}.tmp")
+            sc.saveobj(tmp, result)
+            os.replace(tmp, fname)
+
+    def _store(self, key: str, result) -> None:
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+
+    def clear(self, disk: bool = False) -> None:
+        """
+        Remove all stored results and reset metrics
+
+        :param disk: If True, also remove any results stored on disk
+
+        """
+
+        self._results.clear()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        if disk and self.path is not None:
+            for fname in self.path.glob("*.res"):
+                fname.unlink()
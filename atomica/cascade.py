@@ -50,7 +50,7 @@ cascades. There are two types of value retrieval:
 
 """
 
-from .plotting import plot_legend
+from .plotting import plot_legend, _interpolate_rows, _expand_dict
 import matplotlib.pyplot as plt
 import numpy as np
 import textwrap
@@ -528,9 +528,15 @@ def plot_multi_cascade(results=None, cascade=None, pops=None, year=None, data=No
 
     # Gather all of the cascade outputs and years
     cascade_vals = sc.odict()
-    for result in results:
-        for t in year:
-            cascade_vals[label_fcn(result, t)] = get_cascade_vals(result, cascade, pops=pops, year=t)[0]
+    stage_vals = _evaluate_cascade(results, cascade_dict, pops, year)
+    for i, result in enumerate(results):
+        if stage_vals is None:
+            vals = get_cascade_vals(result, cascade_dict, pops=pops, year=year)[0]
+            vals = np.array(list(vals.values()))
+        else:
+            vals = stage_vals[i][1][0]
+        for j, t in enumerate(year):
+            cascade_vals[label_fcn(result, t)] = sc.odict(zip(cascade_dict.keys(), vals[:, [j]]))
 
     # Determine the number of bars, per stage - based either on result or time point
     n_bars = len(cascade_vals)
@@ -612,6 +618,12 @@ def get_cascade_vals(result, cascade, pops=None, year=None) -> tuple:
     _, cascade_dict, pop_type = sanitize_cascade(result.framework, cascade)
     pops = sanitize_pops(pops, result, pop_type)  # Get list representation since we don't care about the name of the aggregated pop
 
+    stage_vals = _evaluate_cascade([result], cascade_dict, pops, year)
+    if stage_vals is not None:
+        _, vals, t = stage_vals[0]
+        assert len(vals) == 1, "get_cascade_vals() cannot get results for multiple populations or population aggregations, only a single pop or single aggregation"
+        return sc.odict(zip(cascade_dict.keys(), vals[0])), t
+
     if year is None:
         d = PlotData(result, outputs=cascade_dict, pops=pops)
     else:
@@ -796,10 +808,13 @@ class CascadeEnsemble(Ensemble):
     :param years: Optionally interpolate results onto these years, to reduce storage requirements
     :param baseline_results: Optionally store baseline result obtained without uncertainty
     :param pops: A population aggregation dict. Can evaluate to more than one aggregated population
+    :param streaming: If True, accumulate summary statistics instead of storing samples (see :class:`Ensemble`)
+    :param compression: Number of centroids retained in each quantile sketch for streaming Ensembles
+    :param path: Optionally specify a folder to store the samples on disk (see :class:`Ensemble`)
 
     """
 
-    def __init__(self, framework, cascade, years=None, baseline_results=None, pops=None):
+    def __init__(self, framework, cascade, years=None, baseline_results=None, pops=None, streaming: bool = False, compression: int = 100, path=None):
 
         if years is not None:
             years = sc.promotetoarray(years)
@@ -817,7 +832,7 @@ class CascadeEnsemble(Ensemble):
 
         # Perform normal Ensemble initialization using the cascade mapping function defined above
         # (with the closure for the requested cascade, pops, and years)
-        super().__init__(name=cascade_name, mapping_function=mapfun, baseline_results=baseline_results)
+        super().__init__(name=cascade_name, mapping_function=mapfun, baseline_results=baseline_results, streaming=streaming, compression=compression, path=path)
 
     def get_vals(self, pop=None, years=None) -> tuple:
         """
@@ -858,7 +873,6 @@ class CascadeEnsemble(Ensemble):
 
         vals = sc.odict()
         uncertainty = sc.odict()
-        series_lookup = self._get_series()
 
         for result in self.results:
 
@@ -867,14 +881,13 @@ class CascadeEnsemble(Ensemble):
 
             for stage in self.outputs:
 
-                stage_vals = [x.vals[years_idx] for x in series_lookup[result, pop, stage]]
-                uncertainty[result][stage] = np.vstack(stage_vals).std(axis=0)
+                uncertainty[result][stage] = self._get_stat(result, pop, stage, "std")[years_idx]
 
                 # Populate the baseline values
                 if self.baseline:
                     vals[result][stage] = self.baseline[result, pop, stage].vals[years_idx]
                 else:
-                    vals[result][stage] = np.mean(stage_vals, axis=0)
+                    vals[result][stage] = self._get_stat(result, pop, stage, "mean")[years_idx]
 
         return (vals, uncertainty, self.tvec[years_idx].copy())
 
@@ -922,7 +935,6 @@ class CascadeEnsemble(Ensemble):
         # A bar group is for a single year-result combination but contains multiple outputs
         n_colors = len(years) * len(self.results)  # Offset to apply to each bar
         n_stages = len(self.outputs)  # Number of stages being plotted
-        series_lookup = self._get_series()
 
         w = 1  # bar width
         g1 = 0.1  # gap between bars
@@ -939,18 +951,15 @@ class CascadeEnsemble(Ensemble):
                 # Assemble the results for the bar group to render
                 # This is an array with an entry for every bar
                 # The outputs are ordered as the dict is ordered so can use them directly
-                stage_vals = []
-                for output in self.outputs:
-                    stage_vals.append(np.array([x.vals[year_idx] for x in series_lookup[result, pop, output]]))
-                stage_vals = np.vstack(stage_vals).T
+                stage_errors = np.array([self._get_stat(result, pop, x, "std")[year_idx] for x in self.outputs])
 
                 if self.baseline:
                     baseline_vals = np.array([self.baseline[result, pop, x].vals[year_idx] for x in self.outputs])
                 else:
-                    baseline_vals = np.mean(stage_vals, axis=0)
+                    baseline_vals = np.array([self._get_stat(result, pop, x, "mean")[year_idx] for x in self.outputs])
 
                 label = "%s - %g" % (result, year)
-                ax.bar(base_positions + n_rendered * (w + g1), baseline_vals, yerr=np.std(stage_vals, axis=0), capsize=10, label=label, width=w)
+                ax.bar(base_positions + n_rendered * (w + g1), baseline_vals, yerr=stage_errors, capsize=10, label=label, width=w)
                 n_rendered += 1
 
         ax.legend()
@@ -963,9 +972,146 @@ def _cascade_ensemble_mapping(results, cascade_dict, years, pops):
     # This mapping function returns PlotData for the cascade
     # It's a closure containing the cascade, years, and pops requested
     # It's a separate function so it can be pickled and parallelized
-    from .plotting import PlotData
+    from .plotting import PlotData, Series
 
-    d = PlotData(results, outputs=cascade_dict, pops=pops)
-    if years is not None:
-        d.interpolate(years)
+    if isinstance(results, sc.odict):
+        results = [result for _, result in results.items()]
+    elif not isinstance(results, list):
+        results = [results]
+
+    stage_vals = _evaluate_cascade(results, cascade_dict, pops, years)
+    if stage_vals is None:
+        d = PlotData(results, outputs=cascade_dict, pops=pops)
+        if years is not None:
+            d.interpolate(years)
+        return d
+
+    # Assemble the PlotData directly from the stage values
+    d = PlotData.__new__(PlotData)
+    d.series = []
+    d.results = sc.odict()
+    d.pops = sc.odict()
+    for result, (pop_names, vals, t) in zip(results, stage_vals):
+        d.results[result.name] = result.name
+        for pop_name, pop_vals in zip(pop_names, vals):
+            d.pops[pop_name] = pop_name
+            for stage, series_vals in zip(cascade_dict.keys(), pop_vals):
+                d.series.append(Series(t, series_vals, result.name, pop_name, stage, "", units="Number of people", timescale=None, data_pop=pop_name))
+    d.outputs = sc.odict({stage: stage for stage in cascade_dict.keys()})
     return d
+
+
+def _expand_cascade(pop, cascade_dict) -> list:
+    """
+    Expand cascade stages into compartments
+
+    Characteristics are recursively replaced by the compartments they include, in the same way as
+    :meth:`ProjectFramework.get_charac_includes`. A compartment that is included more than once in a stage
+    (e.g. via two characteristics) appears once for each inclusion, consistent with summing the characteristic
+    values.
+
+    :param pop: A model :class:`Population`
+    :param cascade_dict: A cascade dict mapping stage names to lists of compartments/characteristics
+    :return: A list with the compartment names for each stage. Returns ``None`` if any stage cannot be computed
+             by summing compartments - for example, if it contains a characteristic with a denominator
+
+    """
+
+    def expand(name):
+        if name in pop.comp_lookup:
+            return [name]
+        charac = pop.charac_lookup.get(name)
+        if charac is None or charac.denominator is not None:
+            return None
+        comps = []
+        for include in charac.includes:
+            expanded = expand(include.name)
+            if expanded is None:
+                return None
+            comps += expanded
+        return comps
+
+    stages = []
+    for includes in cascade_dict.values():
+        if not isinstance(includes, list):
+            return None
+        stage = []
+        for name in includes:
+            expanded = expand(name) if sc.isstring(name) else None
+            if expanded is None:
+                return None
+            stage += expanded
+        stages.append(stage)
+    return stages
+
+
+def _evaluate_cascade(results: list, cascade_dict, pops, years=None):
+    """
+    Compute cascade stage values for multiple results
+
+    This function computes the same values as constructing a :class:`PlotData` with the cascade stages as
+    outputs, but does so directly from the compartment values. Each stage is a sum of compartments, so the
+    stages for every population group are computed without any intermediate ``Series``, and are then
+    interpolated onto all of the requested years at once.
+
+    :param results: A list of :class:`Result` instances
+    :param cascade_dict: A cascade dict mapping stage names to lists of compartments/characteristics
+    :param pops: A population specification supported by :class:`PlotData`
+    :param years: Optionally interpolate the values onto these years
+    :return: A list with a tuple ``(pop_names, vals, t)`` for each result, where ``vals`` is an array with
+             shape ``(len(pop_names), n_stages, len(t))``. Returns ``None`` if the values cannot be computed
+             directly, in which case :class:`PlotData` should be used instead
+
+    """
+
+    if years is not None:
+        years = sc.promotetoarray(years)
+
+    expansions = dict()  # Populations of the same type in the same framework contain the same compartments, so only expand the cascade once for each
+    out = []
+    for result in results:
+        model = result.model
+        if pops in [None, "all"]:
+            pop_groups = [(pop.name, [pop.name]) for pop in model.pops]
+        elif pops == "total":
+            pop_groups = [("Total", [pop.name for pop in model.pops])]
+        else:
+            pop_groups = []
+            for pop in _expand_dict(sc.promotetolist(pops)):
+                if isinstance(pop, dict):
+                    pop_name = list(pop.keys())[0]
+                    pop_groups.append((pop_name, sc.promotetolist(pop[pop_name])))
+                else:
+                    pop_groups.append((pop, [pop]))
+
+        # Sum the compartment values in each stage over each population group
+        vals = np.zeros((len(pop_groups), len(cascade_dict), len(result.t)))
+        for i, (_, pop_names) in enumerate(pop_groups):
+            for pop_name in pop_names:
+                try:
+                    pop = model.get_pop(pop_name)
+                except KeyError:
+                    return None
+                key = (id(result.framework), pop.type)
+                if key not in expansions:
+                    expansions[key] = _expand_cascade(pop, cascade_dict)
+                stages = expansions[key]
+                if stages is None:
+                    return None
+                comp_vals = {comp: pop.comp_lookup[comp].vals for comp in set(sum(stages, []))}
+                if any(x is None for x in comp_vals.values()):
+                    return None
+                for j, stage in enumerate(stages):
+                    for comp in stage:
+                        vals[i, j] += comp_vals[comp]
+
+        if years is None:
+            t = np.array(result.t, dtype=float)
+        else:
+            out_of_bounds = (years < result.t[0]) | (years > result.t[-1])
+            if np.any(out_of_bounds):
+                logger.warning("Series have values from %.2f to %.2f so requested time points %s are out of bounds", result.t[0], result.t[-1], years[out_of_bounds])
+            vals = _interpolate_rows(years, result.t, vals.reshape(-1, len(result.t))).reshape(len(pop_groups), len(cascade_dict), -1)
+            t = np.array(years, dtype=float)
+        out.append(([x[0] for x in pop_groups], vals, t))
+    return out
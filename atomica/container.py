@@ -0,0 +1,489 @@
+"""
+Store projects in a container file
+
+A project container is a zip file in which the components of a :class:`Project`
+are stored separately from the simulation results. The container holds
+
+- ``manifest.json`` - metadata describing the project, the results it contains, and the components they use
+- ``projects/<hash>.pkl`` - the project with its scenarios, optimizations and settings, but without any
+  result data, and with references to the components below
+- ``components/<hash>.pkl`` - each framework, data, parameter set, program set and spreadsheet (e.g., the databook)
+- ``results/<hash>/model.pkl`` - the :class:`Model` for each result, without its arrays
+- ``results/<hash>/<dtype>.npy`` - the arrays for each result, concatenated into one buffer per dtype
+
+Components and results are stored under a hash of their content, so identical items (e.g., the
+framework used by the project and by all of its results) are only stored once. This also allows
+incremental saving - when a project is saved to an existing container with ``incremental=True``,
+the existing file is copied and only the items that are not already present in the container are
+appended to the copy, followed by a new manifest. The copy then replaces the existing file, so an
+interrupted save leaves the previously saved project unchanged. Items that are no
+longer used remain in the container until it is saved again without ``incremental``, or until they
+make up more than half of the file, at which point an incremental save compacts the container by
+rewriting it in full.
+
+When a container is loaded, the :class:`Result` objects are restored with their metadata
+only (name, parset name, population names etc.), and the model and its arrays are read from
+the container the first time the model is accessed. This means that a project can be opened
+to inspect or modify its parameter sets without reading any of the results.
+
+Containers are normally written and read via ``Project.save(..., container=True)`` and
+:meth:`Project.load` rather than by calling the functions in this module directly.
+
+"""
+
+import hashlib
+import io
+import json
+import os
+import pickle
+import shutil
+import warnings
+import weakref
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import sciris as sc
+
+from .utils import _freeze
+from .version import version
+
+CONTAINER_FORMAT = 3  # Version of the container layout, stored in the manifest
+_COMPACT_THRESHOLD = 0.5  # Incremental saves rewrite the container if more than this fraction of its size is no longer used
+_COMPONENTS = {"ProjectFramework", "ProjectData", "ParameterSet", "ProgramSet", "Spreadsheet"}  # Names of classes stored as separate components
+_model_components = weakref.WeakValueDictionary()  # Components used by models that have been loaded, so results loaded separately share them
+
+
+def is_container(fname) -> bool:
+    """
+    Check if a file is a project container
+
+    :param fname: Path to a file
+    :return: ``True`` if the file is a project container, ``False`` otherwise (e.g., for a gzipped pickle)
+
+    """
+
+    if not zipfile.is_zipfile(fname):
+        return False
+    with zipfile.ZipFile(fname) as zf:
+        return "manifest.json" in zf.namelist()
+
+
+class _ResultRef:
+    """
+    Reference to a model stored in a container
+
+    This object is stored in ``Result._model_ref`` for results that have been loaded from a
+    container but whose model has not yet been accessed.
+
+    :param fname: Path to the container file
+    :param key: The key of the result within the container
+
+    """
+
+    def __init__(self, fname, key: str):
+        self.fname = Path(fname)
+        self.key = key
+
+    def __repr__(self):
+        return f'_ResultRef("{self.fname}", "{self.key}")'
+
+    def load(self):
+        """
+        Read the model from the container
+
+        :return: A :class:`Model` instance
+
+        """
+
+        with zipfile.ZipFile(self.fname) as zf:
+            return _read_model(zf, self.key)
+
+
+def _component_id(obj, components: dict, ids: dict):
+    # Return a reference to a component, adding its pickled content to ``components`` if it has not been seen before.
+    # The modification time is stored in the reference rather than the component, because it is updated when items
+    # are added to an ``NDict`` (including when a project is loaded) even if their content has not changed
+    if type(obj).__name__ not in _COMPONENTS:
+        return None
+    if id(obj) not in ids:
+        state = obj.__getstate__() if hasattr(obj, "__getstate__") else obj.__dict__  # Python < 3.11 has no default ``__getstate__``
+        state = {k: v for k, v in state.items() if k != "modified"}
+        data = pickle.dumps((type(obj), state), protocol=pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha256(data).hexdigest()
+        components[digest] = data
+        ids[id(obj)] = ("component", digest, obj.__dict__.get("modified"))
+    return ids[id(obj)]
+
+
+class _ComponentLoader:
+    # Load components from a container, so that each component is only unpickled once. Models store
+    # read-only snapshots of their framework and progset (see ``model._shared_snapshot``), so if ``shared``
+    # is True, the components are made read-only and shared with any other models that have been loaded
+    def __init__(self, zf: zipfile.ZipFile, shared: bool = False):
+        self.zf = zf
+        self.shared = shared
+        self.loaded = _model_components if shared else {}
+
+    def __call__(self, pid):
+        _, digest, modified = pid
+        obj = self.loaded.get(digest)
+        if obj is None:
+            cls, state = pickle.loads(self.zf.read(f"components/{digest}.pkl"))
+            obj = cls.__new__(cls)
+            if hasattr(obj, "__setstate__"):
+                obj.__setstate__(state)  # Components may require migration
+            else:
+                obj.__dict__.update(state)
+            if modified is not None:
+                obj.modified = modified
+            if self.shared:
+                _freeze(obj)
+            self.loaded[digest] = obj
+        elif modified is not None and not self.shared:
+            obj.modified = modified
+        return obj
+
+
+class _ArrayPickler(pickle.Pickler):
+    # Pickler that stores floating point arrays separately. The arrays are concatenated into one
+    # flat buffer per dtype, and referenced in the pickle by their position in the buffer. If a dict
+    # of components is provided, components (e.g., the framework) are also stored separately
+    def __init__(self, f, components: dict = None):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays = {}  # {dtype: [arrays]}
+        self._sizes = {}  # {dtype: total size}
+        self._array_ids = {}  # Map id(array) to reference, so shared arrays are only stored once
+        self.components = components
+        self._component_ids = {}
+
+    def persistent_id(self, obj):
+        if type(obj) is np.ndarray and obj.dtype.kind == "f" and obj.ndim > 0:
+            if id(obj) not in self._array_ids:
+                dtype = obj.dtype.str
+                order = "F" if obj.flags.f_contiguous and not obj.flags.c_contiguous else "C"
+                offset = self._sizes.get(dtype, 0)
+                self.arrays.setdefault(dtype, []).append(obj.ravel(order=order))
+                self._sizes[dtype] = offset + obj.size
+                self._array_ids[id(obj)] = ("array", dtype, offset, obj.shape, order)
+            return self._array_ids[id(obj)]
+        elif self.components is not None:
+            return _component_id(obj, self.components, self._component_ids)
+        return None
+
+    def buffers(self) -> dict:
+        """
+        Return the concatenated arrays
+
+        :return: Dict with a flat array for each dtype
+
+        """
+
+        return {dtype: np.concatenate(arrays) for dtype, arrays in self.arrays.items()}
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    # Unpickler that retrieves arrays stored by ``_ArrayPickler`` as views of the buffers
+    def __init__(self, f, buffers, load_component=None):
+        super().__init__(f)
+        self.buffers = buffers
+        self.load_component = load_component
+
+    def persistent_load(self, pid):
+        if pid[0] == "component":
+            return self.load_component(pid)
+        kind, dtype, offset, shape, order = pid
+        assert kind == "array", "Unknown persistent reference in project container"
+        size = int(np.prod(shape))
+        return self.buffers[dtype][offset : offset + size].reshape(shape, order=order)
+
+
+class _ProjectPickler(pickle.Pickler):
+    # Pickler that replaces each Result with a reference and stores components separately. The Result
+    # metadata is stored in the reference, while the model is written separately by ``save_container``
+    def __init__(self, f):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.results = []  # List of Results, indexed by the slot stored in the reference
+        self._result_ids = {}  # Map id(result) to slot, so results referenced multiple times are only stored once
+        self.components = {}  # {digest: pickled component}
+        self._component_ids = {}
+
+    def persistent_id(self, obj):
+        from .results import Result  # Avoid circular import
+
+        if isinstance(obj, Result):
+            if id(obj) not in self._result_ids:
+                self._result_ids[id(obj)] = str(len(self.results))
+                self.results.append(obj)
+            slot = self._result_ids[id(obj)]
+            if "_unmigrated_model" in obj.__dict__:
+                obj.model  # Results that require migration are migrated before saving, so the stored metadata is current
+            meta = {k: v for k, v in obj.__dict__.items() if k not in {"model", "_model_ref", "_compact", "_function_cache"}}
+            return ("result", slot, meta)
+        return _component_id(obj, self.components, self._component_ids)
+
+
+class _ProjectUnpickler(pickle.Unpickler):
+    # Unpickler that restores Results without their model
+    def __init__(self, f, fname, keys: dict, load_component):
+        super().__init__(f)
+        self.fname = fname
+        self.keys = keys  # Map the slot stored in each reference to the key of the result in the container
+        self.load_component = load_component
+        self.results = {}
+
+    def persistent_load(self, pid):
+        from .results import Result  # Avoid circular import
+
+        if pid[0] == "component":
+            return self.load_component(pid)
+        kind, slot, meta = pid
+        assert kind == "result", "Unknown persistent reference in project container"
+        if slot not in self.results:
+            result = Result.__new__(Result)
+            meta["_model_ref"] = _ResultRef(self.fname, self.keys[slot])
+            result.__setstate__(meta)
+            self.results[slot] = result
+        return self.results[slot]
+
+
+def _model_members(model, components: dict) -> dict:
+    """
+    Return the container members for a model
+
+    The arrays are written as one flat buffer per dtype, with the position of each
+    array within the buffer recorded in the model's pickle.
+
+    :param model: A :class:`Model` instance
+    :param components: Dict of components, which is updated with any components (e.g., the framework) used by the model
+    :return: Tuple with a dict of ``{name: content}`` for the members, where the names are relative to the model's folder,
+             and a sorted list of the digests of the components used by the model
+
+    """
+
+    if isinstance(model._buffer, np.memmap):
+        model = sc.dcp(model)  # Copying the model loads the buffer into memory, so the values are stored in the container rather than the name of the memory-mapped file
+
+    f = io.BytesIO()
+    pickler = _ArrayPickler(f, components)
+    pickler.dump(model)
+    members = {"model.pkl": f.getvalue()}
+    for dtype, buffer in pickler.buffers().items():
+        g = io.BytesIO()
+        np.lib.format.write_array(g, buffer, allow_pickle=False)
+        members[f"{np.dtype(dtype).name}.npy"] = g.getvalue()
+    return members, sorted(pid[1] for pid in pickler._component_ids.values() if pid is not None)
+
+
+def _members_key(members: dict) -> str:
+    # Return the content hash for a set of members
+    h = hashlib.sha256()
+    for name in sorted(members):
+        h.update(name.encode() + b"\0" + hashlib.sha256(members[name]).digest())
+    return h.hexdigest()
+
+
+def _read_model(zf: zipfile.ZipFile, key: str):
+    """
+    Read a model and its arrays from a container
+
+    :param zf: An open ``ZipFile`` in read mode
+    :param key: The result key within the container
+    :return: A :class:`Model` instance
+
+    """
+
+    prefix = f"results/{key}/"
+    buffers = {}
+    for member in set(zf.namelist()):
+        if member.startswith(prefix) and member.endswith(".npy"):
+            with zf.open(member) as f:
+                buffer = np.lib.format.read_array(io.BytesIO(f.read()), allow_pickle=False)
+            buffers[buffer.dtype.str] = buffer
+    with zf.open(f"{prefix}model.pkl") as f:
+        return _ArrayUnpickler(f, buffers, _ComponentLoader(zf, shared=True)).load()
+
+
+def _stored_components(fname, key: str, manifests: dict) -> list:
+    """
+    Return the components used by a stored result
+
+    :param fname: Path to the container file
+    :param key: The key of the result within the container
+    :param manifests: Dict of manifests that have already been read, keyed by file name. This is updated if the manifest is read
+    :return: A list of component digests, or ``None`` if the container does not record them (e.g., in older formats)
+
+    """
+
+    if fname not in manifests:
+        with zipfile.ZipFile(fname) as zf:
+            manifests[fname] = json.loads(zf.read("manifest.json"))
+    for info in manifests[fname]["results"].values():
+        if info.get("key") == key and "components" in info:
+            return info["components"]
+    return None
+
+
+def _superseded_fraction(zf: zipfile.ZipFile, manifest: dict) -> float:
+    """
+    Return the fraction of a container that is no longer used
+
+    Members that are not referenced by the latest manifest (including previous manifests) are
+    superseded, and are only removed when the container is rewritten.
+
+    :param zf: An open ``ZipFile`` in read mode
+    :param manifest: The latest manifest in the container
+    :return: The fraction of the (compressed) size of the container taken up by superseded members
+
+    """
+
+    keys = {info["key"] for info in manifest["results"].values()}
+    used = {manifest["project"]} | {f"components/{digest}.pkl" for digest in manifest["components"]}
+    for info in manifest["results"].values():
+        used.update(f"components/{digest}.pkl" for digest in info["components"])
+
+    infos = zf.infolist()
+    latest = max(i for i, info in enumerate(infos) if info.filename == "manifest.json")
+    total = 0
+    superseded = 0
+    for i, info in enumerate(infos):
+        if info.filename == "manifest.json":
+            live = i == latest
+        elif info.filename.startswith("results/"):
+            live = info.filename.split("/")[1] in keys
+        else:
+            live = info.filename in used
+        total += info.compress_size
+        if not live:
+            superseded += info.compress_size
+    return superseded / total if total else 0.0
+
+
+def save_container(project, fname, incremental: bool = False) -> None:
+    """
+    Save a project to a container file
+
+    Results that were loaded from a container and not yet accessed are copied across without
+    being unpickled. The file is written under a temporary name and then renamed, so the project
+    can be saved back to the same file it was loaded from.
+
+    If ``incremental=True`` and the file is already a project container, the temporary file starts
+    as a byte-for-byte copy of the existing file, and only the components and results that are not
+    already present are appended to it, followed by the project and finally a new manifest. Results
+    that were loaded from the same file and have not been accessed are therefore not unpickled or
+    compressed again. The existing file is not modified until the new file is complete, so if saving
+    is interrupted, the previously saved project can still be loaded. Items that are no longer used
+    remain in the file, so if they make up more than ``_COMPACT_THRESHOLD`` of the container, it is
+    compacted by rewriting it in full.
+
+    :param project: A :class:`Project` instance
+    :param fname: The file to write
+    :param incremental: If True, add to an existing container rather than rewriting it
+
+    """
+
+    fname = Path(fname).resolve()
+    tmp = fname.with_name(fname.name + f".{os.getpid()}.tmp")
+
+    f = io.BytesIO()
+    pickler = _ProjectPickler(f)
+    pickler.dump(project)
+    components = pickler.components
+    project_components = sorted(components)  # Components used by the project, before any used only by the results are added
+    project_data = f.getvalue()
+    project_name = f"projects/{hashlib.sha256(project_data).hexdigest()}.pkl"
+
+    existing = set()  # Names of the members in the file, if appending to it
+    manifests = {}  # Manifests of containers that results are copied from
+    if incremental and fname.exists() and is_container(fname):
+        with zipfile.ZipFile(fname) as zf:
+            manifest = json.loads(zf.read("manifest.json"))
+            if manifest["format"] == CONTAINER_FORMAT and _superseded_fraction(zf, manifest) <= _COMPACT_THRESHOLD:
+                existing = set(zf.namelist())
+                manifests[fname] = manifest
+    append = bool(existing)
+
+    keys = []  # The key for each result
+    result_components = []  # The components used by each result
+    moved = []  # Results whose references need to be updated once the file has been written
+    try:
+        # Write to a temporary file that replaces the existing file once complete. If appending, the
+        # temporary file starts as a copy of the existing file, so the stored items are not rewritten
+        if append:
+            shutil.copyfile(fname, tmp)
+        with zipfile.ZipFile(tmp, "a" if append else "w", compression=zipfile.ZIP_DEFLATED) as zf, warnings.catch_warnings():
+            warnings.filterwarnings("ignore", "Duplicate name", UserWarning)  # Appending a new manifest supersedes the existing one
+
+            def write(name, data):
+                if name not in existing:
+                    zf.writestr(name, data)
+                    existing.add(name)
+
+            for result in pickler.results:
+                ref = result.__dict__.get("_model_ref")
+                used = None if ref is None else _stored_components(ref.fname, ref.key, manifests)
+                if used is None:
+                    # Write the model, loading it first if it was stored in a container that does not record its components
+                    members, used = _model_members(result.model, components)
+                    key = _members_key(members)
+                elif ref.fname == fname and f"results/{ref.key}/model.pkl" in existing:
+                    key = ref.key  # Already present in the container, so nothing needs to be read or written
+                    members = {}
+                else:
+                    # Copy the stored model and the components it uses directly from the source container
+                    prefix = f"results/{ref.key}/"
+                    with zipfile.ZipFile(ref.fname) as src:
+                        members = {member[len(prefix) :]: src.read(member) for member in set(src.namelist()) if member.startswith(prefix)}
+                        for digest in used:
+                            if f"components/{digest}.pkl" not in existing:
+                                components.setdefault(digest, src.read(f"components/{digest}.pkl"))
+                    key = _members_key(members)
+                    moved.append((ref, key))
+                keys.append(key)
+                result_components.append(used)
+                for name, data in members.items():
+                    write(f"results/{key}/{name}", data)
+
+            for digest, data in components.items():
+                write(f"components/{digest}.pkl", data)
+            write(project_name, project_data)
+
+            manifest = {
+                "format": CONTAINER_FORMAT,
+                "version": version,
+                "name": project.name,
+                "uid": str(project.uid),
+                "created": str(project.created),
+                "modified": str(project.modified),
+                "project": project_name,
+                "components": project_components,
+                "results": {str(slot): {"key": key, "name": result.name, "parset_name": getattr(result, "parset_name", None), "components": used} for slot, (key, used, result) in enumerate(zip(keys, result_components, pickler.results))},
+            }
+            zf.writestr("manifest.json", json.dumps(manifest, indent=2))  # The manifest is written last, so it only refers to items that have been written
+        os.replace(tmp, fname)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+    for ref, key in moved:
+        ref.fname = fname
+        ref.key = key
+
+
+def load_container(fname):
+    """
+    Load a project from a container file
+
+    :param fname: The file to read
+    :return: A :class:`Project` instance, whose results are loaded on first access
+
+    """
+
+    fname = Path(fname).resolve()
+    with zipfile.ZipFile(fname) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+        if manifest["format"] > CONTAINER_FORMAT:
+            raise Exception(f'Project container "{fname}" uses format {manifest["format"]} which is not supported by Atomica {version} - upgrade Atomica to load this project')
+        keys = {slot: info.get("key", slot) for slot, info in manifest["results"].items()}  # In format 1, results are stored under their slot
+        with zf.open(manifest.get("project", "project.pkl")) as f:  # Before format 3, the project is always stored in ``project.pkl``
+            return _ProjectUnpickler(f, fname, keys, _ComponentLoader(zf)).load()
@@ -8,6 +8,7 @@ to Excel files.
 
 """
 
+from .cache import _workbook_key, _workbook_cache_get, _workbook_cache_put
 from .utils import TimeSeries
 import sciris as sc
 from xlsxwriter.utility import xl_rowcol_to_cell as xlrc
@@ -371,6 +372,13 @@ class ProjectData(sc.prettyobj):
         if not isinstance(spreadsheet, sc.Spreadsheet):
             spreadsheet = sc.Spreadsheet(spreadsheet)
 
+        # The parsed databook depends on the framework, so the framework is included in the cache key
+        key = _workbook_key("databook", spreadsheet, framework)
+        cached = _workbook_cache_get(key)
+        if cached is not None:
+            self.__dict__.update(cached)
+            return self
+
         workbook = openpyxl.load_workbook(spreadsheet.tofile(), read_only=True, data_only=True)  # Load in read-only mode for performance, since we don't parse comments etc.
         validate_category(workbook, "atomica:databook")
 
@@ -462,6 +470,8 @@ class ProjectData(sc.prettyobj):
             tvals.update(table.tvec)
         self.tvec = np.array(sorted(tvals))
 
+        _workbook_cache_put(key, {k: v for k, v in self.__dict__.items() if k not in {"version", "gitinfo"}})
+
         return self
 
     def validate(self, framework) -> bool:
@@ -8,6 +8,7 @@ For example, Excel formatting, and time-varying data entry tables, are implement
 
 """
 
+import datetime
 import re
 from xlsxwriter.utility import xl_rowcol_to_cell as xlrc
 import sciris as sc
@@ -19,6 +20,7 @@ from .utils import format_duration, datetime_to_year
 import xlsxwriter
 from typing import Tuple
 from openpyxl.utils import get_column_letter
+from openpyxl.cell.cell import ERROR_CODES
 
 __all__ = ["standard_formats", "apply_widths", "update_widths", "transfer_comments", "copy_sheet", "read_tables", "read_dataframes", "TimeDependentConnections", "TimeDependentValuesEntry", "cell_get_string", "cell_get_number", "validate_category"]
 
@@ -206,19 +208,98 @@ def copy_sheet(source: str, sheet_name: str, workbook: xlsxwriter.Workbook) -> N
     src_workbook.close()
 
 
+class ValueCell:
+    """
+    Lightweight read-only spreadsheet cell
+
+    Reading a worksheet with ``iter_rows(values_only=True)`` is much faster than constructing an openpyxl
+    cell object for every cell, but only returns the values. This class stores the value together with the
+    row and column, so that it can be used in place of an openpyxl cell by the functions that parse tables
+    (which need the cell coordinate for error messages). The ``data_type`` is inferred from the value in
+    the same way as openpyxl.
+
+    :param value: The cell value
+    :param row: The Excel row index (starting at 1)
+    :param column: The Excel column index (starting at 1)
+
+    """
+
+    __slots__ = ["value", "row", "column"]
+
+    def __init__(self, value, row: int, column: int):
+        self.value = value
+        self.row = row
+        self.column = column
+
+    def __repr__(self):
+        return f"<ValueCell {self.coordinate}={self.value!r}>"
+
+    @property
+    def data_type(self) -> str:
+        """
+        Return the openpyxl data type
+
+        :return: 's' for strings, 'e' for errors, 'b' for booleans, 'd' for dates, and 'n' for numbers or empty cells
+
+        """
+
+        v = self.value
+        if isinstance(v, str):
+            return "e" if v in ERROR_CODES else "s"
+        elif isinstance(v, bool):
+            return "b"
+        elif isinstance(v, (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)):
+            return "d"
+        else:
+            return "n"
+
+    @property
+    def is_date(self) -> bool:
+        return self.data_type == "d"
+
+    @property
+    def coordinate(self) -> str:
+        return f"{get_column_letter(self.column)}{self.row}"
+
+
+def _iter_values(worksheet):
+    """
+    Iterate over worksheet rows as tuples of values
+
+    For read-only worksheets, openpyxl parses the entire sheet XML including the conditional
+    formatting and data validation that follow the cell data (which is extensive in databooks).
+    Since these are not needed, iteration stops as soon as the last row of the sheet dimensions
+    has been read, so the remainder of the XML is never parsed.
+
+    :param worksheet: An openpyxl worksheet
+    :return: Generator yielding a tuple of values for each row
+
+    """
+
+    max_row = worksheet.max_row
+    for i, row in enumerate(worksheet.iter_rows(values_only=True)):
+        yield row
+        if max_row is not None and i + 1 >= max_row:
+            return
+
+
 def read_tables(worksheet) -> Tuple[list, list]:
     """
     Read tables from sheet
 
+    The worksheet is read values-only, and only the rows belonging to tables are converted into
+    :class:`ValueCell` instances, which provide the ``value``, ``data_type`` and ``coordinate`` attributes
+    of an openpyxl cell.
+
     :param worksheet: An openpyxl worksheet
-    :return: A tuple containing - A list of tables (which is a list of rows, terminated by an empty row in the original spreadsheet),
-             and a list of start row indices for each table read in
+    :return: A tuple containing - A list of tables (which is a list of rows of :class:`ValueCell` instances, terminated by an
+             empty row in the original spreadsheet), and a list of start row indices for each table read in
     """
     # This function takes in a openpyxl worksheet, and returns tables
     # A table consists of a block of rows with any #ignore rows skipped
     # This function will start at the top of the worksheet, read rows into a buffer
     # until it gets to the first entirely empty row
-    # And then returns the contents of that buffer as a table. So a table is a list of openpyxl rows
+    # And then returns the contents of that buffer as a table. So a table is a list of rows of cells
     # This function continues until it has exhausted all of the rows in the sheet
 
     buffer = []
@@ -226,13 +307,13 @@ def read_tables(worksheet) -> Tuple[list, list]:
     start_rows = []
     start = None
 
-    for i, row in enumerate(worksheet.rows):
+    for i, row in enumerate(_iter_values(worksheet)):
 
         # Determine whether to skip the row, add it to the buffer, or flush buffer into a table
         flush = False
-        for j, cell in enumerate(row):
-            if cell.value:
-                if cell.data_type == "s" and cell.value.startswith("#ignore"):
+        for j, v in enumerate(row):
+            if v:
+                if isinstance(v, str) and v.startswith("#ignore"):
                     if j == 0:
                         break  # If #ignore is encountered in the first column, skip the row and continue parsing the table
                     else:
@@ -242,7 +323,7 @@ def read_tables(worksheet) -> Tuple[list, list]:
                     # Read the row into the buffer and continue parsing the table
                     if not buffer:
                         start = i + 1  # Excel rows are indexed starting at 1
-                    buffer.append(row)
+                    buffer.append([ValueCell(x, i + 1, k + 1) for k, x in enumerate(row)])
                     break  # If the cell has a value in it, continue parsing the table
         else:
             if buffer:
@@ -285,12 +366,11 @@ def read_dataframes(worksheet, merge=False) -> list:
     ignore = np.zeros((worksheet.max_row), dtype=bool)
     empty = np.zeros((worksheet.max_row), dtype=bool)  # True for index where a new table begins
 
-    for i, row in enumerate(worksheet.rows):
+    for i, row in enumerate(_iter_values(worksheet)):
 
         any_values = False  # Set True if this row contains any values
-        for j, cell in enumerate(row):
-            v = cell.value
-            if cell.data_type == "s":
+        for j, v in enumerate(row):
+            if isinstance(v, str) and v not in ERROR_CODES:
                 if not any_values and v.startswith("#ignore"):
                     # If we encounter a #ignore and it's the first content in the row
                     if j == 0:
@@ -13,12 +13,13 @@ import sciris as sc
 import io
 from collections import defaultdict
 
+from .cache import _workbook_key, _workbook_cache_get, _workbook_cache_put
 from .cascade import validate_cascade
 from .excel import read_tables, validate_category, standard_formats, read_dataframes
 from .function_parser import parse_function
 from .system import NotFoundError, FrameworkSettings as FS
 from .system import logger
-from .utils import format_duration, evaluate_plot_string
+from .utils import format_duration, evaluate_plot_string, _ReadOnly
 from .plotting import _extract_labels
 from .version import version, gitinfo
 
@@ -29,7 +30,7 @@ class InvalidFramework(Exception):
     pass
 
 
-class ProjectFramework:
+class ProjectFramework(_ReadOnly):
     """
     Base Framework class
 
@@ -63,6 +64,15 @@ class ProjectFramework:
         else:
             self.spreadsheet = sc.Spreadsheet(inputs)
 
+        # Only validated frameworks are cached, because partial frameworks may be modified before validation
+        key = _workbook_key("framework", self.spreadsheet) if validate else None
+        cached = _workbook_cache_get(key)
+        if cached is not None:
+            self.__dict__.update(cached)
+            if name is not None:
+                self.name = name
+            return
+
         workbook = openpyxl.load_workbook(self.spreadsheet.tofile(), read_only=True, data_only=True)  # Load in read-write mode so that we can correctly dump the file
         validate_category(workbook, "atomica:framework")
         # For some pages, we only ever want to read in one DataFrame, and we want empty lines to be ignored. For example, on the
@@ -90,6 +100,7 @@ class ProjectFramework:
                         df.columns = df.columns.str.lower()
         if validate:
             self._validate()
+            _workbook_cache_put(key, {k: v for k, v in self.__dict__.items() if k not in {"uid", "created", "modified", "version", "gitinfo", "spreadsheet", "_lookup"}})
         if name is not None:
             self.name = name
 
@@ -103,6 +114,12 @@ class ProjectFramework:
         framework = migrate(self)
         self.__dict__ = framework.__dict__
 
+    def __getstate__(self):
+        # The variable lookup is rebuilt on demand, so it is not saved with the framework
+        d = super().__getstate__()
+        d.pop("_lookup", None)
+        return d
+
     @property
     def name(self) -> str:
         """
@@ -151,6 +168,7 @@ class ProjectFramework:
     def comps(self, value):
         assert isinstance(value, pd.DataFrame)
         self.sheets["compartments"] = [value]
+        self.__dict__.pop("_lookup", None)
 
     def get_comp(self, comp_name: str) -> pd.Series:
         """
@@ -178,6 +196,7 @@ class ProjectFramework:
     def characs(self, value: pd.DataFrame) -> None:
         assert isinstance(value, pd.DataFrame)
         self.sheets["characteristics"] = [value]
+        self.__dict__.pop("_lookup", None)
 
     def get_charac(self, charac_name: str) -> pd.Series:
         """
@@ -237,6 +256,7 @@ class ProjectFramework:
     def pars(self, value: pd.DataFrame) -> None:
         assert isinstance(value, pd.DataFrame)
         self.sheets["parameters"] = [value]
+        self.__dict__.pop("_lookup", None)
 
     def get_par(self, par_name: str) -> pd.Series:
         """
@@ -263,6 +283,7 @@ class ProjectFramework:
     def interactions(self, value: pd.DataFrame) -> None:
         assert isinstance(value, pd.DataFrame)
         self.sheets["interactions"] = [value]
+        self.__dict__.pop("_lookup", None)
 
     @property
     def cascades(self) -> sc.odict:
@@ -330,6 +351,36 @@ class ProjectFramework:
 
         return self.interactions.loc[interaction_name]
 
+    def _get_lookup(self) -> dict:
+        """
+        Return dictionary for looking up variables by name
+
+        The dictionary maps both code names and display names to a tuple ``(type, code name)``. If a name is defined
+        more than once, the entry matches the search order used by :meth:`get_variable`. The dictionary is built on
+        first use, and is rebuilt whenever the compartment, characteristic, parameter or interaction DataFrames are
+        replaced (the setters discard it). Only the names are cached - rows are always read from the DataFrames, so
+        in-place changes to other columns are reflected immediately. Renaming a variable in-place is not detected, so
+        any such changes should be made by assigning a new DataFrame.
+
+        :return: A dict keyed by code name and display name
+
+        """
+
+        dfs = (self.comps, self.characs, self.pars, self.interactions)
+        lookup = self.__dict__.get("_lookup")
+        if lookup is not None and all(x is y for x, y in zip(lookup[0], dfs)):
+            return lookup[1]
+
+        names = dict()
+        for df, item_type in zip(dfs, [FS.KEY_COMPARTMENT, FS.KEY_CHARACTERISTIC, FS.KEY_PARAMETER, FS.KEY_INTERACTION]):
+            display_names = df["display name"] if "display name" in df.columns else df.index
+            for code_name in df.index:
+                names.setdefault(code_name, (item_type, code_name))
+            for code_name, display_name in zip(df.index, display_names):
+                names.setdefault(display_name, (item_type, code_name))
+        self._lookup = (dfs, names)
+        return names
+
     def get_variable(self, name: str) -> tuple:
         """
         Retrieve variable from framework
@@ -351,13 +402,22 @@ class ProjectFramework:
 
         """
 
-        for df, item_type in zip([self.comps, self.characs, self.pars, self.interactions], [FS.KEY_COMPARTMENT, FS.KEY_CHARACTERISTIC, FS.KEY_PARAMETER, FS.KEY_INTERACTION]):
-            if name in df.index:
-                return df.loc[name], item_type
-            elif name in set(df["display name"]):
-                return df.loc[df["display name"] == name].iloc[0], item_type
+        try:
+            item_type, code_name = self._get_lookup()[name]
+        except (KeyError, TypeError):
+            raise NotFoundError('Variable "%s" not found in Framework' % (name))
+        return self._get_df(item_type).loc[code_name], item_type
+
+    def _get_df(self, item_type: str) -> pd.DataFrame:
+        """
+        Return the DataFrame storing variables of a given type
+
+        :param item_type: A variable type e.g. ``FS.KEY_COMPARTMENT``
+        :return: The corresponding DataFrame
+
+        """
 
-        raise NotFoundError('Variable "%s" not found in Framework' % (name))
+        return {FS.KEY_COMPARTMENT: self.comps, FS.KEY_CHARACTERISTIC: self.characs, FS.KEY_PARAMETER: self.pars, FS.KEY_INTERACTION: self.interactions}[item_type]
 
     def get_label(self, name):
         """
@@ -379,7 +439,12 @@ class ProjectFramework:
 
         """
 
-        return self.get_variable(name)[0]["display name"]
+        try:
+            item_type, code_name = self._get_lookup()[name]
+        except (KeyError, TypeError):
+            raise NotFoundError('Variable "%s" not found in Framework' % (name))
+        df = self._get_df(item_type)
+        return df.at[code_name, "display name"] if "display name" in df.columns else code_name
 
     def get_databook_units(self, code_name: str) -> str:
         """
@@ -565,6 +630,7 @@ class ProjectFramework:
         self._validate_plots()
         self._validate_initialization()
         self._assign_junction_duration_groups()
+        self.__dict__.pop("_lookup", None)  # Validation modifies the DataFrames in-place (e.g. filling in display names), so rebuild the lookup on next use
 
     def _validate_sheets(self) -> None:
         # Check for required sheets
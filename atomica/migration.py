@@ -218,6 +218,66 @@ def migrate(obj, registry=migrations, version=version, gitinfo=gitinfo):
     return obj
 
 
+def migration_required(obj, registry=migrations, version=version) -> bool:
+    """Check if an object requires migration
+
+    :param obj: Object to check
+    :param registry: Dictionary storing {classname:[migrations]}
+    :param version: The current version
+    :return: ``True`` if :func:`migrate` would change the object
+
+    """
+
+    if type(obj).__name__ not in registry or SKIP_MIGRATION:
+        return False
+    return not hasattr(obj, "version") or sc.compareversions(obj.version, version) < 0
+
+
+def migrate_results(proj, fcn) -> None:
+    """Apply a project migration to each result in a project
+
+    Results in projects loaded from older versions are migrated when they are first used
+    (see ``Result._migrate``) rather than when the project is loaded. Project migrations that
+    need to modify the results therefore use this function, which runs the function immediately
+    for results that have already been migrated, and otherwise stores it on the result so that it
+    runs after the result's own migrations. The function should not depend on the state of the
+    project when it is run, because that state may change before the result is used.
+
+    :param proj: A Project object
+    :param fcn: A function that takes in a Result and modifies it in-place
+
+    Example usage:
+
+    def _update_result(result):
+        do_stuff(result)
+
+    migrate_results(proj, _update_result)
+
+    """
+
+    for result in all_results(proj):
+        if "_unmigrated_model" in result.__dict__:
+            result.__dict__.setdefault("_deferred_migrations", []).append(fcn)
+        else:
+            fcn(result)
+
+
+def migrate_frameworks(proj, fcn) -> None:
+    """Apply a project migration to each framework in a project
+
+    The project's framework is migrated immediately, while the frameworks stored in results
+    are migrated when the results are first used (see :func:`migrate_results`).
+
+    :param proj: A Project object
+    :param fcn: A function that takes in a ProjectFramework and modifies it in-place
+
+    """
+
+    if proj.framework:
+        fcn(proj.framework)
+    migrate_results(proj, lambda result: fcn(result.framework))
+
+
 def all_results(proj):
     """Helper generator to iterate over all results in a project
 
@@ -324,13 +384,14 @@ def _add_model_version(proj):
     # Note that this is a legacy update via the Project and therefore Results that
     # are stored separately will not receive this migration. It is unlikely that any
     # Results have been stored in this form though.
-    def add_version(res, p):
-        res.model.version = p.version
-        res.model.gitinfo = p.gitinfo
-        res.model.created = p.created
+    proj_version, proj_gitinfo, proj_created = proj.version, proj.gitinfo, proj.created
 
-    for result in all_results(proj):
-        add_version(result, proj)
+    def add_version(res):
+        res.model.version = proj_version
+        res.model.gitinfo = proj_gitinfo
+        res.model.created = proj_created
+
+    migrate_results(proj, add_version)
 
     return proj
 
@@ -418,7 +479,7 @@ def _parameter_use_timeseries(proj):
 
 @migration("Project", "1.0.14", "1.0.15", "Internal model tidying")
 def _model_tidying(proj):
-    for result in all_results(proj):
+    def tidy(result):
         for pop in result.model.pops:
             for charac in pop.characs:
                 charac._vals = charac.internal_vals
@@ -429,6 +490,8 @@ def _model_tidying(proj):
                 par._is_dynamic = par.dependency
                 par._precompute = False
                 del par.dependency
+
+    migrate_results(proj, tidy)
     return proj
 
 
@@ -568,9 +631,7 @@ def _add_pop_type_progset(progset):
 
 @migration("Project", "1.2.0", "1.3.0", "Add population type")
 def _add_pop_type(proj):
-
-    for fw in all_frameworks(proj):
-
+    def add_framework_pop_type(fw):
         # Add default population type sheet
         fw.sheets["population types"] = [pd.DataFrame.from_records([(FS.DEFAULT_POP_TYPE, "Default")], columns=["code name", "description"])]
         fw.comps["population type"] = FS.DEFAULT_POP_TYPE
@@ -579,6 +640,8 @@ def _add_pop_type(proj):
         fw.interactions["to population type"] = FS.DEFAULT_POP_TYPE
         fw.interactions["from population type"] = FS.DEFAULT_POP_TYPE
 
+    migrate_frameworks(proj, add_framework_pop_type)
+
     if proj.data:
         for pop_spec in proj.data.pops.values():
             pop_spec["type"] = FS.DEFAULT_POP_TYPE
@@ -595,17 +658,20 @@ def _add_pop_type(proj):
     for parset in proj.parsets.values():
         parset.pop_types = [pop["type"] for pop in proj.data.pops.values()]  # If there are parsets without data, then we don't know what pop types to add. Project is essentially incomplete and considered unusable
 
-    for result in all_results(proj):
+    def add_result_pop_type(result):
         for pop in result.model.pops:
             pop.type = FS.DEFAULT_POP_TYPE
 
+    migrate_results(proj, add_result_pop_type)
     return proj
 
 
 @migration("Project", "1.3.0", "1.4.0", "Parameter can be derivative")
 def _add_project_derivatives(proj):
-    for fw in all_frameworks(proj):
+    def add_derivatives(fw):
         fw.pars["is derivative"] = "n"
+
+    migrate_frameworks(proj, add_derivatives)
     return proj
 
 
@@ -744,8 +810,10 @@ def _rename_update_field(proj):
     proj._update_required = proj._result_update_required
     del proj._result_update_required
 
-    for result in all_results(proj):
+    def reset_update_flag(result):
         result._update_required = False
+
+    migrate_results(proj, reset_update_flag)
     return proj
 
 
@@ -780,8 +848,10 @@ def _add_tdc_tdve_attributes(proj):
 
 @migration("Project", "1.19.0", "1.20.0", "Framework.transitions is a defaultdict")
 def _framework_transitions_defaultdict(proj):
-    for fw in all_frameworks(proj):
+    def use_defaultdict(fw):
         fw.transitions = defaultdict(list, fw.transitions)
+
+    migrate_frameworks(proj, use_defaultdict)
     return proj
 
 
@@ -14,7 +14,10 @@ from .system import FrameworkSettings as FS
 from .results import Result
 from .function_parser import parse_function
 from .version import version, gitinfo
-from collections import defaultdict
+from .utils import content_hash, _freeze, _ReadOnly
+from collections import defaultdict, OrderedDict
+import contextlib
+import pickle
 import sciris as sc
 import numpy as np
 import matplotlib.pyplot as plt
@@ -22,11 +25,16 @@ from .programs import ProgramSet, ProgramInstructions
 from .parameters import Parameter as ParsetParameter
 from .parameters import ParameterSet as ParameterSet
 import math
+import os
 import pandas as pd
 
 model_settings = dict()
 model_settings["tolerance"] = 1e-6
 model_settings["initialization_tolerance"] = 1e-3
+model_settings["shared_cache_size"] = 16  # Number of framework/progset/instructions snapshots to retain for sharing across models
+
+_shared_snapshots = OrderedDict()  # {fingerprint: snapshot} with the most recently used snapshot at the end
+_buffer_references = False  # If True, models with a memory-mapped buffer are pickled with the name of the file rather than the values
 
 __all__ = [
     "BadInitialization",
@@ -44,10 +52,72 @@ __all__ = [
     "TimedLink",
     "Population",
     "Model",
+    "RecordSpec",
     "run_model",
+    "buffer_references",
 ]
 
 
+@contextlib.contextmanager
+def buffer_references():
+    """
+    Pickle memory-mapped model buffers by reference
+
+    By default, pickling a :class:`Model` always stores its values, so that saved projects and results
+    do not depend on any other files. Within this context, models whose buffer is a memory-mapped file
+    (see :meth:`Model.load_buffer`) are instead pickled with only the name of the file. This makes them
+    very fast to send to other processes on the same machine, but the pickle can only be loaded while
+    the file remains in the same location. For example
+
+    >>> with at.buffer_references():
+    >>>     s = sc.dumpstr(result)
+
+    """
+
+    global _buffer_references
+    previous = _buffer_references
+    _buffer_references = True
+    try:
+        yield
+    finally:
+        _buffer_references = previous
+
+
+def _shared_snapshot(obj):
+    """
+    Return a shared copy of an input object
+
+    Models store a copy of the framework, progset and program instructions used to run the simulation,
+    so that subsequent changes to those objects do not affect existing results. Rather than making a
+    new copy for every simulation, this function returns a snapshot that is shared by all models that
+    were run with identical inputs. The object is identified by its content hash, so if it is modified,
+    the next model receives a new snapshot (i.e., copy-on-write), while existing models retain the
+    previous snapshot. Because snapshots are shared between models and results, they are made
+    read-only (see ``utils._freeze``). To modify one, make a copy of it first.
+
+    :param obj: A :class:`ProjectFramework`, :class:`ProgramSet` or :class:`ProgramInstructions` instance (or ``None``)
+    :return: A read-only snapshot of the object, which may be shared with other models
+
+    """
+
+    if obj is None:
+        return None
+
+    # The content hash excludes the framework's spreadsheet, and is computed from the current contents so in-place changes are detected
+    fingerprint = (type(obj).__name__, getattr(obj, "name", None), content_hash(obj))
+    if fingerprint in _shared_snapshots:
+        _shared_snapshots.move_to_end(fingerprint)
+    else:
+        snapshot = pickle.loads(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))  # Unpickling produces a writeable copy
+        if hasattr(snapshot, "spreadsheet"):
+            snapshot.spreadsheet = None  # No need to keep the spreadsheet
+        _freeze(snapshot)
+        _shared_snapshots[fingerprint] = snapshot
+        while len(_shared_snapshots) > model_settings["shared_cache_size"]:
+            _shared_snapshots.popitem(last=False)
+    return _shared_snapshots[fingerprint]
+
+
 class BadInitialization(Exception):
     """
     Error for invalid conditions
@@ -771,11 +841,11 @@ class TimedCompartment(Compartment):
 
         This returns the compartment size at all times, obtained by summing over the people in each time bin
 
-        :return: A numpy array with the compartment size
+        :return: A numpy array with the compartment size, or ``None`` if the values were not recorded
 
         """
 
-        return self._vals.sum(axis=0)
+        return self._vals.sum(axis=0) if self._vals is not None else None
 
     def __getitem__(self, ti):
         """
@@ -995,7 +1065,7 @@ class Characteristic(Variable):
 
     @property
     def vals(self):
-        if self._vals is None:
+        if self._vals is None and self.t is not None:
             vals = np.zeros(self.t.shape)
 
             for comp in self.includes:
@@ -1463,11 +1533,11 @@ class TimedLink(Link):
 
         This returns link outflow obtained by summing over the people in each time bin at each point in time
 
-        :return: A numpy array with the link flow rate
+        :return: A numpy array with the link flow rate, or ``None`` if the values were not recorded
 
         """
 
-        return self._vals.sum(axis=0)
+        return self._vals.sum(axis=0) if self._vals is not None else None
 
     def preallocate(self, tvec: np.array, dt: float) -> None:
         """
@@ -1567,6 +1637,7 @@ class Population:
 
         self.popsize_cache_time = None
         self.popsize_cache_val = None
+        self._popsize = None  #: Population size at all times, stored if the compartment values are discarded after integration
 
         self.is_linked = True  # Flag to manage double unlinking/relinking
 
@@ -1628,6 +1699,8 @@ class Population:
         """
 
         if ti is None:
+            if getattr(self, "_popsize", None) is not None:  # Populations in older results do not have this attribute
+                return self._popsize
             return np.sum([comp.vals for comp in self.comps if (not isinstance(comp, SourceCompartment) and not isinstance(comp, SinkCompartment))], axis=0)
 
         if ti == self.popsize_cache_time:
@@ -2005,7 +2078,7 @@ class Population:
             c[0] = max(0.0, x[i,0])
 
 
-class Model:
+class Model(_ReadOnly):
     """A class to wrap up multiple populations within model and handle cross-population transitions."""
 
     def __init__(self, settings, framework, parset, progset=None, program_instructions=None):
@@ -2024,8 +2097,8 @@ class Model:
         self.pops = list()  # List of population groups that this model subdivides into.
         self.interactions = sc.odict()
         self.programs_active = None  # True or False depending on whether Programs will be used or not
-        self.progset = sc.dcp(progset)
-        self.program_instructions = sc.dcp(program_instructions)  # program instructions
+        self.progset = _shared_snapshot(progset)  #: Read-only snapshot of the progset, shared with other models using the same progset
+        self.program_instructions = _shared_snapshot(program_instructions)  #: Read-only snapshot of the program instructions
         self.t = settings.tvec  #: Simulation time vector (this is a brand new instance from the `settings.tvec` property method)
         self.dt = settings.sim_dt  #: Simulation time step
 
@@ -2034,9 +2107,10 @@ class Model:
         self._pop_ids = sc.odict()  # Maps name of a population to its position index within populations list.
         self._program_cache = None  #: Cache program capacities and coverage for coverage scenarios
         self._exec_order = None  #: Cache the dependency order of various quantities
+        self._buffer = None  #: If the model has been consolidated, a 2D array (rows x time) storing the values of all variables
+        self._buffer_layout = None  #: List of ``(id, attribute, row, n_rows)`` tuples identifying which rows of the buffer belong to each variable
 
-        self.framework = sc.dcp(framework)  # Store a copy of the Framework used to generate this model
-        self.framework.spreadsheet = None  # No need to keep the spreadsheet
+        self.framework = _shared_snapshot(framework)  #: Read-only snapshot of the Framework used to generate this model, shared with other models using the same framework
 
         self.build(parset)
 
@@ -2143,27 +2217,286 @@ class Model:
                 self._vars_by_pop[var.name].append(var)
         self._vars_by_pop = dict(self._vars_by_pop)  # Stop new entries from appearing in here by accident
 
+    def _copy_state(self) -> dict:
+        # Copy the model's attributes, except for the framework, progset and program instructions. These are
+        # read-only snapshots (see ``_shared_snapshot``) so they remain shared with the copy, and if multiple
+        # models are pickled together (e.g., in a project), the snapshots are only stored once
+        shared = {k: self.__dict__[k] for k in ("framework", "progset", "program_instructions") if k in self.__dict__}
+        d = sc.dcp({k: v for k, v in self.__dict__.items() if k not in shared and k != "_readonly"})
+        d.update(shared)
+        return d
+
     def __getstate__(self):
         self.unlink()
-        d = sc.dcp(self.__dict__)  # Pickling to string results in a copy
+        buffer = self._detach_buffer()
+        d = self._copy_state()  # Pickling to string results in a copy
+        if buffer is not None:
+            if _buffer_references and isinstance(buffer, np.memmap) and buffer.filename and buffer.mode != "c":
+                # If requested, only store the name of a memory-mapped file, so the values are not copied
+                d["_buffer_file"] = buffer.filename
+                d["_buffer_mmap_mode"] = buffer.mode
+            else:
+                d["_buffer"] = np.array(buffer) if isinstance(buffer, np.memmap) else buffer
+        self._attach_buffer(buffer)
         self.relink()  # Relink, otherwise the original object gets unlinked
         return d
 
     def __setstate__(self, d):
         self.__dict__ = d
+        # Older models do not have a buffer
+        self.__dict__.setdefault("_buffer", None)
+        self.__dict__.setdefault("_buffer_layout", None)
+        if "_buffer_file" in d:
+            self._buffer = np.load(d.pop("_buffer_file"), mmap_mode=d.pop("_buffer_mmap_mode"))
+        self._attach_buffer(self._buffer)
         self.relink()
 
     def __deepcopy__(self, memodict={}):
         # Using dcp(self.__dict__) is faster than pickle getstate/setstate
         # when this is called via copy.deepcopy()
         self.unlink()
-        d = sc.dcp(self.__dict__)
+        buffer = self._detach_buffer()
+        d = self._copy_state()
+        self._attach_buffer(buffer)
         self.relink()
         new = Model.__new__(Model)
         new.__dict__.update(d)
+        if buffer is not None:
+            new._attach_buffer(np.array(buffer))  # Copies are stored in memory, even if the original is memory-mapped
         new.relink()
         return new
 
+    def trim(self, record) -> None:
+        """
+        Discard values that were not requested
+
+        After integration, the values for every variable at every timestep are stored. This method
+        removes the values that are not required by a :class:`RecordSpec`, so that the result uses
+        less memory and is faster to copy and save. Discarded variables remain in the model, but have
+        ``vals`` of ``None``. Characteristics that are kept are evaluated before their compartments are
+        discarded, and the size of each population is stored so that population aggregations can still
+        be performed when plotting. If programs are active, the compartments targeted by the programs are
+        also kept so that program coverage can be computed.
+
+        :param record: A :class:`RecordSpec` instance
+
+        """
+
+        # Work out which variables are required
+        pops = self.pops if record.pops is None else [self.get_pop(x) for x in record.pops]
+        if record.outputs is None:
+            required = [obj for pop in pops for obj in pop.comps + pop.characs + pop.pars + pop.links]
+        else:
+            names = []
+            for output in record.outputs:
+                if isinstance(output, dict):
+                    # Function outputs as used in PlotData require their dependencies
+                    for fcn in output.values():
+                        names += [x for x in parse_function(fcn)[1] if x not in {"t", "dt"}]
+                else:
+                    names.append(output)
+            required = []
+            for name in names:
+                found = [obj for pop in pops if name in pop for obj in pop.get_variable(name)]
+                if not found:
+                    raise NotFoundError(f'Output "{name}" was requested for recording but it was not found in any of the recorded populations')
+                required += found
+
+        # Program coverage (see :meth:`Result.get_coverage`) needs the compartments targeted by each program in every targeted population
+        if self.programs_active:
+            for prog in self.progset.programs.values():
+                for pop_name in prog.target_pops:
+                    for comp_name in prog.target_comps:
+                        comp = self.get_pop(pop_name).get_comp(comp_name)
+                        required.append(comp)
+                        if isinstance(comp, SourceCompartment):
+                            required += comp.outlinks
+                        elif isinstance(comp, SinkCompartment):
+                            required += comp.inlinks
+
+        # PlotData also needs the source compartments of flows and parameters (for weighting) and the denominators of characteristics
+        keep = set()
+        while required:
+            obj = required.pop()
+            if id(obj) in keep:
+                continue
+            keep.add(id(obj))
+            if isinstance(obj, Link):
+                required.append(obj.source)
+            elif isinstance(obj, Parameter):
+                required += [link.source for link in obj.links]
+            elif isinstance(obj, Characteristic) and obj.denominator is not None:
+                required.append(obj.denominator)
+            elif isinstance(obj, JunctionCompartment):
+                required += obj.outlinks
+
+        # Evaluate kept characteristics and population sizes before any compartments are discarded
+        for pop in self.pops:
+            pop._popsize = pop.popsize()
+            for charac in pop.characs:
+                if id(charac) in keep:
+                    charac._vals = charac.vals
+
+        idx = slice(None, None, record.stride)
+        self.t = self.t[idx]
+        for pop in self.pops:
+            pop._popsize = pop._popsize[idx].copy()
+            for obj in pop.comps + pop.characs + pop.pars + pop.links:
+                attr = "_vals" if "_vals" in obj.__dict__ else "vals"
+                if id(obj) in keep:
+                    obj.t = self.t
+                    vals = getattr(obj, attr)
+                    if isinstance(vals, np.ndarray) and vals.ndim > 0:
+                        setattr(obj, attr, vals[..., idx].copy())
+                else:
+                    obj.t = None
+                    setattr(obj, attr, None)
+        for name, vals in self.interactions.items():
+            self.interactions[name] = vals[..., idx].copy()
+
+        # The values are no longer views of the buffer, if the model had been consolidated
+        self._buffer = None
+        self._buffer_layout = None
+
+        if record.dtype is not None or record.sigfigs is not None:
+            self.downcast(dtype=record.dtype or np.float64, sigfigs=record.sigfigs)
+
+    def _buffer_arrays(self):
+        # Iterate over the arrays storing variable values as ``(variable, attribute, array)`` tuples
+        for pop in self.pops:
+            for obj in pop.comps + pop.characs + pop.pars + pop.links:
+                for attr in ("vals", "_vals"):
+                    arr = obj.__dict__.get(attr)
+                    if isinstance(arr, np.ndarray) and arr.shape[-1] == self.t.size:
+                        yield obj, attr, arr
+
+    def _detach_buffer(self):
+        # Remove the buffer and the views of it, so that the remaining state can be copied without
+        # copying the variable values. Returns the buffer so it can be reattached with ``_attach_buffer()``
+        buffer = self._buffer
+        if buffer is not None:
+            for obj, attr, _ in self._buffer_arrays():
+                setattr(obj, attr, None)
+            self._buffer = None
+        return buffer
+
+    def _attach_buffer(self, buffer) -> None:
+        # Set the variable values to views of the buffer, as specified by ``self._buffer_layout``
+        if buffer is None:
+            return
+        n_rows = sum(x[3] or 1 for x in self._buffer_layout)
+        if buffer.shape != (n_rows, self.t.size):
+            raise ModelError(f"The buffer has shape {buffer.shape} but this model requires an array with shape {(n_rows, self.t.size)}")
+        objs = {obj.id: obj for pop in self.pops for obj in pop.comps + pop.characs + pop.pars + pop.links}
+        for obj_id, attr, row, n in self._buffer_layout:
+            setattr(objs[obj_id], attr, buffer[row] if n is None else buffer[row : row + n])
+        self._buffer = buffer
+
+    def consolidate(self) -> np.ndarray:
+        """
+        Store variable values in a single array
+
+        By default, each compartment, characteristic, parameter and link stores its values in
+        a separate array. This method copies the values into a single 2D array with one row per
+        variable (timed compartments and links use one row per duration bin), and replaces the
+        arrays in the variables with views of that array. The model can then be pickled or
+        copied with one array operation rather than hundreds, and the values can be saved to a
+        file with :meth:`Model.save_buffer` and memory-mapped with :meth:`Model.load_buffer`.
+
+        If the model has already been consolidated, the existing buffer is returned.
+
+        :return: A 2D array (variables x time) with the values of all variables
+
+        """
+
+        arrays = list(self._buffer_arrays())
+        if self._buffer is not None and all(arr.base is self._buffer for _, _, arr in arrays):
+            return self._buffer
+
+        layout = []
+        row = 0
+        for obj, attr, arr in arrays:
+            n = arr.shape[0] if arr.ndim > 1 else None
+            layout.append((obj.id, attr, row, n))
+            row += n or 1
+
+        buffer = np.empty((row, self.t.size), dtype=np.result_type(*[arr.dtype for _, _, arr in arrays]) if arrays else float)
+        for (_, _, arr), (_, _, row, n) in zip(arrays, layout):
+            buffer[row : row + (n or 1)] = arr
+
+        self._buffer_layout = layout
+        self._attach_buffer(buffer)
+        return buffer
+
+    def save_buffer(self, fname) -> str:
+        """
+        Save variable values to a file
+
+        The model is consolidated (see :meth:`Model.consolidate`) and the buffer is saved to
+        a ``.npy`` file. The file can be opened in this model, or in a copy of this model (e.g.,
+        in another process) using :meth:`Model.load_buffer`.
+
+        :param fname: File name to write. The ``.npy`` extension is added if not present
+        :return: The full path of the file that was saved
+
+        """
+
+        buffer = self.consolidate()
+        fname = sc.makefilepath(fname, ext="npy", makedirs=True)
+        if not (isinstance(buffer, np.memmap) and buffer.filename == os.path.abspath(fname)):
+            np.save(fname, buffer)
+        return fname
+
+    def downcast(self, dtype=np.float32, sigfigs: int = None) -> None:
+        """
+        Store values at reduced precision
+
+        Integration is always performed in double precision, but once the model has been run,
+        the stored values can be converted to a smaller floating point type to halve the memory
+        and disk space required by the result. The values are converted back to double precision
+        when they are plotted or exported.
+
+        Optionally, the values can also be quantized to a given number of significant figures by
+        zeroing the trailing bits of each value. This does not further reduce the memory used, but
+        quantized values compress much better, so saved results are considerably smaller.
+
+        :param dtype: The floating point type to use for storage
+        :param sigfigs: Optionally specify the number of significant figures to retain
+
+        """
+
+        dtype = np.dtype(dtype)
+        if self._buffer is not None:
+            buffer = _quantize(self._buffer.astype(dtype), sigfigs)
+            self._attach_buffer(buffer)
+        else:
+            for obj, attr, arr in list(self._buffer_arrays()):
+                setattr(obj, attr, _quantize(arr.astype(dtype), sigfigs))
+        for pop in self.pops:
+            if getattr(pop, "_popsize", None) is not None:
+                pop._popsize = _quantize(pop._popsize.astype(dtype), sigfigs)
+
+    def load_buffer(self, fname, mmap_mode: str = "r") -> None:
+        """
+        Use variable values stored in a file
+
+        The values of all variables are replaced with views of the array in the file saved by
+        :meth:`Model.save_buffer`. By default, the file is memory-mapped and read-only, so that
+        values are only read from disk when they are used, and multiple processes can share the
+        same file without copying it. Within :func:`buffer_references`, pickling a model whose buffer
+        is memory-mapped only stores the name of the file rather than the values, so it is very fast
+        to send to other processes.
+
+        :param fname: A ``.npy`` file saved by :meth:`Model.save_buffer` for this model or a copy of it
+        :param mmap_mode: Memory mapping mode passed to ``np.load``. Use ``'c'`` to allow values to be modified in memory
+                          without changing the file, or ``None`` to load the values into memory
+
+        """
+
+        if self._buffer_layout is None:
+            self.consolidate()
+        self._attach_buffer(np.load(fname, mmap_mode=mmap_mode))
+
     def get_pop(self, pop_name):
         """Allow model populations to be retrieved by name rather than index."""
         pop_index = self._pop_ids[pop_name]
@@ -2692,7 +3025,74 @@ class Model:
                     par.constrain(ti)
 
 
-def run_model(settings, framework, parset: ParameterSet, progset: ProgramSet = None, program_instructions: ProgramInstructions = None, name: str = None):
+def _quantize(arr: np.ndarray, sigfigs: int = None) -> np.ndarray:
+    """
+    Round values to a number of significant figures
+
+    The trailing bits of the mantissa of each finite value are rounded to zero, leaving the
+    binary precision required to represent ``sigfigs`` decimal significant figures.
+
+    :param arr: A floating point array, which is modified in-place
+    :param sigfigs: The number of significant figures to retain. If ``None``, the array is returned unchanged
+    :return: The quantized array
+
+    """
+
+    if sigfigs is None:
+        return arr
+    n_mantissa = np.finfo(arr.dtype).nmant
+    n_drop = n_mantissa - int(np.ceil(sigfigs * np.log2(10)))
+    if n_drop <= 0:
+        return arr
+    uint = np.dtype(f"uint{arr.dtype.itemsize * 8}").type
+    bits = arr.view(uint)
+    finite = np.isfinite(arr)
+    rounded = (bits + uint(1 << (n_drop - 1))) & ~uint((1 << n_drop) - 1)  # Round to nearest, a carry into the exponent is the correct result
+    bits[finite] = rounded[finite]
+    return arr
+
+
+class RecordSpec:
+    """
+    Specify which simulation outputs to keep
+
+    By default, a :class:`Result` stores the values of every compartment, characteristic, parameter
+    and link in every population at every timestep. For applications that only use a few outputs
+    (such as optimization or large ensembles) a ``RecordSpec`` can be passed to :func:`run_model`
+    or :meth:`Project.run_sim` to discard everything else once the simulation has finished. The
+    model is still integrated at full resolution, so the recorded values are identical to those in
+    a complete result.
+
+    Example usage:
+
+    >>> record = at.RecordSpec(outputs=['alive', {'prev': 'inf/alive'}], pops=['adults'], stride=4)
+    >>> res = P.run_sim(record=record)
+
+    :param outputs: A list of output code names, in any form accepted by :meth:`Population.get_variable`.
+                    Function outputs (dicts of the form ``{label:function}`` as accepted by :class:`PlotData`)
+                    will record the variables that the function depends on. If ``None``, all outputs are recorded
+    :param pops: A list of population code names to record. If ``None``, all populations are recorded
+    :param stride: Record every ``stride``-th timestep. Flows are stored per timestep so they will still be annualized
+                   correctly when plotting, but quantities integrated over time from decimated results will be approximate
+    :param dtype: Optionally store the recorded values with a smaller floating point type e.g., ``np.float32`` (see :meth:`Model.downcast`)
+    :param sigfigs: Optionally quantize the recorded values to this many significant figures (see :meth:`Model.downcast`)
+
+    """
+
+    def __init__(self, outputs=None, pops=None, stride: int = 1, dtype=None, sigfigs: int = None):
+        if int(stride) < 1:
+            raise ModelError("Recording stride must be a positive integer")
+        self.outputs = sc.promotetolist(outputs) if outputs is not None else None  #: List of outputs to record, or ``None`` to record all outputs
+        self.pops = sc.promotetolist(pops) if pops is not None else None  #: List of population names to record, or ``None`` to record all populations
+        self.stride = int(stride)  #: Interval between recorded timesteps
+        self.dtype = np.dtype(dtype).name if dtype is not None else None  #: Floating point type for storage, or ``None`` to store values in double precision
+        self.sigfigs = sigfigs  #: Number of significant figures to retain, or ``None`` to store values without quantization
+
+    def __repr__(self):
+        return sc.prepr(self)
+
+
+def run_model(settings, framework, parset: ParameterSet, progset: ProgramSet = None, program_instructions: ProgramInstructions = None, name: str = None, record: RecordSpec = None):
     """
     Build and process model
 
@@ -2716,10 +3116,13 @@ def run_model(settings, framework, parset: ParameterSet, progset: ProgramSet = N
     :param progset: Optionally provide a :class:`ProgramSet` instance to use programs
     :param program_instructions: Optional :class:`ProgramInstructions` instance. If ``progset`` is specified, then instructions must be provided
     :param name: Optionally specify the name to assign to the output result
+    :param record: Optionally provide a :class:`RecordSpec` to only keep some of the outputs
     :return: A :class:`Result` object containing the processed model
 
     """
 
     m = Model(settings, framework, parset, progset, program_instructions)
     m.process()
+    if record is not None:
+        m.trim(record)
     return Result(model=m, parset=parset, name=name)
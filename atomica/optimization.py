@@ -1490,9 +1490,10 @@ def optimize(project, optimization, parset: ParameterSet, progset: ProgramSet, i
         raise Exception("Unrecognized optimization method")
 
     # Use the optimal parameter values to generate new instructions
-    optimization.update_instructions(x_opt, model.program_instructions)
-    optimization.constrain_instructions(model.program_instructions, hard_constraints)
-    return model.program_instructions  # Return the modified instructions
+    instructions = sc.dcp(model.program_instructions)  # The model's instructions are a snapshot that may be shared with other models, so modify a copy
+    optimization.update_instructions(x_opt, instructions)
+    optimization.constrain_instructions(instructions, hard_constraints)
+    return instructions  # Return the modified instructions
     # Note that we do not return the value of the objective here because *in general* the objective isn't required
     # or expected to have a meaningful interpretation because it may arbitrarily combine quantities (e.g. spending
     # and epi outcomes) or is otherwise subject to the choice of weighting (e.g. impact vs equity). Therefore,
@@ -16,7 +16,7 @@ import numpy as np
 import pandas as pd
 
 import sciris as sc
-from .utils import NamedItem, TimeSeries
+from .utils import NamedItem, TimeSeries, _state_digest
 from .system import logger
 import itertools
 import json
@@ -43,6 +43,20 @@ class Parameter(NamedItem):
         self.skip_function = sc.odict.fromkeys(self.ts, None)  # : This can be a range of years [start,stop] between which the parameter function will not be evaluated
         self._interpolation_method = "linear"  #: Fallback interpolation method. It is _strongly_ recommended not to change this, but to call ``Parameter.smooth()` instead
 
+    @property
+    def digest(self) -> str:
+        """
+        Return a digest of the parameter values
+
+        The digest covers the time series values, y-factors, skip function years and interpolation
+        method. It is computed from the current values, so it reflects any in-place changes.
+
+        :return: A hexadecimal digest string
+
+        """
+
+        return _state_digest(self)
+
     @property
     def pops(self):
         """
@@ -88,6 +102,9 @@ class Parameter(NamedItem):
         modify the fallback interpolation method, but to instead call `Parameter.smooth()`
         in advance with the appropriate options, if the interpolation matters.
 
+        The interpolated values are cached by the population's :class:`TimeSeries`, so building
+        models repeatedly from the same parameters reuses them (see :meth:`TimeSeries.interpolate`).
+
         :param tvec: A scalar, list, or array or time values
         :param pop_name: The population to interpolate data for
         :return: An array with the interpolated values
@@ -479,6 +496,21 @@ class ParameterSet(NamedItem):
         parset = migrate(self)
         self.__dict__ = parset.__dict__
 
+    @property
+    def digest(self) -> str:
+        """
+        Return a digest of the ParameterSet contents
+
+        Two ``ParameterSet`` instances have the same digest if their values, y-factors and
+        initialization are the same, in which case they will produce identical simulations. The
+        name and metadata such as the creation time are not included.
+
+        :return: A hexadecimal digest string
+
+        """
+
+        return _state_digest(self, exclude={"name"})
+
     def all_pars(self):
         """
         Return an iterator over all Parameters
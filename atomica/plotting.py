@@ -9,6 +9,7 @@ generate various plots from model outputs.
 import itertools
 import os
 import errno
+import shutil
 from collections import defaultdict
 from pandas import isna
 
@@ -27,13 +28,12 @@ from matplotlib.ticker import FuncFormatter
 import atomica
 import sciris as sc
 from .model import Compartment, Characteristic, Parameter, Link, SourceCompartment, JunctionCompartment, SinkCompartment
-from .results import Result
+from .results import Result, _compile_function
 from .system import logger, NotFoundError
-from .function_parser import parse_function
 from .system import FrameworkSettings as FS
 from .utils import format_duration, nested_loop
 
-__all__ = ["save_figs", "PlotData", "Series", "plot_bars", "plot_series", "plot_legend", "reorder_legend", "relabel_legend"]
+__all__ = ["save_figs", "plot_batch", "PlotData", "Series", "plot_bars", "plot_series", "plot_legend", "reorder_legend", "relabel_legend"]
 
 settings = dict()
 settings["legend_mode"] = "together"  # Possible options are ['together','separate','none']
@@ -66,7 +66,7 @@ DEFAULT_POP_AGGREGATIONS = {
 }
 
 
-def save_figs(figs, path=".", prefix="", fnames=None, file_format="png") -> None:
+def save_figs(figs, path=".", prefix="", fnames=None, file_format="png") -> list:
     """
     Save figures to disk as PNG or other graphics format files
 
@@ -86,6 +86,7 @@ def save_figs(figs, path=".", prefix="", fnames=None, file_format="png") -> None
     If you provide an empty string in the `fnames` argument this same operation will be carried
     out. If the last figure name is omitted, an empty string will automatically be added.
     :param file_format: the file format to save as, default png, allowed formats {png, ps, pdf, svg}
+    :return: List of paths to the saved files
     """
 
     try:
@@ -112,6 +113,7 @@ def save_figs(figs, path=".", prefix="", fnames=None, file_format="png") -> None
 
     assert file_format in ["png", "ps", "pdf", "svg"], f'File format {file_format} invalid. Format must be one of "png", "ps", "pdf", or "svg"'
 
+    saved = []
     for i, fig in enumerate(figs):
         if not fnames[i]:  # assert above means that i>0
             fnames[i] = fnames[i - 1] + "_legend"
@@ -125,6 +127,111 @@ def save_figs(figs, path=".", prefix="", fnames=None, file_format="png") -> None
         fname = sc.sanitizefilename(fname)  # parameters may have inappropriate characters
         fig.savefig(os.path.join(path, fname), bbox_inches=bbox, dpi=settings["dpi"], transparent=settings["transparent"])
         logger.info('Saved figure "%s"', fname)
+        saved.append(os.path.join(path, fname))
+
+    return saved
+
+
+def plot_batch(specs: list, path=".", prefix="", file_format="png", parallel: bool = True) -> list:
+    """
+    Render and save many plots in parallel
+
+    Rendering figures is slow, so generating a large number of plots (e.g. a separate set of plots for every
+    population) can take a long time if the figures are produced one at a time. This function takes in a list
+    of plot specifications, each of which is rendered and saved by :func:`save_figs` in a worker process using
+    a non-interactive backend. Only the file names are returned, so the figures do not need to be sent back to
+    the calling process.
+
+    Each specification is a dict containing
+
+    - ``'plotdata'`` - the :class:`PlotData` instance to plot
+    - ``'plot_function'`` - optionally ``'series'`` (default) to use :func:`plot_series` or ``'bars'`` to use :func:`plot_bars`
+    - ``'prefix'`` - optionally a prefix for the file names from this specification, added after ``prefix``
+    - ``'fnames'`` - optionally file names for the figures, as for :func:`save_figs`
+
+    Any other items are passed to the plotting function as keyword arguments. For example
+
+    >>> specs = [{'plotdata':PlotData(result, outputs='alive', pops=pop), 'prefix':pop+'_', 'plot_type':'stacked', 'legend_mode':'none'} for pop in pops]
+    >>> fnames = plot_batch(specs, path='figs')
+
+    Each specification is saved into its own temporary folder, and the files are then moved into ``path``. If
+    figures from different specifications have the same name (e.g., if several specifications without a
+    ``'prefix'`` or ``'fnames'`` produce bar plots), the index of the specification is appended to the later
+    file names, so no figures are overwritten. If a specification cannot be plotted, a warning is logged and
+    an empty list is returned for it, while the remaining figures are still saved.
+
+    Note that for ``parallel=True`` the calling code may need to be wrapped in an ``if __name__ == '__main__'`` block.
+
+    :param specs: A list of plot specification dicts
+    :param path: Folder to save the figures in
+    :param prefix: Optionally prepend a prefix to all of the file names
+    :param file_format: The file format to save as (see :func:`save_figs`)
+    :param parallel: If ``True``, render the figures in parallel, otherwise render them in this process one at a time
+    :return: A list with an entry for each specification, containing a list of the paths of the saved files
+
+    """
+
+    if not specs:
+        return []
+
+    for spec in specs:
+        if spec.get("plot_function", "series") not in {"series", "bars"}:
+            raise Exception('Unknown plot function "%s" - must be "series" or "bars"' % (spec["plot_function"]))
+
+    folders = [os.path.join(path, f".plot_batch_{os.getpid()}_{i}") for i in range(len(specs))]
+    kwargs = {"prefix": prefix, "file_format": file_format}
+    if parallel:
+        saved = sc.parallelize(_render_and_save, iterkwargs=[{"spec": spec, "path": folder} for spec, folder in zip(specs, folders)], kwargs={**kwargs, "plot_settings": dict(settings)})
+    else:
+        saved = [_render_and_save(spec, path=folder, **kwargs) for spec, folder in zip(specs, folders)]
+
+    # Move the files into the output folder, renaming any that have the same name as a file from an earlier specification
+    output = []
+    used = set()
+    for i, (folder, fnames) in enumerate(zip(folders, saved)):
+        paths = []
+        for fname in fnames:
+            name = os.path.basename(fname)
+            if name in used:
+                root, ext = os.path.splitext(name)
+                logger.warning('Plot specification %d produced a figure "%s" with the same name as an earlier specification - saving it as "%s_%d%s"', i, name, root, i, ext)
+                name = f"{root}_{i}{ext}"
+            used.add(name)
+            paths.append(os.path.join(path, name))
+            os.replace(fname, paths[-1])
+        shutil.rmtree(folder, ignore_errors=True)  # The folder may contain files from a specification that failed partway through saving
+        output.append(paths)
+    return output
+
+
+def _render_and_save(spec: dict, path, prefix, file_format, plot_settings: dict = None) -> list:
+    # Render a single plot specification and save the figures. This is a standalone function so that it can be
+    # pickled for use in ``sc.parallelize``. If ``plot_settings`` are provided, this function is running in a
+    # worker process, so the settings from the calling process are applied and the non-interactive backend is used.
+    # Errors are logged rather than raised, so that one plot failing does not prevent the others from being saved
+    spec = dict(spec)
+    plotdata = spec.pop("plotdata")
+    plot_function = spec.pop("plot_function", "series")
+    fnames = spec.pop("fnames", None)
+    spec_prefix = spec.pop("prefix", "")
+
+    if plot_settings is not None:
+        settings.update(plot_settings)
+        plt.switch_backend("agg")
+
+    figs = []
+    try:
+        if plot_function == "series":
+            figs = plot_series(plotdata, **spec)
+        else:
+            figs = plot_bars(plotdata, **spec)
+        return save_figs(figs, path=path, prefix=prefix + spec_prefix, fnames=fnames, file_format=file_format)
+    except Exception as e:
+        logger.warning("Plotting %s failed (%s)", list(plotdata.outputs), e)
+        return []
+    finally:
+        for fig in figs:
+            plt.close(fig)
 
 
 class PlotData:
@@ -262,27 +369,31 @@ class PlotData:
             tvecs[result_label] = result.model.t
             dt = result.model.dt
 
-            aggregated_outputs = defaultdict(dict)  # Dict with aggregated_outputs[pop_label][aggregated_output_label]
-            aggregated_units = dict()  # Dict with aggregated_units[aggregated_output_label]
-            aggregated_timescales = dict()
-            aggregated_denominators = defaultdict(dict)  # Store aggregated denominators where available at the same dimensionality as outputs
+            # The raw outputs are extracted into stacked arrays indexed by (pop, output, time) so that the aggregations
+            # can be resolved once per output, and then applied to all populations at once
+            pop_labels = list(pops_required)
+            pop_index = {x: i for i, x in enumerate(pop_labels)}
+            output_labels = list(outputs_required)
+            output_index = {x: i for i, x in enumerate(output_labels)}
+            n_t = len(tvecs[result_label])
+
+            data = np.zeros((len(pop_labels), len(output_labels), n_t))  # Raw output values
+            compsize = np.full(data.shape, np.nan)  # Compartment sizes, used for weighted output aggregation
+            denominators = np.full(data.shape, np.nan)  # Denominator values for characteristics with denominators
+            has_compsize = set()  # Outputs with a compartment size
+            denoms = dict()  # Name of the denominator for characteristics with denominators
             output_units = dict()
             output_timescales = dict()
-            compsize = dict()
-            denoms = sc.odict()  # Record denominators associated with input characteristics
-
-            popsize = dict()
+            function_vals = dict()  # Values for function outputs with shape (pop, time)
+            popsize = None  # Population sizes are only computed if they are needed for weighted population aggregation
             # Defaultdict won't throw key error when checking outputs.
             data_label = defaultdict(str)  # Label used to identify which data to plot, maps output label to data label.
 
-            # Aggregation over outputs takes place first, so loop over pops
-            for pop_label in pops_required:
+            for i, pop_label in enumerate(pop_labels):
                 pop = result.model.get_pop(pop_label)
-                popsize[pop_label] = pop.popsize()
-                data_dict = dict()  # Temporary storage for raw outputs
 
                 # First pass, extract the original output quantities, summing links and annualizing as required
-                for output_label in outputs_required:
+                for j, output_label in enumerate(output_labels):
 
                     try:
                         vars = pop.get_variable(output_label)
@@ -294,232 +405,255 @@ class PlotData:
                             message = f'Variable "{output_label}" was requested in population "{pop.name}" but it is only defined in these populations: {in_pops}'
                         raise NotFoundError(message) from e
 
-                    if vars[0].vals is None:
+                    vals = vars[0].vals  # Characteristic values are computed when accessed, so only retrieve them once
+                    if vals is None:
                         raise Exception('Requested output "%s" was not recorded because only partial results were saved' % (vars[0].name))
 
                     if isinstance(vars[0], Link):
-                        data_dict[output_label] = np.zeros(tvecs[result_label].shape)
-                        compsize[output_label] = np.zeros(tvecs[result_label].shape)
-
+                        compsize[i, j] = 0
                         for link in vars:
-                            data_dict[output_label] += link.vals
-                            compsize[output_label] += link.source.vals if not isinstance(link.source, JunctionCompartment) else link.source.outflow
+                            data[i, j] += link.vals
+                            compsize[i, j] += link.source.vals if not isinstance(link.source, JunctionCompartment) else link.source.outflow
+                        has_compsize.add(output_label)
 
                         # Annualize the units, and record that they correspond to a flow per year
-                        data_dict[output_label] /= dt
+                        data[i, j] /= dt
                         output_units[output_label] = vars[0].units
                         output_timescales[output_label] = 1.0
                         data_label[output_label] = vars[0].parameter.name if (vars[0].parameter and vars[0].parameter.units == FS.QUANTITY_TYPE_NUMBER) else None  # Only use parameter data points if the units match
 
                     elif isinstance(vars[0], Parameter):
-                        data_dict[output_label] = vars[0].vals
+                        data[i, j] = vals
                         output_units[output_label] = vars[0].units
                         output_timescales[output_label] = vars[0].timescale  # The timescale attribute for non-transition parameters will already be set to None
                         data_label[output_label] = vars[0].name
 
                         # If there are links, we can retrieve a compsize for the user to do a weighted average
                         if vars[0].links:
-                            output_units[output_label] = vars[0].units
-                            compsize[output_label] = np.zeros(tvecs[result_label].shape)
+                            compsize[i, j] = 0
                             for link in vars[0].links:
-                                compsize[output_label] += link.source.vals if not isinstance(link.source, JunctionCompartment) else link.source.outflow
+                                compsize[i, j] += link.source.vals if not isinstance(link.source, JunctionCompartment) else link.source.outflow
+                            has_compsize.add(output_label)
 
                     elif isinstance(vars[0], Compartment) or isinstance(vars[0], Characteristic):
-                        data_dict[output_label] = vars[0].vals
-                        compsize[output_label] = vars[0].vals
+                        data[i, j] = vals
+                        compsize[i, j] = vals
+                        has_compsize.add(output_label)
                         output_units[output_label] = vars[0].units
                         output_timescales[output_label] = None
                         data_label[output_label] = vars[0].name
                         if isinstance(vars[0], Characteristic) and vars[0].denominator is not None:
-                            denoms[output_label] = vars[0].denominator  # Record the denominator for this quantity
+                            denoms[output_label] = vars[0].denominator.name  # Record the denominator for this quantity
+                            denominators[i, j] = vars[0].denominator.vals
                     else:
                         raise Exception("Unknown type")
 
-                # Second pass, add in any dynamically computed quantities
-                # Using model. Parameter objects will automatically sum over Links and convert Links
-                # to annualized rates
-                for output in outputs:
-                    if not isinstance(output, dict):
-                        continue
-
-                    output_label, f_stack_str = list(output.items())[0]  # _extract_labels has already ensured only one key is present
-
-                    if not sc.isstring(f_stack_str):
-                        continue
-
-                    def placeholder_pop():
-                        return None
-
-                    placeholder_pop.name = "None"
-                    par = Parameter(pop=placeholder_pop, name=output_label)
-                    fcn, dep_labels = parse_function(f_stack_str)
-                    deps = {}
-                    for dep_label in dep_labels:
-                        vars = pop.get_variable(dep_label)
-                        if t_bins is not None and (isinstance(vars[0], Link) or isinstance(vars[0], Parameter)) and time_aggregation == "integrate":
-                            raise Exception("Function includes Parameter/Link so annualized rates are being used. Aggregation should therefore use 'average' rather than 'sum'.")
-                        deps[dep_label] = vars
-                    par._fcn = fcn
-                    par.deps = deps
-                    par.preallocate(tvecs[result_label], dt)
-                    par.update()
-                    data_dict[output_label] = par.vals
-                    output_units[output_label] = par.units
-                    output_timescales[output_label] = None
-
-                # Third pass, aggregate them according to any aggregations present
-                for output in outputs:  # For each final output
-                    if isinstance(output, dict):
-                        output_name = list(output.keys())[0]  # nb. there should be only one item in the output dict at this point
-                        labels = output[output_name]
-
-                        # If this was a function, aggregation over outputs doesn't apply so just put it straight in.
-                        if sc.isstring(labels):
-                            aggregated_outputs[pop_label][output_name] = data_dict[output_name]
-                            aggregated_units[output_name] = "unknown"  # Also, we don't know what the units of a function are
-                            aggregated_timescales[output_name] = None  # Timescale is lost
-                            aggregated_denominators[pop_label][output_name] = None  # Denominators are not tracked
-                            continue
-
-                        units = list(set([output_units[x] for x in labels]))
-                        timescales = list(set([np.nan if isna(output_timescales[x]) else output_timescales[x] for x in labels]))  # Ensure that None and nan don't appear as different timescales
-
-                        # Set default aggregation method depending on the units of the quantity. If the aggregation method has not been specified
-                        # then select a default aggregation method separately for each output
-                        if output_aggregation is not None:
-                            aggregation = output_aggregation
-                        elif denoms:
-                            try:
-                                denominators = set([denoms[x].name for x in labels])
-                            except KeyError as e:
-                                raise Exception("If an aggregation includes characteristics with denominators, then all of the included quantities must be characteristics with denominators") from e
-
-                            if len(denominators) == 1:
-                                # If all characteristics share the same denominator e.g., SP and SN prevalence, then we want to add the characteristics together
-                                aggregation = "sum"
-                            elif len(denominators) == len(labels):
-                                # If all characteristics have different denominators e.g., proportion of SP/SN on treatment aggregated over SP and SN, then use weighted averaging
-                                aggregation = "weighted"
-                            else:
-                                # Otherwise if mixing denominators, use a direct average. In general this should not happen because the result is not readily interpretable
-                                aggregation = "average"
-                        elif units[0] in DEFAULT_OUTPUT_AGGREGATIONS:
-                            aggregation = DEFAULT_OUTPUT_AGGREGATIONS[units[0]]
-                        else:
-                            logger.warning(f'Unit quantity "{units[0]}" was not recognized and an output aggregation method was not specified, using "sum" by default')
-                            aggregation = "sum"
+            # Second pass, add in any dynamically computed quantities. These are evaluated for all populations at once,
+            # and cached in the Result so that repeatedly constructing the same PlotData does not recompute them
+            for output in outputs:
+                if not isinstance(output, dict):
+                    continue
 
-                        if len(units) > 1:
-                            logger.warning("Aggregation for output '%s' is mixing units, this is almost certainly not desired.", output_name)
-                            aggregated_units[output_name] = "unknown"
-                        else:
-                            # If the user has requested a sum for a unit that doesn't use summation by default, there's a decent chance that this is a mistake
-                            if aggregation == "sum" and DEFAULT_OUTPUT_AGGREGATIONS.get(units[0], "sum") != "sum" and len(labels) > 1 and not labels[0] in denoms:  # Dimensionless, like prevalance
-                                logger.warning(f"Output '{output_name}' is in '{units[0]}' units, so output aggregation probably should not be 'sum'.")
-                            aggregated_units[output_name] = output_units[labels[0]]
-
-                        if len(timescales) > 1:
-                            logger.warning("Aggregation for output '%s' is mixing timescales, this is almost certainly not desired.", output_name)
-                            aggregated_timescales[output_name] = None
-                        else:
-                            aggregated_timescales[output_name] = output_timescales[labels[0]]
-
-                        # Perform additional validation on the denominators
-                        if denoms:
-                            unique_denoms = set([denoms[x].name for x in labels])
-
-                            if len(unique_denoms) > 1 and len(unique_denoms) < len(labels):
-                                logger.warning("When aggregating characteristics with denominators, they should generally either all have the same denominator, or all have different denominators. Partially duplicate denominators is likely not desired.")
-
-                            if len(unique_denoms) > 1:
-                                # Check that the denominators are non-overlapping
-                                comps = [set(result.framework.get_charac_includes(x)) for x in labels]
-                                if sum(len(x) for x in comps) != len(set().union(*comps)):
-                                    logger.warning("When aggregating characteristics with different denominators, generally there should be no overlap in the denominators. However, some compartments are shared between the requested characteristic denominators. Unless this is intentional, this is likely a mistake that should be investigated.")
-
-                        if aggregation == "sum":
-                            aggregated_outputs[pop_label][output_name] = sum(data_dict[x] for x in labels)  # Add together all the outputs
-
-                            # If summing characteristics that have denominators, then all quantities should have denominators, and they should all be equal
-                            # For example, summing SP-TB and SN-TB prevalance where they both have the 'alive' denominator
-                            has_denominator = [x in denoms for x in labels]
-                            if all(has_denominator):
-                                assert len(set([denoms[x].name for x in labels])) == 1, 'When aggregating characteristics with denominators, if summing them then all quantities must have the same denominator. The "weighted" aggregation can be used to combine characteristics with different denominators, on the assumption that their denominators do not overlap.'
-                                aggregated_denominators[pop_label][output_name] = denoms[0].vals
-                            elif not any(has_denominator):
-                                aggregated_denominators[pop_label][output_name] = None
-                            else:
-                                raise Exception(f"When aggregating outputs, if any quantities being aggregated have denominators, then they must all have denominators. These quantities have denominators {[x for x in labels if x in denoms]} while these do not {[x for x in labels if x not in denoms]}")
-
-                        elif aggregation == "average":
-                            aggregated_outputs[pop_label][output_name] = sum(data_dict[x] for x in labels)
-                            aggregated_outputs[pop_label][output_name] /= len(labels)
-                            aggregated_denominators[pop_label][output_name] = None  # If taking a direct average then drop the denominator
-                        elif aggregation == "weighted":
-                            has_denominator = [x in denoms for x in labels]
-                            assert all(has_denominator) or not any(has_denominator)  # An output aggregation must either have no quantities with denominators, or only contain quantities with denominators
-                            if all(has_denominator):
-                                # Take weighted average based on denominator size, and then store the combined denominator further population aggregation
-                                aggregated_outputs[pop_label][output_name] = sum(data_dict[x] * denoms[x].vals for x in labels)
-                                aggregated_denominators[pop_label][output_name] = sum([denoms[x].vals for x in labels])
-                                aggregated_outputs[pop_label][output_name] /= aggregated_denominators[pop_label][output_name]
-                            elif not any(has_denominator):
-                                aggregated_outputs[pop_label][output_name] = sum(data_dict[x] * compsize[x] for x in labels)
-                                aggregated_outputs[pop_label][output_name] /= sum([compsize[x] for x in labels])
-                                aggregated_denominators[pop_label][output_name] = None  # If taking a direct average then drop the denominator
-                            else:
-                                raise Exception(f"When aggregating outputs, if any quantities being aggregated have denominators, then they must all have denominators. These quantities have denominators {[x for x in labels if x in denoms]} while these do not {[x for x in labels if x not in denoms]}")
+                output_label, f_stack_str = list(output.items())[0]  # _extract_labels has already ensured only one key is present
+
+                if not sc.isstring(f_stack_str):
+                    continue
+
+                if t_bins is not None and time_aggregation == "integrate":
+                    for pop_label in pop_labels:
+                        for dep_label in _compile_function(f_stack_str)[1]:
+                            if dep_label not in {"t", "dt"} and isinstance(result.model.get_pop(pop_label).get_variable(dep_label)[0], (Link, Parameter)):
+                                raise Exception("Function includes Parameter/Link so annualized rates are being used. Aggregation should therefore use 'average' rather than 'sum'.")
+
+                function_vals[output_label] = result.evaluate_function(f_stack_str, pop_labels)
+
+            # Third pass, resolve the aggregation method, units and denominator for each output
+            aggregated_names = []  # Names of the aggregated outputs, in order
+            aggregated_units = dict()  # Dict with aggregated_units[aggregated_output_label]
+            aggregated_timescales = dict()
+            methods = []  # The output aggregation method for each aggregated output
+            indices = []  # Indices of the raw outputs contributing to each aggregated output
+
+            for output in outputs:  # For each final output
+                if not isinstance(output, dict):
+                    aggregated_names.append(output)
+                    aggregated_units[output] = output_units[output]
+                    aggregated_timescales[output] = output_timescales[output]
+                    methods.append("sum")
+                    indices.append([output_index[output]])
+                    continue
+
+                output_name = list(output.keys())[0]  # nb. there should be only one item in the output dict at this point
+                labels = output[output_name]
+                aggregated_names.append(output_name)
+
+                # If this was a function, aggregation over outputs doesn't apply so just put it straight in.
+                if sc.isstring(labels):
+                    aggregated_units[output_name] = "unknown"  # Also, we don't know what the units of a function are
+                    aggregated_timescales[output_name] = None  # Timescale is lost
+                    methods.append("function")
+                    indices.append(None)
+                    continue
+
+                units = list(set([output_units[x] for x in labels]))
+                timescales = list(set([np.nan if isna(output_timescales[x]) else output_timescales[x] for x in labels]))  # Ensure that None and nan don't appear as different timescales
+                has_denominator = [x in denoms for x in labels]
+
+                # Set default aggregation method depending on the units of the quantity. If the aggregation method has not been specified
+                # then select a default aggregation method separately for each output
+                if output_aggregation is not None:
+                    aggregation = output_aggregation
+                elif any(has_denominator):
+                    if not all(has_denominator):
+                        raise Exception("If an aggregation includes characteristics with denominators, then all of the included quantities must be characteristics with denominators")
+
+                    denominator_names = set([denoms[x] for x in labels])
+                    if len(denominator_names) == 1:
+                        # If all characteristics share the same denominator e.g., SP and SN prevalence, then we want to add the characteristics together
+                        aggregation = "sum"
+                    elif len(denominator_names) == len(labels):
+                        # If all characteristics have different denominators e.g., proportion of SP/SN on treatment aggregated over SP and SN, then use weighted averaging
+                        aggregation = "weighted"
                     else:
-                        aggregated_outputs[pop_label][output] = data_dict[output]
-                        aggregated_units[output] = output_units[output]
-                        aggregated_timescales[output] = output_timescales[output]
-                        aggregated_denominators[pop_label][output] = denoms[output].vals if output in denoms else None
+                        # Otherwise if mixing denominators, use a direct average. In general this should not happen because the result is not readily interpretable
+                        aggregation = "average"
+                elif units[0] in DEFAULT_OUTPUT_AGGREGATIONS:
+                    aggregation = DEFAULT_OUTPUT_AGGREGATIONS[units[0]]
+                else:
+                    logger.warning(f'Unit quantity "{units[0]}" was not recognized and an output aggregation method was not specified, using "sum" by default')
+                    aggregation = "sum"
+
+                if len(units) > 1:
+                    logger.warning("Aggregation for output '%s' is mixing units, this is almost certainly not desired.", output_name)
+                    aggregated_units[output_name] = "unknown"
+                else:
+                    # If the user has requested a sum for a unit that doesn't use summation by default, there's a decent chance that this is a mistake
+                    if aggregation == "sum" and DEFAULT_OUTPUT_AGGREGATIONS.get(units[0], "sum") != "sum" and len(labels) > 1 and not labels[0] in denoms:  # Dimensionless, like prevalance
+                        logger.warning(f"Output '{output_name}' is in '{units[0]}' units, so output aggregation probably should not be 'sum'.")
+                    aggregated_units[output_name] = output_units[labels[0]]
+
+                if len(timescales) > 1:
+                    logger.warning("Aggregation for output '%s' is mixing timescales, this is almost certainly not desired.", output_name)
+                    aggregated_timescales[output_name] = None
+                else:
+                    aggregated_timescales[output_name] = output_timescales[labels[0]]
+
+                # Perform additional validation on the denominators
+                if any(has_denominator):
+                    unique_denoms = set([denoms[x] for x in labels if x in denoms])
+
+                    if len(unique_denoms) > 1 and len(unique_denoms) < len(labels):
+                        logger.warning("When aggregating characteristics with denominators, they should generally either all have the same denominator, or all have different denominators. Partially duplicate denominators is likely not desired.")
+
+                    if len(unique_denoms) > 1:
+                        # Check that the denominators are non-overlapping
+                        comps = [set(result.framework.get_charac_includes(x)) for x in labels]
+                        if sum(len(x) for x in comps) != len(set().union(*comps)):
+                            logger.warning("When aggregating characteristics with different denominators, generally there should be no overlap in the denominators. However, some compartments are shared between the requested characteristic denominators. Unless this is intentional, this is likely a mistake that should be investigated.")
+
+                if aggregation in {"sum", "weighted"} and any(has_denominator) and not all(has_denominator):
+                    raise Exception(f"When aggregating outputs, if any quantities being aggregated have denominators, then they must all have denominators. These quantities have denominators {[x for x in labels if x in denoms]} while these do not {[x for x in labels if x not in denoms]}")
+                if aggregation == "sum" and all(has_denominator):
+                    # If summing characteristics that have denominators, they should all be equal
+                    # For example, summing SP-TB and SN-TB prevalance where they both have the 'alive' denominator
+                    assert len(set([denoms[x] for x in labels])) == 1, 'When aggregating characteristics with denominators, if summing them then all quantities must have the same denominator. The "weighted" aggregation can be used to combine characteristics with different denominators, on the assumption that their denominators do not overlap.'
+                elif aggregation == "weighted" and not any(has_denominator):
+                    missing = [x for x in labels if x not in has_compsize]
+                    if missing:
+                        raise KeyError(f'Weighted output aggregation requires compartment sizes, which are not available for {missing}')
+
+                methods.append(aggregation)
+                indices.append([output_index[x] for x in labels])
+
+            # Now perform the output aggregations for all populations. The sums for all of the aggregated outputs
+            # are computed in a single operation by concatenating their indices
+            aggregated = np.zeros((len(pop_labels), len(aggregated_names), n_t))  # Aggregated values with shape (pop, aggregated output, time)
+            aggregated_denominators = np.full(aggregated.shape, np.nan)  # Store aggregated denominators where available
+            has_aggregated_denominator = np.zeros(len(aggregated_names), dtype=bool)
+
+            idx = [k for k, method in enumerate(methods) if method != "function"]
+            if idx:
+                cat = np.concatenate([indices[k] for k in idx])
+                offsets = np.cumsum([0] + [len(indices[k]) for k in idx[:-1]])
+                aggregated[:, idx] = np.add.reduceat(data[:, cat], offsets, axis=1)
+                if "weighted" in methods:
+                    # Weight quantities by their denominator if they have one, otherwise by the compartment size
+                    weights = np.where(np.isin(output_labels, list(denoms))[None, :, None], denominators, compsize)
+                    weighted_numerator = np.zeros(aggregated.shape)
+                    weighted_denominator = np.zeros(aggregated.shape)
+                    weighted_numerator[:, idx] = np.add.reduceat((data * weights)[:, cat], offsets, axis=1)
+                    weighted_denominator[:, idx] = np.add.reduceat(weights[:, cat], offsets, axis=1)
+
+            for k, (output_name, method) in enumerate(zip(aggregated_names, methods)):
+                if method == "function":
+                    aggregated[:, k] = function_vals[output_name]
+                elif method == "sum":
+                    if output_labels[indices[k][0]] in denoms:
+                        aggregated_denominators[:, k] = denominators[:, indices[k][0]]
+                        has_aggregated_denominator[k] = True
+                elif method == "average":
+                    aggregated[:, k] /= len(indices[k])  # If taking a direct average then drop the denominator
+                elif method == "weighted":
+                    aggregated[:, k] = weighted_numerator[:, k] / weighted_denominator[:, k]
+                    if output_labels[indices[k][0]] in denoms:
+                        # Store the combined denominator for further population aggregation
+                        aggregated_denominators[:, k] = weighted_denominator[:, k]
+                        has_aggregated_denominator[k] = True
+
+            # Set population aggregation method for each output depending on the quantity being aggregated
+            pop_methods = []
+            for k, output_name in enumerate(aggregated_names):
+                if pop_aggregation is not None:
+                    pop_methods.append(pop_aggregation)
+                elif has_aggregated_denominator[k]:
+                    # Outputs with denominators use weighted by default
+                    pop_methods.append("weighted")
+                elif aggregated_units[output_name] in DEFAULT_POP_AGGREGATIONS:
+                    pop_methods.append(DEFAULT_POP_AGGREGATIONS[aggregated_units[output_name]])
+                elif any(isinstance(pop, dict) for pop in pops):
+                    logger.warning(f'Unit quantity "{aggregated_units[output_name]}" was not recognized and an output aggregation method was not specified, using "sum" by default')
+                    pop_methods.append("sum")
+                else:
+                    pop_methods.append("sum")
 
             # Now aggregate over populations
             # If we have requested a reduction over populations, this is done for every output present
             for pop in pops:  # This is looping over the population entries
-                for output_name in aggregated_outputs[list(aggregated_outputs.keys())[0]].keys():
-                    if isinstance(pop, dict):
-                        pop_name = list(pop.keys())[0]
-                        pop_labels = pop[pop_name]
-
-                        # Set population aggregation method depending on the quantity being aggregated
-                        if pop_aggregation is not None:
-                            aggregation = pop_aggregation
-                        elif aggregated_denominators[pop_labels[0]][output_name] is not None:
-                            # Outputs with denominators use weighted by default
-                            aggregation = "weighted"
-                        elif aggregated_units[output_name] in DEFAULT_POP_AGGREGATIONS:
-                            aggregation = DEFAULT_POP_AGGREGATIONS[aggregated_units[output_name]]
-                        else:
-                            logger.warning(f'Unit quantity "{aggregated_units[output_name]}" was not recognized and an output aggregation method was not specified, using "sum" by default')
-                            aggregation = "sum"
-
-                        # Perform aggregation
-                        if aggregation == "sum":
-                            if aggregation == "sum" and DEFAULT_POP_AGGREGATIONS.get(aggregated_units[output_name], "sum") != "sum" and len(pop_labels) > 1:
-                                logger.warning(f"Output '{output_name}' is in '{aggregated_units[output_name]}' units, so output aggregation should probably be '{DEFAULT_POP_AGGREGATIONS.get(aggregated_units[output_name])}', not 'sum'.")
-                            vals = sum(aggregated_outputs[x][output_name] for x in pop_labels)  # Add together all the outputs
-                        elif aggregation == "average":
-                            if aggregated_denominators[pop_labels[0]][output_name] is not None:
-                                logger.warning(f"Output '{output_name}' has a denominator, so output aggregation should probably be 'weighted' rather than 'average'")
-                            vals = sum(aggregated_outputs[x][output_name] for x in pop_labels)  # Add together all the outputs
-                            vals /= len(pop_labels)
-                        elif aggregation == "weighted":
-                            if aggregated_denominators[pop_labels[0]][output_name] is not None:
-                                weights = {x: aggregated_denominators[x][output_name] for x in pop_labels}
-                            else:
-                                weights = {x: popsize[x] for x in pop_labels}
-                            numerator = sum(aggregated_outputs[x][output_name] * weights[x] for x in pop_labels)  # Add together all the outputs
-                            denominator = sum([weights[x] for x in pop_labels])
-                            vals = np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan, dtype=float), where=numerator != 0)
-                        else:
-                            raise Exception(f'Unknown population aggregation method "{aggregation}"')
+                if not isinstance(pop, dict):
+                    for k, output_name in enumerate(aggregated_names):
+                        vals = aggregated[pop_index[pop], k]
+                        self.series.append(Series(tvecs[result_label], vals, result_label, pop, output_name, data_label[output_name], units=aggregated_units[output_name], timescale=aggregated_timescales[output_name], data_pop=pop))
+                    continue
 
-                        self.series.append(Series(tvecs[result_label], vals, result_label, pop_name, output_name, data_label[output_name], units=aggregated_units[output_name], timescale=aggregated_timescales[output_name], data_pop=pop_name))
+                pop_name = list(pop.keys())[0]
+                pop_idx = [pop_index[x] for x in pop[pop_name]]
+
+                # Perform aggregation for all outputs at once
+                pop_sum = aggregated[pop_idx].sum(axis=0)
+                if "weighted" in pop_methods:
+                    if popsize is None:
+                        popsize = np.array([result.model.get_pop(x).popsize() for x in pop_labels], dtype=float)
+                    weights = np.where(has_aggregated_denominator[None, :, None], aggregated_denominators[pop_idx], popsize[pop_idx][:, None, :])
+                    numerator = (aggregated[pop_idx] * weights).sum(axis=0)
+                    denominator = weights.sum(axis=0)
+                    pop_weighted = np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan, dtype=float), where=numerator != 0)
+
+                for k, output_name in enumerate(aggregated_names):
+                    aggregation = pop_methods[k]
+                    if aggregation == "sum":
+                        if DEFAULT_POP_AGGREGATIONS.get(aggregated_units[output_name], "sum") != "sum" and len(pop_idx) > 1:
+                            logger.warning(f"Output '{output_name}' is in '{aggregated_units[output_name]}' units, so output aggregation should probably be '{DEFAULT_POP_AGGREGATIONS.get(aggregated_units[output_name])}', not 'sum'.")
+                        vals = pop_sum[k]
+                    elif aggregation == "average":
+                        if has_aggregated_denominator[k]:
+                            logger.warning(f"Output '{output_name}' has a denominator, so output aggregation should probably be 'weighted' rather than 'average'")
+                        vals = pop_sum[k] / len(pop_idx)
+                    elif aggregation == "weighted":
+                        vals = pop_weighted[k]
                     else:
-                        vals = aggregated_outputs[pop][output_name]
-                        self.series.append(Series(tvecs[result_label], vals, result_label, pop, output_name, data_label[output_name], units=aggregated_units[output_name], timescale=aggregated_timescales[output_name], data_pop=pop))
+                        raise Exception(f'Unknown population aggregation method "{aggregation}"')
+
+                    self.series.append(Series(tvecs[result_label], vals, result_label, pop_name, output_name, data_label[output_name], units=aggregated_units[output_name], timescale=aggregated_timescales[output_name], data_pop=pop_name))
 
         self.results = sc.odict()
         for result in results:
@@ -561,18 +695,28 @@ class PlotData:
         # know how to deal with parameter functions that have unknown units
         assert accumulation_method in ["sum", "integrate"]
 
-        for s in self.series:
-            if accumulation_method == "sum":
+        tvec = self._common_tvec()
+
+        if accumulation_method == "sum":
+            for s in self.series:
                 if not isna(s.timescale):
                     raise Exception('Quantity "%s" has timescale %g which means it should be accumulated by integration, not summation' % (s.output, s.timescale))
-                s.vals = np.cumsum(s.vals)
-            elif accumulation_method == "integrate":
-                if s.timescale:
-                    s.vals = scipy.integrate.cumulative_trapezoid(s.vals, s.tvec / s.timescale)
-                else:
-                    s.vals = scipy.integrate.cumulative_trapezoid(s.vals, s.tvec)
-                s.vals = np.insert(s.vals, 0, 0.0)
+            if tvec is not None:
+                self._set_vals(np.cumsum(self._stack(), axis=1))
+            else:
+                for s in self.series:
+                    s.vals = np.cumsum(s.vals)
+
+        elif accumulation_method == "integrate":
+            if tvec is not None:
+                # Integrating over ``tvec/timescale`` is the same as integrating over ``tvec`` and dividing by the timescale
+                scale = np.array([s.timescale if s.timescale else 1.0 for s in self.series], dtype=float)
+                self._set_vals(scipy.integrate.cumulative_trapezoid(self._stack(), tvec, axis=1, initial=0) / scale[:, None])
+            else:
+                for s in self.series:
+                    s.vals = scipy.integrate.cumulative_trapezoid(s.vals, s.tvec / s.timescale if s.timescale else s.tvec, initial=0)
 
+            for s in self.series:
                 # If integrating a quantity with a timescale, then lose the timescale factor
                 # Otherwise, the units pick up a factor of time
                 if not isna(s.timescale):
@@ -583,8 +727,8 @@ class PlotData:
                     else:
                         s.units += " years"
 
-            else:
-                raise Exception("Unknown accumulation type")
+        else:
+            raise Exception("Unknown accumulation type")
 
         for k, v in self.outputs.items():
             self.outputs[k] = "Cumulative " + v
@@ -646,7 +790,15 @@ class PlotData:
         lower = t_bins[0:-1]
         upper = t_bins[1:]
 
-        for s in self.series:
+        # Integrate all of the series over the bins at once if they share a time axis
+        tvec = self._common_tvec()
+        if tvec is not None:
+            integrals = _bin_integrals(t_bins, tvec, self._stack(), interpolation_method)
+        else:
+            integrals = np.vstack([_bin_integrals(t_bins, s.tvec, s.vals[None, :], interpolation_method) for s in self.series])
+        new_tvec = (lower + upper) / 2.0
+
+        for s, vals in zip(self.series, integrals):
 
             # Decide automatic aggregation method if not specified - this is done on a per-quantity basis
             if time_aggregation is None:
@@ -664,49 +816,8 @@ class PlotData:
             else:
                 scale = 1.0
 
-            vals = np.full(lower.shape, fill_value=np.nan)
-            lower_idx = np.searchsorted(s.tvec, lower, side="left")  # Time index for bin start
-            upper_idx = np.searchsorted(s.tvec, upper, side="right")  # Time index for bin end
-
-            for i, (l, u, l_idx, u_idx) in enumerate(zip(lower, upper, lower_idx, upper_idx)):
-
-                # For bins that partially extend out of bounds, return NaN as the value immediately
-                if l < s.tvec[0] or u > s.tvec[-1]:
-                    vals[i] = np.nan
-                    continue
-                elif l == u:
-                    vals[i] = 0
-                    continue
-
-                # The bins will consist of the actual simulation time points, plus
-                # partial bins that are interpolated before and after if the requested
-                # bins don't line up with the simulation timepoints
-                idx = np.arange(l_idx, u_idx)
-                t2 = s.tvec[idx]
-                interpolate = False
-                if t2[0] > l or t2[-1] < u:
-                    interpolate = True
-                    t2 = list(t2)
-                    if t2[0] > l:
-                        t2.insert(0, l)
-                    if t2[-1] < u:
-                        t2.append(u)
-                    t2 = np.array(t2, dtype=float)
-
-                if interpolation_method == "linear":
-                    if interpolate:
-                        v2 = np.interp(t2, s.tvec, s.vals, left=np.nan, right=np.nan)  # Return NaN outside bounds - it should never be valid to use extrapolated output values in time aggregation
-                    else:
-                        v2 = s.vals[idx]
-                    vals[i] = np.trapezoid(y=v2 / scale, x=t2)  # Note division by timescale here, which annualizes it
-                elif interpolation_method == "previous":
-                    if interpolate:
-                        v2 = scipy.interpolate.interp1d(s.tvec, s.vals, kind="previous", copy=False, assume_sorted=True, bounds_error=False, fill_value=(np.nan, np.nan))(t2)
-                    else:
-                        v2 = s.vals[idx]
-                    vals[i] = sum(v2[:-1] / scale * np.diff(t2))
-
-            s.tvec = (lower + upper) / 2.0
+            vals = vals / scale  # Note division by timescale here, which annualizes it
+            s.tvec = new_tvec
 
             if method == "integrate":
                 s.vals = np.array(vals)
@@ -790,39 +901,7 @@ class PlotData:
         :return: A new :class:`PlotData` instance
         """
 
-        assert isinstance(other, self.__class__), "PlotData subtraction can only operate on another PlotData instance"
-        assert set(self.pops) == set(other.pops), "PlotData subtraction requires both instances to have the same populations"
-        assert set(self.outputs) == set(other.outputs), "PlotData subtraction requires both instances to have the same populations"
-        assert np.array_equal(self.tvals()[0], other.tvals()[0])
-
-        if len(self.results) > 1 and len(other.results) > 1:
-            raise Exception("When subtracting PlotData instances, both of them cannot have more than one result")
-        elif len(other.results) > 1:
-            new = sc.dcp(other)
-        else:
-            new = sc.dcp(self)
-        new.results = sc.odict()
-
-        for s1 in new.series:
-
-            if len(other.results) > 1:
-                s2 = self[self.results[0], s1.pop, s1.output]
-            else:
-                s2 = other[other.results[0], s1.pop, s1.output]
-            assert s1.units == s2.units
-            assert s1.timescale == s2.timescale
-
-            if len(other.results) > 1:
-                # If `b` has more than one result, then `s1` is from `b` and `s2` is from `a`, so the values for `a-b` are `s2-s1`
-                s1.vals = s2.vals - s1.vals
-                s1.result = "%s-%s" % (s2.result, s1.result)
-            else:
-                s1.vals = s1.vals - s2.vals
-                s1.result = "%s-%s" % (s1.result, s2.result)
-
-            new.results[s1.result] = s1.result
-
-        return new
+        return self._combine(other, np.subtract, "-")
 
     def __truediv__(self, other):
         """
@@ -854,6 +933,26 @@ class PlotData:
 
         """
 
+        new = self._combine(other, np.divide, "/")
+        for s in new.series:
+            s.units = ""
+        return new
+
+    def _combine(self, other, op, symbol: str):
+        """
+        Apply a binary operation to two instances
+
+        This implements :meth:`__sub__` and :meth:`__truediv__`. The values for all series are
+        combined in a single array operation, after matching each series in the output
+        with the corresponding series in the instance with only one result.
+
+        :param other: A :class:`PlotData` instance
+        :param op: A binary function operating on arrays e.g., ``np.subtract``
+        :param symbol: The symbol used to construct the new result names e.g., ``'-'``
+        :return: A new :class:`PlotData` instance
+
+        """
+
         assert isinstance(other, self.__class__), "PlotData subtraction can only operate on another PlotData instance"
         assert set(self.pops) == set(other.pops), "PlotData subtraction requires both instances to have the same populations"
         assert set(self.outputs) == set(other.outputs), "PlotData subtraction requires both instances to have the same populations"
@@ -862,27 +961,31 @@ class PlotData:
         if len(self.results) > 1 and len(other.results) > 1:
             raise Exception("When subtracting PlotData instances, both of them cannot have more than one result")
         elif len(other.results) > 1:
+            # If `b` has more than one result, then the series are copied from `b` and matched against `a`, so the values for `a-b` are `op(a,b)` with the arguments reversed
             new = sc.dcp(other)
+            single = self
         else:
             new = sc.dcp(self)
+            single = other
         new.results = sc.odict()
 
-        for s1 in new.series:
-            if len(other.results) > 1:
-                s2 = self[self.results[0], s1.pop, s1.output]
-            else:
-                s2 = other[other.results[0], s1.pop, s1.output]
+        rows = [single._find(single.results[0], s1.pop, s1.output) for s1 in new.series]
+        for s1, row in zip(new.series, rows):
+            s2 = single.series[row]
             assert s1.units == s2.units
             assert s1.timescale == s2.timescale
 
-            if len(other.results) > 1:
-                # If `b` has more than one result, then `s1` is from `b` and `s2` is from `a`, so the values for `a-b` are `s2-s1`
-                s1.vals = s2.vals / s1.vals
-                s1.result = "%s/%s" % (s2.result, s1.result)
+        matched = single._stack()[rows]
+        if single is self:
+            new._set_vals(op(matched, new._stack()))
+        else:
+            new._set_vals(op(new._stack(), matched))
+
+        for s1, row in zip(new.series, rows):
+            if single is self:
+                s1.result = "%s%s%s" % (single.series[row].result, symbol, s1.result)
             else:
-                s1.vals = s1.vals / s2.vals
-                s1.result = "%s/%s" % (s1.result, s2.result)
-            s1.units = ""
+                s1.result = "%s%s%s" % (s1.result, symbol, single.series[row].result)
             new.results[s1.result] = s1.result
 
         return new
@@ -1058,10 +1161,24 @@ class PlotData:
         """
 
         new_tvec = sc.promotetoarray(new_tvec)
+        tvec = self._common_tvec()
+
+        if tvec is None:
+            for series in self.series:
+                series.vals = series.interpolate(new_tvec)
+                series.tvec = np.copy(new_tvec)
+                series.t_labels = np.copy(new_tvec)
+            return self
+
+        # If all series share a time axis, interpolate them together. The new time values are shared by all of the series
+        out_of_bounds = (new_tvec < tvec[0]) | (new_tvec > tvec[-1])
+        if np.any(out_of_bounds):
+            logger.warning("Series have values from %.2f to %.2f so requested time points %s are out of bounds", tvec[0], tvec[-1], new_tvec[out_of_bounds])
+        self._set_vals(_interpolate_rows(new_tvec, tvec, self._stack()))
+        new_tvec = np.array(new_tvec, dtype=float)
         for series in self.series:
-            series.vals = series.interpolate(new_tvec)
-            series.tvec = np.copy(new_tvec)
-            series.t_labels = np.copy(new_tvec)
+            series.tvec = new_tvec
+            series.t_labels = new_tvec
         return self
 
     def __getitem__(self, key: tuple):
@@ -1080,10 +1197,88 @@ class PlotData:
 
         """
 
-        for s in self.series:
-            if s.result == key[0] and s.pop == key[1] and s.output == key[2]:
-                return s
-        raise Exception("Series %s-%s-%s not found" % (key[0], key[1], key[2]))
+        return self.series[self._find(key[0], key[1], key[2])]
+
+    def __getstate__(self):
+        # The stacked values and lookup index are rebuilt when required, so they don't need to be stored
+        d = self.__dict__.copy()
+        d.pop("_vals", None)
+        d.pop("_rows", None)
+        d.pop("_index", None)
+        return d
+
+    def _find(self, result: str, pop: str, output: str) -> int:
+        """
+        Return the index of a Series
+
+        Series are looked up using a dict keyed by ``(result,pop,output)``. The dict is rebuilt if
+        the Series have been modified since it was created (e.g., if a Series was renamed or added).
+
+        :param result: Result name
+        :param pop: Population name
+        :param output: Output name
+        :return: The index of the matching :class:`Series` in ``self.series``
+
+        """
+
+        key = (result, pop, output)
+        index = self.__dict__.get("_index")
+        if index is not None:
+            i = index.get(key)
+            if i is not None and i < len(self.series) and (self.series[i].result, self.series[i].pop, self.series[i].output) == key:
+                return i
+
+        # Build the index in reverse order so that the first matching Series is returned if there are duplicates
+        self._index = {(s.result, s.pop, s.output): i for i, s in reversed(list(enumerate(self.series)))}
+        if key not in self._index:
+            raise Exception("Series %s-%s-%s not found" % (result, pop, output))
+        return self._index[key]
+
+    def _common_tvec(self):
+        """
+        Return the time values shared by all Series
+
+        :return: The time array, or ``None`` if the Series have different time values
+
+        """
+
+        if not self.series:
+            return None
+        tvec = self.series[0].tvec
+        for s in self.series[1:]:
+            if s.tvec is not tvec and not (len(s.tvec) == len(tvec) and np.array_equal(s.tvec, tvec)):
+                return None
+        return tvec
+
+    def _stack(self) -> np.array:
+        """
+        Return the values of all Series as a 2D array
+
+        The values are stored in a single array with one row per :class:`Series`, where ``Series.vals``
+        is a view of its row. This allows operations to be applied to all of the Series at once. If
+        any of the Series have been assigned new values since the array was created, it is rebuilt.
+
+        :return: An array with shape ``(len(self.series), n_times)``
+
+        """
+
+        rows = self.__dict__.get("_rows")
+        if rows is None or len(rows) != len(self.series) or any(s.vals is not row for s, row in zip(self.series, rows)):
+            self._set_vals(np.vstack([s.vals for s in self.series]))
+        return self._vals
+
+    def _set_vals(self, vals: np.array) -> None:
+        """
+        Assign values to all Series
+
+        :param vals: An array with one row per :class:`Series`. Each ``Series.vals`` will be a view of its row
+
+        """
+
+        self._vals = np.asarray(vals, dtype=float)
+        self._rows = list(self._vals)
+        for s, row in zip(self.series, self._rows):
+            s.vals = row
 
     def set_colors(self, colors=None, results="all", pops="all", outputs="all", overwrite=False):
         """
@@ -1148,6 +1343,92 @@ class PlotData:
         return self
 
 
+def _interpolate_rows(x: np.array, xp: np.array, fp: np.array) -> np.array:
+    """
+    Linearly interpolate each row of an array
+
+    This is equivalent to calling ``np.interp(x, xp, row, left=np.nan, right=np.nan)`` for
+    every row of ``fp``, but interpolates all rows at once.
+
+    :param x: Time values to interpolate onto
+    :param xp: Time values for the columns of ``fp``
+    :param fp: 2D array of values with one row per quantity
+    :return: 2D array with shape ``(fp.shape[0], len(x))``
+
+    """
+
+    x = np.asarray(x, dtype=float)
+    if len(xp) == 1:
+        out = np.repeat(fp[:, [0]], len(x), axis=1)
+    else:
+        idx = np.clip(np.searchsorted(xp, x, side="right") - 1, 0, len(xp) - 2)
+        frac = (x - xp[idx]) / (xp[idx + 1] - xp[idx])
+        out = fp[:, idx] + (fp[:, idx + 1] - fp[:, idx]) * frac
+        exact = frac == 0
+        out[:, exact] = fp[:, idx[exact]]  # Return values at the time points exactly, even if the next value is NaN
+        out[:, x == xp[-1]] = fp[:, [-1]]  # Return the final value exactly
+    out[:, (x < xp[0]) | (x > xp[-1])] = np.nan
+    return out
+
+
+def _bin_integrals(edges: np.array, xp: np.array, fp: np.array, interpolation_method: str = "linear") -> np.array:
+    """
+    Integrate each row of an array within bins
+
+    The integral of each row from the first time point is precomputed at every time point. The
+    integral up to each bin edge is then the value at the preceding time point plus the partial
+    segment up to the edge, so every bin is evaluated for all rows at once using a single
+    ``searchsorted``. Bins extending outside ``xp`` are NaN, as are bins overlapping a segment
+    that has a NaN value.
+
+    :param edges: Array of bin edges
+    :param xp: Time values for the columns of ``fp``
+    :param fp: 2D array of values with one row per quantity
+    :param interpolation_method: 'linear' to use the trapezoidal rule, or 'previous' to treat the values as constant until the next time point
+    :return: 2D array with shape ``(fp.shape[0], len(edges)-1)``
+
+    """
+
+    edges = np.asarray(edges, dtype=float)
+    fp = np.asarray(fp, dtype=float)
+    out = np.zeros((fp.shape[0], len(edges) - 1))
+
+    if len(xp) > 1:
+        if interpolation_method == "linear":
+            bad = np.isnan(fp[:, :-1]) | np.isnan(fp[:, 1:])
+            segments = (fp[:, :-1] + fp[:, 1:]) / 2 * np.diff(xp)
+        elif interpolation_method == "previous":
+            bad = np.isnan(fp[:, :-1])
+            segments = fp[:, :-1] * np.diff(xp)
+        else:
+            raise Exception('Unknown interpolation method "%s"' % (interpolation_method))
+        cumulative = np.zeros(fp.shape)
+        np.cumsum(np.where(bad, 0.0, segments), axis=1, out=cumulative[:, 1:])
+        n_bad = np.zeros(fp.shape, dtype=int)
+        np.cumsum(bad, axis=1, out=n_bad[:, 1:])
+
+        # Integral from the start up to each edge, using the segment containing the edge
+        x = np.clip(edges, xp[0], xp[-1])
+        idx = np.clip(np.searchsorted(xp, x, side="right") - 1, 0, len(xp) - 2)
+        dx = x - xp[idx]
+        if interpolation_method == "linear":
+            v = fp[:, idx] + (fp[:, idx + 1] - fp[:, idx]) * (dx / (xp[idx + 1] - xp[idx]))
+            partial = (fp[:, idx] + v) / 2 * dx
+        else:
+            partial = fp[:, idx] * dx
+        integral = cumulative[:, idx] + np.where(bad[:, idx], 0.0, partial)
+        out = np.diff(integral, axis=1)
+
+        # A bin is NaN if any of the segments it overlaps contain NaN values
+        first = np.searchsorted(xp, x[:-1], side="right") - 1
+        last = np.searchsorted(xp, x[1:], side="left")
+        out[(n_bad[:, last] - n_bad[:, first]) > 0] = np.nan
+
+    out[:, edges[:-1] == edges[1:]] = 0
+    out[:, (edges[:-1] < xp[0]) | (edges[1:] > xp[-1])] = np.nan
+    return out
+
+
 class Series:
     """
     Represent a plottable time series
@@ -1170,7 +1451,7 @@ class Series:
     def __init__(self, tvec, vals, result="default", pop="default", output="default", data_label="", color=None, units="", timescale=None, data_pop=""):
         self.tvec = np.copy(tvec)  # : array of time values
         self.t_labels = np.copy(self.tvec)  # : Iterable array of time labels - could be set to strings like [2010-2014]
-        self.vals = np.copy(vals)  # : array of values
+        self.vals = np.array(vals, dtype=float)  # : array of values (converted to double precision, in case the result stores values at reduced precision)
         self.result = result  # : name of the result associated with ths data
         self.pop = pop  # : name of the pop associated with the data
         self.output = output  # : name of the output associated with the data
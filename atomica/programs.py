@@ -16,9 +16,10 @@ from numpy import inf, array, exp
 from xlsxwriter.utility import xl_rowcol_to_cell as xlrc
 
 import sciris as sc
+from .cache import _workbook_key, _workbook_cache_get, _workbook_cache_put
 from .excel import standard_formats, apply_widths, update_widths, read_tables, TimeDependentValuesEntry, validate_category
 from .system import logger, FrameworkSettings as FS
-from .utils import NamedItem, TimeSeries
+from .utils import NamedItem, TimeSeries, _ReadOnly, _state_digest
 from .version import version, gitinfo
 
 __all__ = ["ProgramInstructions", "ProgramSet", "Program", "Covout", "InvalidProgramBook"]
@@ -28,7 +29,7 @@ class InvalidProgramBook(Exception):
     pass
 
 
-class ProgramInstructions:
+class ProgramInstructions(_ReadOnly):
     """
     Store instructions for applying programs
 
@@ -123,6 +124,17 @@ class ProgramInstructions:
                 else:
                     self.coverage[prog_name] = TimeSeries(t=self.start_year, vals=vals)
 
+    @property
+    def digest(self) -> str:
+        """
+        Return a digest of the instructions
+
+        :return: A hexadecimal digest string covering the start/stop years and all overwrites
+
+        """
+
+        return _state_digest(self)
+
     def scale_alloc(self, scale_factor: float) -> None:
         """
         Scale allocation by a constant
@@ -208,6 +220,20 @@ class ProgramSet(NamedItem):
         progset = migrate(self)
         self.__dict__ = progset.__dict__
 
+    @property
+    def digest(self) -> str:
+        """
+        Return a digest of the ProgramSet contents
+
+        The digest covers the programs, their effects, and the available pops, comps and pars.
+        The name and metadata such as the creation time are not included.
+
+        :return: A hexadecimal digest string
+
+        """
+
+        return _state_digest(self, exclude={"name"})
+
     def __repr__(self):
         output = sc.prepr(self)
         output += "    Program set name: %s\n" % self.name
@@ -482,6 +508,13 @@ class ProgramSet(NamedItem):
         if not isinstance(spreadsheet, sc.Spreadsheet):
             spreadsheet = sc.Spreadsheet(spreadsheet)
 
+        # The parsed progbook depends on the framework and data, so they are included in the cache key
+        key = _workbook_key("progbook", spreadsheet, framework, data, _allow_missing_data)
+        cached = _workbook_cache_get(key)
+        if cached is not None:
+            self.__dict__.update(cached)
+            return self
+
         workbook = openpyxl.load_workbook(spreadsheet.tofile(), read_only=True, data_only=True)  # Load in read-only mode for performance, since we don't parse comments etc.
         validate_category(workbook, "atomica:progbook")
 
@@ -504,6 +537,8 @@ class ProgramSet(NamedItem):
             message = 'Error on sheet "Program effects"'
             raise InvalidProgramBook("%s -> %s" % (message, e)) from e
 
+        _workbook_cache_put(key, {k: v for k, v in self.__dict__.items() if k not in {"name", "created", "modified", "version", "gitinfo"}})
+
         return self
 
     def to_workbook(self) -> tuple:
@@ -1201,6 +1236,17 @@ class Program(NamedItem):
         self.saturation = TimeSeries(units=FS.DEFAULT_SYMBOL_INAPPLICABLE)  #: TimeSeries with saturation constraint that is applied to fractional coverage
         self.coverage = TimeSeries(units="people/year")  #: TimeSeries with capacity of program - optional - if not supplied, cost function is assumed to be linear
 
+    @property
+    def digest(self) -> str:
+        """
+        Return a digest of the program
+
+        :return: A hexadecimal digest string covering the targeting and spending data
+
+        """
+
+        return _state_digest(self)
+
     @property
     def is_one_off(self) -> bool:
         """
@@ -1342,7 +1388,7 @@ class Program(NamedItem):
         return prop_covered
 
 
-class Covout:
+class Covout(_ReadOnly):
     """
     Store and compute program outcomes
 
@@ -1386,6 +1432,17 @@ class Covout:
 
         self.update_outcomes()
 
+    @property
+    def digest(self) -> str:
+        """
+        Return a digest of the program outcomes
+
+        :return: A hexadecimal digest string
+
+        """
+
+        return _state_digest(self)
+
     @property
     def n_progs(self) -> int:
         """
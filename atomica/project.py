@@ -20,6 +20,7 @@ In addition, a project contains:
 
 from .version import version, gitinfo
 from .calibration import calibrate
+from .container import save_container, load_container, is_container
 from .data import ProjectData
 from .framework import ProjectFramework
 from .model import run_model
@@ -30,7 +31,7 @@ from .scenarios import Scenario, ParameterScenario, CombinedScenario, BudgetScen
 from .optimization import Optimization, optimize, InvalidInitialConditions
 from .system import logger
 from .utils import NDict, evaluate_plot_string, NamedItem, parallel_progress, Quiet
-from .plotting import PlotData, plot_series
+from .plotting import PlotData, plot_series, plot_batch
 from .results import Result
 from .migration import migrate
 import sciris as sc
@@ -444,7 +445,20 @@ class Project(NamedItem):
     # Methods to perform major tasks
     #######################################################################################################
 
-    def plot(self, results=None, key=None, outputs=None, pops=None):
+    def plot(self, results=None, key=None, outputs=None, pops=None, path=None):
+        """
+        Plot the quantities defined in the framework
+
+        :param results: A :class:`Result` or list of results to plot. If ``None``, results will be retrieved using ``key``
+        :param key: The name or index of results stored in the project
+        :param outputs: Optionally specify the outputs to plot. By default, the plots defined in the framework are used
+        :param pops: A population specification supported by :class:`PlotData`
+        :param path: Optionally save the figures to this folder. The figures are then rendered in parallel by
+                     :func:`plot_batch` and the paths of the saved files are returned instead of the figures
+        :return: A list of figures, or a list of file paths if ``path`` was specified
+
+        """
+
         def get_supported_plots():
             df = self.framework.sheets["plots"][0]
             plots = sc.odict()
@@ -459,22 +473,29 @@ class Project(NamedItem):
             results = self.result(key)
 
         allfigs = []
+        specs = []
         for output in outputs:
             try:
                 if not isinstance(list(output.values())[0], list):
                     output = list(output.values())[0]
                 plotdata = PlotData(results, outputs=output, project=self, pops=pops)
-                figs = plot_series(plotdata, axis="pops", plot_type="stacked", legend_mode="together")
-                allfigs += figs
+                if path is None:
+                    figs = plot_series(plotdata, axis="pops", plot_type="stacked", legend_mode="together")
+                    allfigs += figs
+                else:
+                    specs.append({"plotdata": plotdata, "axis": "pops", "plot_type": "stacked", "legend_mode": "together"})
             except Exception as e:
                 print("WARNING, %s failed (%s)" % (output, str(e)))
+
+        if path is not None:
+            return [fname for fnames in plot_batch(specs, path=path) for fname in fnames]
         return allfigs
 
     def update_settings(self, sim_start=None, sim_end=None, sim_dt=None):
         """Modify the project settings, e.g. the simulation time vector."""
         self.settings.update_time_vector(start=sim_start, end=sim_end, dt=sim_dt)
 
-    def run_sim(self, parset=None, progset=None, progset_instructions=None, store_results=False, result_name: str = None):
+    def run_sim(self, parset=None, progset=None, progset_instructions=None, store_results=False, result_name: str = None, cache=None, record=None):
         """
         Run a single simulation
 
@@ -487,6 +508,9 @@ class Project(NamedItem):
         :param progset_instructions: A :class:`ProgramInstructions` instance. Programs will only be used if a instructions are provided
         :param store_results: If True, then the result will automatically be stored in ``self.results``
         :param result_name: Optionally assign a specific name to the result (otherwise, a unique default name will automatically be selected)
+        :param cache: Optionally provide a :class:`ResultCache`. If a result for identical inputs is present in the cache, it will be
+                      returned without running the model. Otherwise, the new result will be added to the cache
+        :param record: Optionally provide a :class:`RecordSpec` to only keep some of the outputs in the result
         :return: A :class:`Result` instance
 
         """
@@ -507,9 +531,21 @@ class Project(NamedItem):
                 result_name = base_name + "_" + str(k)
                 k += 1
 
-        tm = sc.tic()
-        result = run_model(settings=self.settings, framework=self.framework, parset=parset, progset=progset, program_instructions=progset_instructions, name=result_name)
-        logger.info('Elapsed time for running "%s": %ss', self.name, sc.sigfig(sc.toc(tm, output=True), 3))
+        if cache is not None:
+            key = cache.key(self.settings, self.framework, parset, progset, progset_instructions, record)
+            result = cache.get(key, name=result_name)
+        else:
+            result = None
+
+        if result is None:
+            tm = sc.tic()
+            result = run_model(settings=self.settings, framework=self.framework, parset=parset, progset=progset, program_instructions=progset_instructions, name=result_name, record=record)
+            logger.info('Elapsed time for running "%s": %ss', self.name, sc.sigfig(sc.toc(tm, output=True), 3))
+            if cache is not None:
+                cache.put(key, result)
+        else:
+            logger.debug('Using cached result for "%s"', result_name)
+
         if store_results:
             self.results.append(result)
 
@@ -704,21 +740,37 @@ class Project(NamedItem):
         results = [unoptimized_result, optimized_result]
         return results
 
-    def save(self, filename: str = None, folder: str = None) -> str:
+    def save(self, filename: str = None, folder: str = None, container: bool = False, incremental: bool = False) -> str:
         """
         Save binary project file
 
-        This method saves the entire project as a binary blob to disk
+        By default, this method saves the entire project as a binary blob to disk. If ``container=True``
+        then the project is instead saved as a project container (see :mod:`atomica.container`) in which
+        the results are stored separately from the rest of the project. Loading a container is much faster
+        for projects with many results, because the results are only read when they are first used.
+        :meth:`Project.load` automatically detects which format was used.
+
+        If ``incremental=True``, the project is saved as a container, and if the file is already a container,
+        only the results and components (framework, data, parameter sets and program sets) that have changed
+        are added to it. This is much faster than rewriting the entire file when saving frequently
+        (e.g., after every change to a large project). Items that are no longer used are retained in the file
+        until the next non-incremental save, or until they make up more than half of the file, in which case
+        the container is compacted by rewriting it.
 
         :param filename: Name of the file to save
         :param folder: Optionally specify a folder
+        :param container: If True, save the project as a project container
+        :param incremental: If True, save the project as a container, only writing items that are not already present in the file
         :return: The full path of the file that was saved
 
         """
 
         fullpath = sc.makefilepath(filename=filename, folder=folder, default=[self.filename, self.name], ext="prj", sanitize=True)
         self.filename = fullpath
-        sc.saveobj(fullpath, self)
+        if container or incremental:
+            save_container(self, fullpath, incremental=incremental)
+        else:
+            sc.saveobj(fullpath, self)
         return fullpath
 
     @staticmethod
@@ -728,14 +780,18 @@ class Project(NamedItem):
 
         This method is an alternate constructor that is used to load a binary file
         saved using :meth:`Project.save`. Migration is automatically performed as
-        part of the loading operation.
+        part of the loading operation. If the file is a project container, the
+        results are loaded when they are first accessed.
 
         :param filepath: The file path/name to load
         :return: A new :class:`Project` instance
 
         """
 
-        P = sc.loadobj(filepath, die=True)
+        if is_container(filepath):
+            P = load_container(filepath)
+        else:
+            P = sc.loadobj(filepath, die=True)
         assert isinstance(P, Project)
         return P
 
@@ -66,11 +66,13 @@ def _update_progset(asd_vals, mapping, progset):
     # - progset : ProgramSet to modify, should have only one time
     for x, target in zip(asd_vals, mapping):
         if target[0] == "unit_cost":
-            assert len(progset.programs[target[1]].unit_cost.vals) == 1
-            progset.programs[target[1]].unit_cost.vals[0] = x
+            ts = progset.programs[target[1]].unit_cost
+            assert len(ts.vals) == 1
+            ts.insert(ts.t[0], x)
         elif target[0] == "capacity_constraint":
-            assert len(progset.programs[target[1]].capacity_constraint.vals) == 1
-            progset.programs[target[1]].capacity_constraint.vals[0] = x
+            ts = progset.programs[target[1]].capacity_constraint
+            assert len(ts.vals) == 1
+            ts.insert(ts.t[0], x)
         elif target[0] == "baseline":
             progset.covouts[(target[1], target[2])].baseline = x
         elif target[0] == "outcome":
@@ -6,7 +6,13 @@ providing methods to conveniently access, plot, and export model outputs.
 
 """
 
-from collections import defaultdict
+import functools
+import io
+import json
+import os
+import pickle
+import zlib
+from collections import defaultdict, OrderedDict
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -24,7 +30,87 @@ from .utils import NamedItem, evaluate_plot_string, nested_loop
 from .function_parser import parse_function
 from .version import version, gitinfo
 
-__all__ = ["Result", "export_results", "Ensemble"]
+__all__ = ["Result", "export_results", "export_long", "Ensemble"]
+
+_COMPACT_CACHE_SIZE = 4  # Number of models from compact results that are kept in memory after being rebuilt
+_compact_cache = OrderedDict()  # {id(compact): (compact, model)} with the most recently used model at the end
+
+
+class _CompactModel:
+    """
+    Compact storage for a completed model
+
+    A :class:`Model` is a graph of populations and integration objects, each of which is a Python
+    object with its own attributes and references to other objects. This class stores the same
+    information as
+
+    - One flat array per dtype containing the values of all of the variables
+    - A compressed byte string storing the structure of the model (names, units, and the
+      relationships between variables), with references to positions in the arrays
+    - References to the framework, progset and program instructions, which are not copied
+
+    The model can then be rebuilt with :meth:`_CompactModel.load` when it is required.
+
+    :param model: A :class:`Model` instance. The model is consolidated, and should not be used afterwards
+
+    """
+
+    _shared = ("framework", "progset", "program_instructions")  # Model attributes that are stored by reference
+
+    def __init__(self, model):
+        from .container import _ArrayPickler  # Avoid circular import
+
+        model.consolidate()  # The values are then detached from the model as a single array, rather than being copied when pickling
+        shared = {attr: model.__dict__[attr] for attr in self._shared}
+        for attr in self._shared:
+            setattr(model, attr, None)
+        try:
+            f = io.BytesIO()
+            pickler = _ArrayPickler(f)
+            pickler.dump(model)
+        finally:
+            for attr, obj in shared.items():
+                setattr(model, attr, obj)
+
+        self.structure = zlib.compress(f.getvalue(), 1)  #: Compressed pickle of the model without its arrays
+        self.buffers = pickler.buffers()  #: Dict with a flat array of values for each dtype
+        self.framework = shared["framework"]
+        self.progset = shared["progset"]
+        self.program_instructions = shared["program_instructions"]
+
+    def load(self):
+        """
+        Rebuild the model
+
+        The arrays in the rebuilt model are views of the arrays stored in this object, so
+        rebuilding the model does not copy the values. Because a rebuilt model may be discarded
+        and rebuilt at any time, the values are read-only and the model's attributes cannot be
+        assigned. Copies of the rebuilt model can be modified as normal.
+
+        :return: A :class:`Model` instance
+
+        """
+
+        from .container import _ArrayUnpickler  # Avoid circular import
+
+        for buffer in self.buffers.values():
+            buffer.flags.writeable = False  # The views in the rebuilt model are then also read-only
+        model = _ArrayUnpickler(io.BytesIO(zlib.decompress(self.structure)), self.buffers).load()
+        for attr in self._shared:
+            setattr(model, attr, getattr(self, attr))
+        model._readonly = True
+        return model
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Return storage size
+
+        :return: The number of bytes used to store the values and structure (excluding the shared framework and progset)
+
+        """
+
+        return len(self.structure) + sum(x.nbytes for x in self.buffers.values())
 
 
 class Result(NamedItem):
@@ -66,12 +152,108 @@ class Result(NamedItem):
         self.parset_name = parset.name if parset is not None else None  # : The name of the ParameterSet that was used for the simulation
         self.pop_names = [x.name for x in self.model.pops]  # : A list of the population names present. This gets frequently used, so it is saved as an actual output
 
+    def __setattr__(self, name, value):
+        # Cached function values are discarded if the model is replaced (e.g., when the result is compacted)
+        object.__setattr__(self, name, value)
+        if name in {"model", "_compact"}:
+            self.__dict__.pop("_function_cache", None)
+        if name == "model":
+            self.__dict__.pop("_compact", None)  # Assigning a model (e.g., a modifiable copy of a rebuilt model) replaces the compact storage
+
     def __setstate__(self, d):
-        from .migration import migrate
+        from .migration import migrate, migration_required
 
         self.__dict__ = d
+        if "model" in d and migration_required(self):
+            # Results from older versions are migrated when they are first used, rather than when
+            # they are loaded. Until then, the model is stored under a different name so that
+            # ``__getattr__`` is called when it is accessed
+            self.__dict__["_unmigrated_model"] = self.__dict__.pop("model")
+        else:
+            result = migrate(self)
+            self.__dict__ = result.__dict__
+
+    def __getstate__(self):
+        if "_model_ref" in self.__dict__ or "_unmigrated_model" in self.__dict__:
+            self.model  # If the result was loaded from a project container or requires migration, make sure the model is loaded before copying or pickling
+        if "_function_cache" in self.__dict__:
+            d = dict(self.__dict__)
+            del d["_function_cache"]  # Cached values are recomputed when required rather than being saved
+            return d
+        return self.__dict__
+
+    def _migrate(self) -> None:
+        """
+        Migrate a result that was loaded from an older version
+
+        This runs the migrations for the :class:`Result` and then any migrations for the result that were
+        deferred by the migration of the :class:`Project` containing it (see ``migration.migrate_results``).
+
+        """
+
+        from .migration import migrate
+
+        self.model = self.__dict__.pop("_unmigrated_model")
+        deferred = self.__dict__.pop("_deferred_migrations", [])
         result = migrate(self)
         self.__dict__ = result.__dict__
+        for fcn in deferred:
+            fcn(self)
+
+    def __getattr__(self, attr):
+        # Results loaded from a project container store a reference to the model in the container,
+        # and only read the model when it is first accessed. ``__getattr__`` is only called if normal
+        # attribute lookup fails, so this has no overhead once the model has been loaded
+        if "_unmigrated_model" in self.__dict__ and not attr.startswith("__"):
+            # Results that require migration are migrated when any attribute not present in the stored result is first accessed
+            self._migrate()
+            return getattr(self, attr)
+        elif attr == "model" and "_model_ref" in self.__dict__:
+            self.model = self.__dict__.pop("_model_ref").load()
+            return self.model
+        elif attr == "model" and "_compact" in self.__dict__:
+            # Compact results rebuild their model when it is accessed. A small number of rebuilt models are kept
+            # so that repeated accesses (e.g., while constructing PlotData) do not rebuild the model each time
+            compact = self.__dict__["_compact"]
+            key = id(compact)
+            if key in _compact_cache:
+                _compact_cache.move_to_end(key)
+            else:
+                _compact_cache[key] = (compact, compact.load())
+                while len(_compact_cache) > _COMPACT_CACHE_SIZE:
+                    _compact_cache.popitem(last=False)
+            return _compact_cache[key][1]
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{attr}'")
+
+    def compact(self):
+        """
+        Store the result in compact form
+
+        By default, a :class:`Result` contains a complete :class:`Model` with all of its populations and
+        integration objects, which uses considerably more memory than the values themselves. This
+        method replaces the model with a compact representation consisting of the arrays of values, the
+        (compressed) structure of the model, and references to the framework, progset and program
+        instructions. This is intended for cases where a large number of results need to be held in memory
+        at the same time, such as in sampling or optimization.
+
+        Compact results can be used in the same way as normal results (e.g., with :meth:`Result.get_variable`,
+        :class:`PlotData`, :meth:`Result.get_coverage` and :meth:`Result.export_raw`). The model is rebuilt
+        when it is accessed, and the most recently used models are retained so that repeated accesses are fast.
+        The rebuilt model is read-only, because it may be discarded and rebuilt at any time. To modify
+        the model, assign a copy of it to ``Result.model`` (e.g., ``result.model = sc.dcp(result.model)``).
+
+        Example usage:
+
+        >>> results = [P.run_sim(parset=sample).compact() for sample in samples]
+
+        :return: The same :class:`Result` instance, to facilitate chaining
+
+        """
+
+        if "_compact" not in self.__dict__:
+            self._compact = _CompactModel(self.model)
+            del self.model
+        return self
 
     @property
     def used_programs(self) -> bool:
@@ -389,6 +571,76 @@ class Result(NamedItem):
                 raise NotFoundError(f"Variable '{name}' was not found in any populations")
             return vars
 
+    def evaluate_function(self, fcn_str: str, pops: list = None) -> np.ndarray:
+        """
+        Evaluate a function of model outputs
+
+        This method evaluates a function string such as ``'a/b'`` in each of the requested populations,
+        using the same conventions as parameter functions in the framework. Flow rates are annualized, and
+        the time ``t`` and step size ``dt`` are available to the function. The function is compiled once, and
+        evaluated for all populations at once. The values are cached in the :class:`Result`, so evaluating
+        the same function again (e.g., when constructing :class:`PlotData` repeatedly) does not recompute it.
+
+        The cache is reset if the model is replaced, but not if the values in the model are modified in place.
+        In that case, call :meth:`Result.clear_cache` after modifying the values.
+
+        :param fcn_str: A string containing a function of variable code names
+        :param pops: A population name, or list of population names. If ``None``, all populations will be used
+        :return: Array of values with shape ``(len(pops), len(self.t))``
+
+        """
+
+        pops = self.pop_names if pops is None else sc.promotetolist(pops)
+        cache = self.__dict__.setdefault("_function_cache", {})  # {(fcn_str, pop_name): vals}
+        missing = [pop_name for pop_name in pops if (fcn_str, pop_name) not in cache]
+        if missing:
+            self._evaluate_function(fcn_str, missing, cache)
+        return np.array([cache[fcn_str, pop_name] for pop_name in pops]).reshape(len(pops), len(self.t))
+
+    def _evaluate_function(self, fcn_str: str, pops: list, cache: dict) -> None:
+        # Evaluate a function in multiple populations and store the values in the cache. The dependencies for every
+        # population are stacked into arrays with shape (pop, time) so the function only needs to be called once
+        from .model import Characteristic, Compartment, Link, Parameter  # Avoid circular import
+
+        fcn, dep_labels = _compile_function(fcn_str)
+        dt = self.dt
+        dep_vals = {}
+        for dep_label in dep_labels:
+            if dep_label in {"t", "dt"}:
+                continue
+            dep_vals[dep_label] = np.zeros((len(pops), len(self.t)))
+            for i, pop_name in enumerate(pops):
+                for var in self.model.get_pop(pop_name).get_variable(dep_label):
+                    if isinstance(var, Link):
+                        dep_vals[dep_label][i] += var.vals / dt
+                    elif isinstance(var, (Parameter, Characteristic, Compartment)):
+                        dep_vals[dep_label][i] += var.vals
+                    else:
+                        raise Exception(f'Unhandled dependency "{dep_label}" in function "{fcn_str}"')
+        dep_vals["t"] = self.t
+        dep_vals["dt"] = dt
+
+        try:
+            vals = np.broadcast_to(fcn(**dep_vals), (len(pops), len(self.t))).astype(float)
+        except Exception as e:
+            raise Exception(f'Error when evaluating function "{fcn_str}" in result "{self.name}"') from e
+
+        vals.flags.writeable = False
+        for i, pop_name in enumerate(pops):
+            cache[fcn_str, pop_name] = vals[i]
+
+    def clear_cache(self) -> None:
+        """
+        Remove cached function values
+
+        Values computed by :meth:`Result.evaluate_function` are cached, and the cache is automatically
+        reset if the model is replaced. This method only needs to be called if the values stored in the
+        model have been modified in place.
+
+        """
+
+        self.__dict__.pop("_function_cache", None)
+
     def export_raw(self, filename=None) -> pd.DataFrame:
         """
         Save raw outputs
@@ -413,13 +665,17 @@ class Result(NamedItem):
 
         for pop in self.model.pops:
             for comp in pop.comps:
-                d[("Compartments", pop.name, comp.name, gl(comp.name))] = comp.vals
+                if comp.vals is not None:
+                    d[("Compartments", pop.name, comp.name, gl(comp.name))] = comp.vals
             for charac in pop.characs:
-                d[("Characteristics", pop.name, charac.name, gl(charac.name))] = charac.vals
+                if charac.vals is not None:
+                    d[("Characteristics", pop.name, charac.name, gl(charac.name))] = charac.vals
             for par in pop.pars:
                 if par.vals is not None:
                     d[("Parameters", pop.name, par.name, gl(par.name))] = par.vals
             for link in pop.links:
+                if link.vals is None:
+                    continue  # Skip flows that were not recorded
                 # Sum over duplicate links and annualize flow rate
                 if link.parameter is None:
                     link_name = "-"
@@ -438,7 +694,7 @@ class Result(NamedItem):
                 d[key] += link.vals / self.dt
 
         # Create DataFrame from dict
-        df = pd.DataFrame(d, index=self.t)
+        df = pd.DataFrame(d, index=self.t, dtype=float)  # Values are exported in double precision even if they are stored at reduced precision
         df.index.name = "Time"
 
         # Optionally save it
@@ -497,6 +753,13 @@ class Result(NamedItem):
         return h
 
 
+@functools.lru_cache(maxsize=256)
+def _compile_function(fcn_str: str) -> tuple:
+    # Parse a function string once, for evaluating the same output function in multiple results
+    fcn, deps = parse_function(fcn_str)
+    return fcn, tuple(dict.fromkeys(deps))
+
+
 def _filter_pops_by_output(result, output) -> list:
     """
     Helper function for plotting quantities
@@ -868,6 +1131,536 @@ def _write_df(writer, formats, sheet_name, df, level_ordering):
             worksheet.set_column(i, i, required_width[i] * 1.1 + 1)
 
 
+def _open_text(fname: Path, compression: str = "infer"):
+    """
+    Open a text file for writing with optional compression
+
+    :param fname: The file to write
+    :param compression: One of ``'gzip'``, ``'bz2'``, ``'xz'`` or ``None``. If ``'infer'``, the compression
+                        is selected based on the file extension (``.gz``, ``.bz2`` or ``.xz``)
+    :return: A file handle open for writing text
+
+    """
+
+    if compression == "infer":
+        compression = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}.get(fname.suffix.lower())
+
+    if compression is None:
+        return open(fname, "w", newline="")
+    elif compression == "gzip":
+        import gzip
+
+        return gzip.open(fname, "wt", newline="")
+    elif compression == "bz2":
+        import bz2
+
+        return bz2.open(fname, "wt", newline="")
+    elif compression == "xz":
+        import lzma
+
+        return lzma.open(fname, "wt", newline="")
+    else:
+        raise Exception(f'Unknown compression "{compression}" - must be one of "gzip", "bz2", "xz" or None')
+
+
+def _result_rows(result, outputs=None, pops=None):
+    """
+    Generate long-format values for a Result
+
+    Values are yielded one variable at a time, so that the rows for an entire result never
+    need to be assembled in memory. As with :meth:`Result.export_raw`, flow rates are annualized
+    and summed over duplicate links.
+
+    :param result: A :class:`Result` instance
+    :param outputs: Optionally a list of variable code names to include
+    :param pops: Optionally a list of population names to include
+    :return: Generator yielding tuples of ``(pop name, variable name, values)``
+
+    """
+
+    outputs = set(sc.promotetolist(outputs)) if outputs is not None else None
+    pops = set(sc.promotetolist(pops)) if pops is not None else None
+
+    for pop in result.model.pops:
+        if pops is not None and pop.name not in pops:
+            continue
+
+        for var in pop.comps + pop.characs + pop.pars:
+            if (outputs is None or var.name in outputs) and var.vals is not None:
+                yield pop.name, var.name, var.vals
+
+        flows = dict()
+        for link in pop.links:
+            if link.vals is None:
+                continue  # Skip flows that were not recorded
+            link_name = f"{link.source.name}:{link.dest.name}:flow" if link.parameter is None else link.name
+            if outputs is not None and link_name not in outputs:
+                continue
+            if link_name not in flows:
+                flows[link_name] = np.zeros(result.t.shape)
+            flows[link_name] += link.vals / result.dt
+        for link_name, vals in flows.items():
+            yield pop.name, link_name, vals
+
+
+def export_long(results, filename, outputs=None, pops=None, chunksize: int = 100000, compression: str = "infer") -> Path:
+    """
+    Export values to a long-format CSV file
+
+    This function writes a CSV file with one row per value, with columns ``result``, ``pop``, ``variable``,
+    ``time`` and ``value``. Unlike :func:`export_results` and :meth:`Result.export_raw`, the output
+    is not assembled in memory or formatted for Excel. Instead, rows are accumulated and written to the file
+    in chunks of ``chunksize`` rows, so very large exports (e.g., many scenarios with many populations) can
+    be written with bounded memory usage. The file can optionally be compressed as it is written.
+
+    If an :class:`Ensemble` is provided, the values in every sample are written, with an additional ``sample``
+    column containing the sample index (or ``'baseline'`` for the baseline, if one has been set). In that case,
+    the variables are the outputs of the Ensemble's mapping function. For Ensembles stored on disk, the samples
+    are read from the store one at a time. Streaming Ensembles do not store their samples, so they cannot be
+    exported - use :meth:`Ensemble.summary_statistics` instead.
+
+    Example usage:
+
+    >>> at.export_long(scen_results, 'results.csv.gz')
+    >>> df = pd.read_csv('results.csv.gz')
+
+    :param results: A :class:`Result`, a list/dict of Results, or an :class:`Ensemble`
+    :param filename: The file to write. Compression is inferred from the extension (e.g., ``.csv.gz``) by default
+    :param outputs: Optionally a list of variable code names (or Ensemble outputs) to include. By default, all variables are included
+    :param pops: Optionally a list of population names to include. By default, all populations are included
+    :param chunksize: Number of rows to accumulate before writing them to the file
+    :param compression: One of ``'gzip'``, ``'bz2'``, ``'xz'`` or ``None``. If ``'infer'``, use the file extension
+    :return: The name of the file that was written
+
+    """
+
+    output_fname = Path(filename).resolve()
+
+    if isinstance(results, Ensemble):
+        if results.streaming:
+            raise Exception("Streaming Ensembles do not store samples, so they cannot be exported. Use Ensemble.summary_statistics() to export the summary statistics instead")
+        columns = ["sample", "result", "pop", "variable", "time", "value"]
+
+        def blocks():
+            outputs_set = set(sc.promotetolist(outputs)) if outputs is not None else None
+            pops_set = set(sc.promotetolist(pops)) if pops is not None else None
+
+            def selected(key):
+                return (outputs_set is None or key[2] in outputs_set) and (pops_set is None or key[1] in pops_set)
+
+            samples = [("baseline", results.baseline)] if results.baseline is not None else []
+            samples += list(enumerate(results.samples))
+            for sample, plotdata in samples:
+                for series in plotdata.series:
+                    if selected((series.result, series.pop, series.output)):
+                        yield (sample, series.result, series.pop, series.output), series.tvec, series.vals
+            if results.store is not None and results.store.count:
+                # Samples stored on disk are read one at a time from the memory-mapped array
+                tvec = results.store.template.series[0].tvec
+                for sample, vals in enumerate(results.store.values()):
+                    for key, row in zip(results.store.keys, vals):
+                        if selected(key):
+                            yield (sample,) + key, tvec, row
+
+    else:
+        if isinstance(results, dict):
+            results = list(results.values())
+        else:
+            results = sc.promotetolist(results)
+
+        result_names = [x.name for x in results]
+        if len(set(result_names)) != len(result_names):
+            raise Exception("Results must have different names (in their result.name property)")
+
+        columns = ["result", "pop", "variable", "time", "value"]
+
+        def blocks():
+            for result in results:
+                for pop_name, var_name, vals in _result_rows(result, outputs, pops):
+                    yield (result.name, pop_name, var_name), result.t, vals
+
+    chunk = []
+    n_rows = 0
+    header = True
+
+    def flush(f):
+        nonlocal chunk, n_rows, header
+        if chunk:
+            pd.concat(chunk, ignore_index=True).to_csv(f, header=header, index=False)
+            header = False
+        chunk = []
+        n_rows = 0
+
+    with _open_text(output_fname, compression) as f:
+        for labels, t, vals in blocks():
+            df = pd.DataFrame({"time": t, "value": np.asarray(vals, dtype=float)})  # Values are exported in double precision even if they are stored at reduced precision
+            for i, (name, label) in enumerate(zip(columns, labels)):
+                df.insert(i, name, label)
+            chunk.append(df)
+            n_rows += len(df)
+            if n_rows >= chunksize:
+                flush(f)
+        flush(f)
+        if header:
+            f.write(",".join(columns) + "\n")  # Write the header even if there were no rows
+
+    return output_fname
+
+
+def _sample_stat(vals: np.array, stat) -> np.array:
+    """
+    Compute a statistic over samples
+
+    :param vals: An array of values where the first dimension indexes the samples
+    :param stat: One of ``'mean'``, ``'std'``, ``'min'``, ``'max'``, ``'median'``, or a quantile between 0 and 1
+    :return: An array with the statistic computed along the first dimension
+
+    """
+
+    if stat == "mean":
+        return np.mean(vals, axis=0)
+    elif stat == "std":
+        return np.std(vals, axis=0)
+    elif stat == "min":
+        return np.min(vals, axis=0)
+    elif stat == "max":
+        return np.max(vals, axis=0)
+    elif stat == "median":
+        return np.median(vals, axis=0)
+    else:
+        return np.quantile(vals, stat, axis=0)
+
+
+def _year_key(year):
+    # Return a hashable key for the years used to cache Ensemble statistics
+    return None if year is None else tuple(sc.promotetoarray(year).tolist())
+
+
+class _SampleStatistics:
+    """
+    Mergeable summary statistics for sampled time series
+
+    This class accumulates the number of samples, running mean and variance (combining batches with
+    Chan's parallel algorithm), and the minimum and maximum at each time point. Quantiles are estimated
+    with a t-digest sketch at each time point: the samples are stored as weighted centroids, and
+    once there are more than ``2*compression`` centroids, neighbouring centroids are combined so that at most
+    ``compression`` remain. Centroids are kept smaller near the tails of the distribution, so extreme
+    quantiles remain accurate. The memory required therefore does not depend on the number of samples.
+
+    Instances can be combined with :meth:`merge`, so statistics accumulated in parallel give the same
+    means and variances as if all of the samples had been added to one instance.
+
+    :param n_times: Number of time points in each sample
+    :param compression: Maximum number of centroids after compression. If ``None``, all samples are kept
+
+    """
+
+    def __init__(self, n_times: int, compression: int = 100):
+        self.compression = compression
+        self.n = 0  #: Number of samples
+        self.mean = np.zeros(n_times)  #: Mean at each time point
+        self.m2 = np.zeros(n_times)  #: Sum of squared differences from the mean at each time point
+        self.min = np.full(n_times, np.inf)  #: Minimum at each time point
+        self.max = np.full(n_times, -np.inf)  #: Maximum at each time point
+        self.centroids = np.empty((0, n_times))  #: Centroid values, with one column per time point
+        self.weights = np.empty((0, n_times))  #: Number of samples represented by each centroid
+
+    def add(self, vals: np.array) -> None:
+        """
+        Add samples
+
+        :param vals: Array of values for one sample, or a 2D array with one row per sample
+
+        """
+
+        vals = np.atleast_2d(np.asarray(vals, dtype=float))
+        mean = vals.mean(axis=0)
+        self._combine(vals.shape[0], mean, ((vals - mean) ** 2).sum(axis=0), vals.min(axis=0), vals.max(axis=0), vals, np.ones(vals.shape))
+
+    def merge(self, other) -> None:
+        """
+        Add the samples accumulated in another instance
+
+        :param other: A :class:`_SampleStatistics` instance with the same number of time points
+
+        """
+
+        self._combine(other.n, other.mean, other.m2, other.min, other.max, other.centroids, other.weights)
+
+    def _combine(self, n, mean, m2, vmin, vmax, centroids, weights) -> None:
+        if not n:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + delta**2 * (self.n * n / total)
+        self.n = total
+        self.min = np.fmin(self.min, vmin)
+        self.max = np.fmax(self.max, vmax)
+        self.centroids = np.vstack([self.centroids, centroids])
+        self.weights = np.vstack([self.weights, weights])
+        if self.compression is not None and self.centroids.shape[0] > 2 * self.compression:
+            self._compress()
+
+    def _sorted(self) -> tuple:
+        # Return the centroids and weights sorted by value within each time point
+        order = np.argsort(self.centroids, axis=0, kind="stable")
+        return np.take_along_axis(self.centroids, order, axis=0), np.take_along_axis(self.weights, order, axis=0)
+
+    def _compress(self) -> None:
+        # Assign the centroids to bins using the t-digest scale function k(q) = compression*(arcsin(2q-1)/pi + 1/2)
+        # which has equal sized bins in k, corresponding to narrow bins in q near 0 and 1
+        c, w = self._sorted()
+        cum = np.cumsum(w, axis=0)
+        q = (cum - w / 2) / self.n
+        k = np.minimum(np.floor(self.compression * (np.arcsin(np.clip(2 * q - 1, -1, 1)) / np.pi + 0.5)), self.compression - 1).astype(int)
+        k += self.compression * np.arange(c.shape[1])  # Offset the bins for each time point
+        size = self.compression * c.shape[1]
+        new_w = np.bincount(k.ravel(), weights=w.ravel(), minlength=size).reshape(c.shape[1], self.compression).T
+        new_c = np.bincount(k.ravel(), weights=(w * np.where(w > 0, c, 0)).ravel(), minlength=size).reshape(c.shape[1], self.compression).T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            new_c = new_c / new_w
+        self.centroids = np.where(new_w > 0, new_c, self.max)  # Empty bins have no weight, and sort to the end
+        self.weights = new_w
+
+    def quantile(self, q: float) -> np.array:
+        """
+        Estimate a quantile at each time point
+
+        This matches ``np.quantile`` (with linear interpolation) if no compression has taken place.
+        Each centroid is positioned at the mean rank of the samples it contains, and values are
+        linearly interpolated between centroids.
+
+        :param q: Quantile between 0 and 1
+        :return: Array with the estimated quantile at each time point
+
+        """
+
+        c, w = self._sorted()
+        pos = np.cumsum(w, axis=0) - (w + 1) / 2
+        c = np.vstack([self.min, c, self.max])
+        pos = np.vstack([np.zeros_like(self.min), pos, np.full_like(self.min, self.n - 1)])
+        target = q * (self.n - 1)
+        idx = np.clip((pos < target).sum(axis=0), 1, c.shape[0] - 1)[None, :]
+        c_lo, c_hi = np.take_along_axis(c, idx - 1, axis=0)[0], np.take_along_axis(c, idx, axis=0)[0]
+        p_lo, p_hi = np.take_along_axis(pos, idx - 1, axis=0)[0], np.take_along_axis(pos, idx, axis=0)[0]
+        frac = np.divide(target - p_lo, p_hi - p_lo, out=np.zeros_like(p_lo), where=p_hi > p_lo)
+        return c_lo + np.clip(frac, 0, 1) * (c_hi - c_lo)
+
+    def distribution(self, idx: int) -> tuple:
+        """
+        Return the sketch of the distribution at a time point
+
+        :param idx: Time index
+        :return: Tuple of ``(values, weights)`` arrays for the non-empty centroids
+
+        """
+
+        keep = self.weights[:, idx] > 0
+        return self.centroids[keep, idx], self.weights[keep, idx]
+
+    def get(self, stat) -> np.array:
+        """
+        Return a statistic at each time point
+
+        :param stat: One of ``'mean'``, ``'std'``, ``'min'``, ``'max'``, ``'median'``, or a quantile between 0 and 1
+        :return: Array of values
+
+        """
+
+        if stat == "mean":
+            return self.mean.copy()
+        elif stat == "std":
+            return np.sqrt(self.m2 / self.n)
+        elif stat == "min":
+            return self.min.copy()
+        elif stat == "max":
+            return self.max.copy()
+        elif stat == "median":
+            return self.quantile(0.5)
+        else:
+            return self.quantile(stat)
+
+
+class _SampleStore:
+    """
+    Disk-backed storage for Ensemble samples
+
+    The values of each sample are written into a preallocated, memory-mapped array on disk with shape
+    ``(capacity, n_series, n_times)``, with one row per sample. The folder contains
+
+    - ``template.pkl`` - the first sample, which provides the results, populations, outputs, units,
+      colors and time values for all samples
+    - ``values.dat`` - the raw values for all samples
+    - ``done.dat`` - a flag for each row indicating whether the sample has been written
+    - ``store.json`` - the capacity and array shape
+
+    Each sample is flushed to disk before it is flagged as being written, so if sampling is interrupted,
+    the completed samples are retained and sampling can be resumed. Multiple processes can write different
+    rows at the same time, which allows parallel workers to write their samples directly to the store.
+
+    :param path: Folder to store the samples in. If the folder already contains samples, they will be opened
+
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)  #: Folder containing the stored samples
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.template = None  #: The first :class:`PlotData` sample, or ``None`` if no samples have been stored
+        self.keys = []  #: List of ``(result,pop,output)`` tuples for the series in each sample
+        self.capacity = 0  #: Number of rows allocated in the array
+        self._values = None
+        self._done = None
+        if (self.path / "store.json").exists():
+            with open(self.path / "template.pkl", "rb") as f:
+                self._set_template(pickle.load(f))
+            self.capacity = json.loads((self.path / "store.json").read_text())["capacity"]
+            self._map()
+
+    def __repr__(self):
+        return sc.prepr(self)
+
+    def __getstate__(self):
+        # The memory maps are recreated when the store is unpickled (e.g., when passed to a parallel worker)
+        d = self.__dict__.copy()
+        d["_values"] = None
+        d["_done"] = None
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__ = d
+        if self.capacity:
+            self._map()
+
+    def _set_template(self, plotdata) -> None:
+        self.template = plotdata
+        self.keys = [(s.result, s.pop, s.output) for s in plotdata.series]
+
+    @property
+    def shape(self) -> tuple:
+        return (self.capacity, len(self.keys), len(self.template.series[0].tvec))
+
+    def _map(self) -> None:
+        self._values = np.memmap(self.path / "values.dat", dtype=float, mode="r+", shape=self.shape)
+        self._done = np.memmap(self.path / "done.dat", dtype=np.uint8, mode="r+", shape=(self.capacity,))
+
+    def initialize(self, plotdata, capacity: int = 1) -> None:
+        """
+        Set up the store using the first sample
+
+        :param plotdata: A :class:`PlotData` instance, whose series must all have the same time values
+        :param capacity: Number of samples to allocate space for
+
+        """
+
+        if plotdata._common_tvec() is None:
+            raise Exception("Samples can only be stored on disk if all of the series have the same time values")
+        self.clear()
+        self._set_template(plotdata)
+        tmp = self.path / f"template.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(plotdata, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path / "template.pkl")
+        self.reserve(max(capacity, 1))
+
+    def reserve(self, capacity: int) -> None:
+        """
+        Allocate space for samples
+
+        The files are extended in place, so existing samples are not copied.
+
+        :param capacity: Minimum number of samples to allocate space for
+
+        """
+
+        if capacity <= self.capacity:
+            return
+        self._values = None  # Release the existing maps before resizing the files
+        self._done = None
+        row_size = int(np.prod(self.shape[1:])) * np.dtype(float).itemsize
+        for fname, size in [("values.dat", capacity * row_size), ("done.dat", capacity)]:
+            with open(self.path / fname, "ab") as f:
+                f.truncate(size)
+        self.capacity = capacity
+        (self.path / "store.json").write_text(json.dumps({"capacity": capacity, "n_series": self.shape[1], "n_times": self.shape[2], "version": version}))
+        self._map()
+
+    def write(self, slot: int, plotdata) -> None:
+        """
+        Write a sample
+
+        :param slot: The row to write the sample into. Space is allocated if required
+        :param plotdata: A :class:`PlotData` instance with the same series as the template
+
+        """
+
+        if slot >= self.capacity:
+            self.reserve(max(2 * self.capacity, slot + 1))
+        if [(s.result, s.pop, s.output) for s in plotdata.series] == self.keys:
+            self._values[slot] = plotdata._stack()
+        else:
+            self._values[slot] = [plotdata[key].vals for key in self.keys]
+        self._values.flush()
+        self._done[slot] = 1  # Only flag the sample as written once the values are on disk
+        self._done.flush()
+
+    def missing(self, n_samples: int) -> list:
+        """
+        Return rows that have not been written
+
+        :param n_samples: Total number of samples required
+        :return: List of row indices less than ``n_samples`` that do not contain a sample
+
+        """
+
+        written = np.zeros(n_samples, dtype=bool)
+        written[: min(n_samples, self.capacity)] = self._done[:n_samples] if self.capacity else []
+        return [int(x) for x in np.flatnonzero(~written)]
+
+    @property
+    def count(self) -> int:
+        """
+        Return number of stored samples
+
+        :return: The number of samples that have been written
+
+        """
+
+        return int(np.count_nonzero(self._done)) if self.capacity else 0
+
+    def values(self) -> np.array:
+        """
+        Return the stored values
+
+        If the samples were written into consecutive rows (which is normally the case) then the
+        returned array is a view of the memory-mapped values, so the values are read from disk
+        only as required rather than being copied into memory.
+
+        :return: Array with shape ``(n_samples, n_series, n_times)``
+
+        """
+
+        n = self.count
+        if np.all(self._done[:n]):
+            return self._values[:n]
+        return self._values[self._done.astype(bool)]
+
+    def clear(self) -> None:
+        """
+        Remove all stored samples
+
+        """
+
+        self._values = None
+        self._done = None
+        for fname in ["store.json", "template.pkl", "values.dat", "done.dat"]:
+            if (self.path / fname).exists():
+                (self.path / fname).unlink()
+        self.template = None
+        self.keys = []
+        self.capacity = 0
+
+
 class Ensemble(NamedItem):
     """
     Class for working with sampled Results
@@ -881,24 +1674,50 @@ class Ensemble(NamedItem):
     - A reduction function that maps from Results^N => R^M where typically M would
       index
 
+    If ``streaming=True``, the samples are not stored. Instead, each sample is folded into running
+    means, variances and quantile sketches for every result, population and output, so the memory
+    required does not grow with the number of samples. Plots and summary statistics based on these
+    quantities work as normal, but operations that need the individual samples (boxplots, pair plots
+    and the 'samples' style in :meth:`plot_series`) are not available. Quantiles are exact until more than
+    ``2*compression`` samples have been added, and approximate thereafter (with greater accuracy in
+    the tails of the distribution). Streaming Ensembles computed separately (e.g., on different machines)
+    can be combined with :meth:`Ensemble.merge`.
+
+    If a ``path`` is provided, the values of each sample are written to a memory-mapped array in that
+    folder instead of being kept in memory as :class:`PlotData` instances in ``Ensemble.samples``. This
+    allows Ensembles larger than the available memory, and all of the plotting methods read the samples
+    directly from disk. Parallel workers write their samples directly to the array rather than returning
+    them to the parent process. Samples are retained if sampling is interrupted, and creating an Ensemble
+    with the same path opens the existing samples, so that sampling can be continued with
+    ``run_sims(..., resume=True)``. All of the series in each sample must have the same time values.
+
     :param mapping_function: A function that takes in a Result, or a list/dict of Results, and returns a single PlotData instance
     :param name: Name for the Ensemble (will appear on plots)
     :param baseline: Optionally provide the non-sampled results at instantiation
+    :param streaming: If True, accumulate summary statistics instead of storing samples
+    :param compression: Number of centroids retained in each quantile sketch for streaming Ensembles
+    :param path: Optionally specify a folder to store the samples on disk
     :param kwargs: Additional arguments to pass to the mapping function
 
     """
 
-    def __init__(self, mapping_function=None, name: str = None, baseline_results=None, **kwargs):
+    def __init__(self, mapping_function=None, name: str = None, baseline_results=None, streaming: bool = False, compression: int = 100, path=None, **kwargs):
 
+        assert not (streaming and path is not None), "Streaming Ensembles do not store samples, so a path cannot be specified"
         NamedItem.__init__(self, name)
         self.mapping_function = mapping_function  #: This function gets called by :meth:`Ensemble.add_sample`
         self.samples = []  #: A list of :class:`PlotData` instances, one for each sample
         self.baseline = None  #: A single PlotData instance with reference values (i.e. outcome without sampling)
+        self.streaming = streaming  #: If True, samples are accumulated into ``self.statistics`` rather than stored
+        self.compression = compression  #: Size of the quantile sketches used for streaming
+        self.statistics = sc.odict()  #: For streaming Ensembles, a dict of summary statistics keyed by ``(result,pop,output)``
+        self.store = _SampleStore(path) if path is not None else None  #: For Ensembles stored on disk, a :class:`_SampleStore` containing the samples
+        self._template = self.store.template if self.store is not None else None  # For streaming and stored Ensembles, the first sample is retained to provide units and colors
 
         if baseline_results:
             self.set_baseline(baseline_results, **kwargs)
 
-    def run_sims(self, proj, parset, progset=None, progset_instructions=None, result_names=None, n_samples: int = 1, parallel=False, max_attempts=None) -> None:
+    def run_sims(self, proj, parset, progset=None, progset_instructions=None, result_names=None, n_samples: int = 1, parallel=False, max_attempts=None, resume: bool = False) -> None:
         """
         Run and store sampled simulations
 
@@ -922,12 +1741,35 @@ class Ensemble(NamedItem):
                              containing a single element if not using programs.
         :param parallel: If True, run simulations in parallel (on Windows, must have ``if __name__ == '__main__'`` gating the calling code)
         :param max_attempts: Number of retry attempts for bad initializations
+        :param resume: For Ensembles stored on disk, keep any existing samples and only run the samples required to reach ``n_samples``
 
         """
 
         self.samples = []  # Drop the old samples
-
-        if parallel:
+        self.statistics = sc.odict()
+        self._template = None
+        self._cache = None
+        if self.store is not None and not resume:
+            self.store.clear()
+
+        if parallel and self.streaming:
+            # Each worker accumulates its share of the samples into a streaming Ensemble, and the partial statistics are then merged
+            chunks = [len(x) for x in np.array_split(np.arange(n_samples), min(sc.cpu_count(), n_samples))]
+            partials = sc.parallelize(_sample_and_accumulate, iterarg=chunks, kwargs={"mapping_function": self.mapping_function, "compression": self.compression, "max_attempts": max_attempts, "proj": proj, "parset": parset, "progset": progset, "progset_instructions": progset_instructions, "result_names": result_names})
+            for partial in partials:
+                self.merge(partial)
+        elif parallel and self.store is not None:
+            # Workers write their samples directly to the store, so only the slots to fill are sent to the workers
+            slots = self.store.missing(n_samples)
+            if slots and self.store.template is None:
+                # The first sample determines the layout of the stored values, so it is run before starting the workers
+                sample = _sample_and_map(mapping_function=self.mapping_function, proj=proj, parset=parset, progset=progset, progset_instructions=progset_instructions, result_names=result_names, max_attempts=max_attempts)
+                self._store_sample(slots.pop(0), sample, n_samples)
+            if slots:
+                self.store.reserve(n_samples)
+                chunks = [[int(x) for x in chunk] for chunk in np.array_split(slots, min(sc.cpu_count(), len(slots)))]
+                sc.parallelize(_sample_and_store, iterarg=chunks, kwargs={"store": self.store, "mapping_function": self.mapping_function, "max_attempts": max_attempts, "proj": proj, "parset": parset, "progset": progset, "progset_instructions": progset_instructions, "result_names": result_names})
+        elif parallel:
             # NB. The calling code must be wrapped in a 'if __name__ == '__main__'
             # Currently not passing in any extra kwargs but that should be easy to add if/when required
             # (main reason for deferring implementation is so as to have suitable test code when developing)
@@ -936,19 +1778,30 @@ class Ensemble(NamedItem):
             original_level = logger.getEffectiveLevel()
             logger.setLevel(logging.WARNING)  # Never print debug messages inside the sampling loop - note that depending on the platform, this may apply within `sc.parallelize`
 
+            slots = self.store.missing(n_samples) if self.store is not None else range(n_samples)
             if original_level <= logging.INFO:
-                range_iterator = tqdm.trange(n_samples)
+                range_iterator = tqdm.tqdm(slots)
             else:
-                range_iterator = range(n_samples)
+                range_iterator = slots
 
-            for _ in range_iterator:
+            for slot in range_iterator:
                 sample = _sample_and_map(mapping_function=self.mapping_function, proj=proj, parset=parset, progset=progset, progset_instructions=progset_instructions, result_names=result_names, max_attempts=max_attempts)
-                self.samples.append(sample)
+                if self.streaming:
+                    self._accumulate(sample)
+                elif self.store is not None:
+                    self._store_sample(slot, sample, n_samples)
+                else:
+                    self.samples.append(sample)
 
             logger.setLevel(original_level)  # Reset the logger
 
+        if self.store is not None:
+            self._template = self.store.template
+            self._cache = None
+
         # Finally, set the colours for the first sample
-        self.samples[0].set_colors(pops=self.samples[0].pops, outputs=self.samples[0].outputs)
+        if self.n_samples:
+            self._reference.set_colors(pops=self._reference.pops, outputs=self._reference.outputs)
 
     @property
     def n_samples(self) -> int:
@@ -959,8 +1812,17 @@ class Ensemble(NamedItem):
 
         """
 
+        if self.streaming:
+            return self.statistics[0].n if self.statistics else 0
+        elif self.store is not None:
+            return self.store.count
         return len(self.samples)
 
+    @property
+    def _reference(self):
+        # Return the PlotData used for the outputs, pops, units and colors of the samples
+        return self.samples[0] if self.samples else self._template
+
     @property
     def outputs(self) -> list:
         """
@@ -976,8 +1838,8 @@ class Ensemble(NamedItem):
         :return: A list of outputs (strings)
 
         """
-        if self.samples:
-            return list(self.samples[0].outputs.keys())
+        if self.n_samples:
+            return list(self._reference.outputs.keys())
         elif self.baseline:
             return list(self.baseline.outputs.keys())
         else:
@@ -995,8 +1857,8 @@ class Ensemble(NamedItem):
 
         """
 
-        if self.samples:
-            return self.samples[0].series[0].tvec
+        if self.n_samples:
+            return self._reference.series[0].tvec
         elif self.baseline:
             return self.baseline[0].series[0].tvec
         else:
@@ -1017,8 +1879,8 @@ class Ensemble(NamedItem):
         :return: A list of population names (strings)
 
         """
-        if self.samples:
-            return list(self.samples[0].pops.keys())
+        if self.n_samples:
+            return list(self._reference.pops.keys())
         elif self.baseline:
             return list(self.baseline.pops.keys())
         else:
@@ -1039,33 +1901,159 @@ class Ensemble(NamedItem):
         :return: A list of population names (strings)
 
         """
-        if self.samples:
-            return list(self.samples[0].results.keys())
+        if self.n_samples:
+            return list(self._reference.results.keys())
         elif self.baseline:
             return list(self.baseline.results.keys())
         else:
             return list()
 
-    def _get_series(self) -> dict:
+    def _get_stat(self, result: str, pop: str, output: str, stat, year=None) -> np.array:
+        """
+        Return a statistic computed over samples
+
+        For streaming Ensembles, the statistic is computed from the accumulated statistics and then
+        interpolated onto the requested years. Otherwise, the samples are interpolated first, and the
+        statistic is computed for all results, populations and outputs at once (see :meth:`_compute_stats`).
+
+        :param result: Result name
+        :param pop: Population name
+        :param output: Output name
+        :param stat: One of ``'mean'``, ``'std'``, ``'min'``, ``'max'``, ``'median'``, or a quantile between 0 and 1
+        :param year: Optionally interpolate onto a year or array of years, otherwise return values for all time points
+        :return: Array of values
+
+        """
+
+        if self.streaming:
+            vals = self.statistics[result, pop, output].get(stat)
+            if year is None:
+                return vals
+            return np.interp(sc.promotetoarray(year), self.tvec, vals, left=np.nan, right=np.nan)
+
+        self._compute_stats([stat], year)
+        return self._get_cache()["stats", stat, _year_key(year)][result, pop, output]
+
+    def _get_cache(self) -> dict:
+        # Return the cached sample values and statistics. These are discarded if the samples have changed since they were
+        # computed. The cache keeps a reference to each sample, so samples that are added, removed or replaced in the list
+        # (e.g., ``E.samples[0] = ...``) are detected, although modifying a PlotData instance in-place is not
+        cache = self.__dict__.get("_cache")
+        if cache is None or cache["n_samples"] != self.n_samples or any(x is not y for x, y in zip(cache["samples"], self.samples)):
+            cache = {"n_samples": self.n_samples, "samples": list(self.samples)}
+            self._cache = cache
+        return cache
+
+    def __getstate__(self):
+        # The cached values are recomputed from the samples when required, so they don't need to be stored
+        d = super().__getstate__()
+        d.pop("_cache", None)
+        return d
+
+    def _sample_values(self, year=None) -> tuple:
+        """
+        Return the values of all samples
+
+        The values for every result, population and output in all of the samples are assembled into
+        arrays with shape ``(n_samples, n_series, n_times)``, so that statistics can be computed for all
+        of them at once along the sample axis. The arrays are retained until samples are added to the Ensemble.
+        Usually all of the Series share the same time values, in which case there is a single array, but
+        Series with different time values are stored in separate arrays.
+
+        :param year: Optionally interpolate onto a year or array of years, otherwise return values for all time points
+        :return: A tuple with a dict mapping ``(result,pop,output)`` to the array index and row, and a list of arrays
+
         """
-        Flatten the series in samples
 
-        The Ensemble contains a list of `PlotData` containing a list of `Series`. Computing
-        uncertainty requires iterating over the Series for a a particular result, pop, and output.
-        This function returns a dict keyed by a ``(result,pop,output)`` tuple with a list of
-        references to the underlying series. Thus, the series are organized either by `self.samples`
-        which facilitates adding new samples, and `self._get_series` which facilitates computing
-        uncertainties after the fact.
+        cache = self._get_cache()
+        key = ("values", _year_key(year))
+        if key in cache:
+            return cache[key]
+
+        if ("values", None) not in cache and self.store is not None:
+            # Stored samples are read directly from the memory-mapped array
+            index = {series_key: (0, j) for j, series_key in reversed(list(enumerate(self.store.keys)))}
+            cache["values", None] = (index, [self.store.values()])
+            cache["tvecs"] = [self.store.template.series[0].tvec]
+        elif ("values", None) not in cache:
+            # Group the Series by their time values, and then stack each group
+            groups = defaultdict(list)
+            for series in self.samples[0].series:
+                groups[series.tvec.tobytes()].append((series.result, series.pop, series.output))
+            keys = [x for group in groups.values() for x in group]
+
+            index = {}
+            arrays = []
+            tvecs = []
+            for i, group in enumerate(groups.values()):
+                for j, series_key in enumerate(group):
+                    index.setdefault(series_key, (i, j))  # If there are duplicate series, the first one is used
+                if len(groups) == 1 and all([(x.result, x.pop, x.output) for x in sample.series] == keys for sample in self.samples):
+                    arrays.append(np.stack([sample._stack() for sample in self.samples]))
+                else:
+                    arrays.append(np.array([[sample[series_key].vals for series_key in group] for sample in self.samples], dtype=float))
+                tvecs.append(self.samples[0][group[0]].tvec)
+            cache["values", None] = (index, arrays)
+            cache["tvecs"] = tvecs
+
+        if year is not None:
+            from .plotting import _interpolate_rows  # Avoid circular import
 
-        :return: A dict keyed by result-pop-output containing lists of sampled Series
+            index, arrays = cache["values", None]
+            year = sc.promotetoarray(year)
+            interpolated = [_interpolate_rows(year, tvec, vals.reshape(-1, vals.shape[2])).reshape(vals.shape[0], vals.shape[1], len(year)) for tvec, vals in zip(cache["tvecs"], arrays)]
+            cache[key] = (index, interpolated)
 
+        return cache[key]
+
+    def _get_samples(self, result: str, pop: str, output: str, year=None) -> np.array:
         """
+        Return sampled values for a single quantity
 
-        series_lookup = defaultdict(list)
-        for sample in self.samples:
-            for series in sample.series:
-                series_lookup[(series.result, series.pop, series.output)].append(series)
-        return sc.odict(series_lookup)
+        :param result: Result name
+        :param pop: Population name
+        :param output: Output name
+        :param year: Optionally interpolate onto a year or array of years, otherwise return values for all time points
+        :return: Array with shape ``(n_samples, n_times)``
+
+        """
+
+        index, arrays = self._sample_values(year)
+        i, j = index[result, pop, output]
+        return arrays[i][:, j]
+
+    def _compute_stats(self, stats: list, year=None) -> None:
+        """
+        Compute statistics over samples
+
+        All of the requested statistics are computed for every result, population and output at
+        once. In particular, all of the quantiles are computed in a single call to ``np.quantile``.
+        The statistics are cached until samples are added to the Ensemble, and are retrieved using
+        :meth:`_get_stat`.
+
+        :param stats: A list of statistics supported by :meth:`_get_stat`
+        :param year: Optionally interpolate onto a year or array of years, otherwise use all time points
+
+        """
+
+        cache = self._get_cache()
+        year_key = _year_key(year)
+        missing = [stat for stat in dict.fromkeys(stats) if ("stats", stat, year_key) not in cache]
+        if not missing:
+            return
+
+        index, arrays = self._sample_values(year)
+        quantiles = [stat for stat in missing if not sc.isstring(stat)]
+        computed = {stat: [] for stat in missing}
+        for vals in arrays:
+            if quantiles:
+                for stat, v in zip(quantiles, np.quantile(vals, quantiles, axis=0)):
+                    computed[stat].append(v)
+            for stat in missing:
+                if sc.isstring(stat):
+                    computed[stat].append(_sample_stat(vals, stat))
+        for stat in missing:
+            cache["stats", stat, year_key] = {series_key: computed[stat][i][j] for series_key, (i, j) in index.items()}
 
     def set_baseline(self, results, **kwargs) -> None:
         """
@@ -1105,10 +2093,73 @@ class Ensemble(NamedItem):
         plotdata = self.mapping_function(results, **kwargs)
         assert isinstance(plotdata, PlotData)  # Make sure the mapping function returns the correct type
         # assert len(plotdata.results) == 1, 'The mapping function must return a PlotData instance with only one Result'
+        if self.streaming:
+            self._accumulate(plotdata)
+            return
+        elif self.store is not None:
+            self._store_sample(self.store.missing(self.store.capacity + 1)[0], plotdata)
+            self._cache = None
+            return
         if not self.samples:
             # Set the colors on the first PlotData to be added - for performance, only do this for the first sample
             plotdata.set_colors(pops=plotdata.pops, outputs=plotdata.outputs)
         self.samples.append(plotdata)
+        self._cache = None
+
+    def _store_sample(self, slot: int, plotdata, capacity: int = 1) -> None:
+        """
+        Write a sample to disk
+
+        :param slot: Index of the sample
+        :param plotdata: A :class:`PlotData` instance returned by the mapping function
+        :param capacity: If this is the first sample, allocate space for this many samples
+
+        """
+
+        if self.store.template is None:
+            self.store.initialize(plotdata.set_colors(pops=plotdata.pops, outputs=plotdata.outputs), capacity)
+            self._template = self.store.template
+        self.store.write(slot, plotdata)
+
+    def _accumulate(self, plotdata) -> None:
+        """
+        Fold a sample into the summary statistics
+
+        :param plotdata: A :class:`PlotData` instance returned by the mapping function
+
+        """
+
+        if self._template is None:
+            self._template = plotdata.set_colors(pops=plotdata.pops, outputs=plotdata.outputs)
+        for series in plotdata.series:
+            key = (series.result, series.pop, series.output)
+            if key not in self.statistics:
+                self.statistics[key] = _SampleStatistics(len(series.tvec), self.compression)
+            self.statistics[key].add(series.vals)
+
+    def merge(self, other) -> None:
+        """
+        Combine another streaming Ensemble into this one
+
+        The summary statistics of both Ensembles are combined, so that the result is the same as if
+        all samples had been added to this Ensemble (up to the accuracy of the quantile sketches).
+        This allows sampling to be split across processes or machines. The other Ensemble should have
+        been created with the same mapping function.
+
+        :param other: A streaming :class:`Ensemble` instance
+
+        """
+
+        assert self.streaming and other.streaming, "Only streaming Ensembles can be merged"
+        if other._template is None:
+            return
+        if self._template is None:
+            self._template = other._template
+        for key, statistics in other.statistics.items():
+            if key in self.statistics:
+                self.statistics[key].merge(statistics)
+            else:
+                self.statistics[key] = sc.dcp(statistics)
 
     def update(self, result_list, **kwargs) -> None:
         """
@@ -1155,7 +2206,7 @@ class Ensemble(NamedItem):
 
         """
 
-        if not self.samples:
+        if not self.n_samples:
             raise Exception("Cannot plot samples because no samples have been added yet")
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
@@ -1165,16 +2216,18 @@ class Ensemble(NamedItem):
             fig = plt.figure()
         ax = plt.gca()
 
-        series_lookup = self._get_series()
-
         for result in results:
             for output in outputs:
                 for pop in pops:
                     # Assemble the outputs
-                    if year is None:
-                        vals = np.array([x.vals[0] for x in series_lookup[result, pop, output]])
+                    weights = None
+                    if self.streaming:
+                        # Use the weighted centroids of the quantile sketch as the samples
+                        vals, weights = self.statistics[result, pop, output].distribution(self._time_index(year))
+                    elif year is None:
+                        vals = self._get_samples(result, pop, output)[:, 0]
                     else:
-                        vals = np.array([x.interpolate(year) for x in series_lookup[result, pop, output]])
+                        vals = self._get_samples(result, pop, output, year)
 
                     # color = series_lookup[output,pop][0].color
                     value_range = (vals.min(), vals.max())
@@ -1183,7 +2236,7 @@ class Ensemble(NamedItem):
                         color = None
                         logger.warning("All values for %s-%s are the same, so no distribution will be visible" % (output, pop))
                     else:
-                        kernel = stats.gaussian_kde(vals.ravel())
+                        kernel = stats.gaussian_kde(vals.ravel(), weights=weights)
                         scale_up_range = 1.5  # Increase kernel density x range
                         span = np.average(value_range) + np.diff(value_range) * [-1, 1] / 2 * scale_up_range
                         x = np.linspace(*span, 100)
@@ -1196,7 +2249,7 @@ class Ensemble(NamedItem):
                         val = series.vals[0] if year is None else series.interpolate(year)
                         plt.axvline(val, color=color, linestyle="dashed")
 
-                    proposed_label = "%s (%s)" % (output, series_lookup[result, pop, output][0].unit_string)
+                    proposed_label = "%s (%s)" % (output, self._reference[result, pop, output].unit_string)
                     if ax.xaxis.get_label().get_text():
                         assert proposed_label == ax.xaxis.get_label().get_text(), "The outputs being superimposed have different units"
                     else:
@@ -1207,6 +2260,16 @@ class Ensemble(NamedItem):
 
         return fig
 
+    def _time_index(self, year: float = None) -> int:
+        # Return the index of a year in ``self.tvec``. Streaming Ensembles cannot interpolate
+        # distributions, so the year must be one of the time points in the samples
+        if year is None:
+            return 0
+        idx = np.where(np.isclose(self.tvec, year))[0]
+        if not len(idx):
+            raise Exception("Year %g is not one of the time points in the Ensemble - streaming Ensembles cannot interpolate distributions" % (year))
+        return idx[0]
+
     def plot_series(self, fig=None, style="quartile", results=None, outputs=None, pops=None, legend=True):
         """
         Plot a time series with uncertainty
@@ -1222,8 +2285,9 @@ class Ensemble(NamedItem):
         """
 
         assert style in {"samples", "quartile", "ci", "std"}
+        assert not (self.streaming and style == "samples"), "Streaming Ensembles do not store samples, so they cannot be plotted individually"
 
-        if not self.samples:
+        if not self.n_samples:
             raise Exception("Cannot plot samples because no samples have been added yet")
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
@@ -1233,38 +2297,42 @@ class Ensemble(NamedItem):
             fig = plt.figure()
         ax = plt.gca()
 
-        series_lookup = self._get_series()
+        if not self.streaming and style != "samples":
+            # Compute the statistics for all of the quantities at once
+            self._compute_stats({"quartile": ["mean", 0.25, 0.75], "ci": ["mean", 0.025, 0.975], "std": ["mean", "std"]}[style])
 
         for result in results:
             for output in outputs:
                 for pop in pops:
 
-                    these_series = series_lookup[result, pop, output]
-                    vals = np.vstack([x.vals.ravel() for x in these_series])  # Turn samples into a matrix
+                    reference = self._reference[result, pop, output]
+                    if self.streaming:
+                        stat = self.statistics[result, pop, output].get
+                    else:
+                        stat = functools.partial(self._get_stat, result, pop, output)
 
                     if self.baseline:
                         baseline_series = self.baseline[result, pop, output]
                         plt.plot(baseline_series.tvec, baseline_series.vals, color=baseline_series.color, label="%s: %s-%s-%s (baseline)" % (self.name, result, pop, output))[0]
                     else:
-                        plt.plot(these_series[0].tvec, np.mean(vals, axis=0), color=these_series[0].color, linestyle="dashed", label="%s: %s-%s-%s (mean)" % (self.name, result, pop, output))[0]
+                        plt.plot(reference.tvec, stat("mean"), color=reference.color, linestyle="dashed", label="%s: %s-%s-%s (mean)" % (self.name, result, pop, output))[0]
 
                     if style == "samples":
-                        for series in these_series:
-                            plt.plot(series.tvec, series.vals, color=series.color, alpha=0.05)
+                        plt.plot(reference.tvec, self._get_samples(result, pop, output).T, color=reference.color, alpha=0.05)
 
                     elif style == "quartile":
-                        ax.fill_between(these_series[0].tvec, np.quantile(vals, 0.25, axis=0), np.quantile(vals, 0.75, axis=0), alpha=0.15, color=these_series[0].color)
+                        ax.fill_between(reference.tvec, stat(0.25), stat(0.75), alpha=0.15, color=reference.color)
                     elif style == "ci":
-                        ax.fill_between(these_series[0].tvec, np.quantile(vals, 0.025, axis=0), np.quantile(vals, 0.975, axis=0), alpha=0.15, color=these_series[0].color)
+                        ax.fill_between(reference.tvec, stat(0.025), stat(0.975), alpha=0.15, color=reference.color)
                     elif style == "std":
                         if self.baseline:
-                            ax.fill_between(baseline_series.tvec, baseline_series.vals - np.std(vals, axis=0), baseline_series.vals + np.std(vals, axis=0), alpha=0.15, color=baseline_series.color)
+                            ax.fill_between(baseline_series.tvec, baseline_series.vals - stat("std"), baseline_series.vals + stat("std"), alpha=0.15, color=baseline_series.color)
                         else:
-                            ax.fill_between(these_series[0].tvec, np.mean(vals, axis=0) - np.std(vals, axis=0), np.mean(vals, axis=0) + np.std(vals, axis=0), alpha=0.15, color=these_series[0].color)
+                            ax.fill_between(reference.tvec, stat("mean") - stat("std"), stat("mean") + stat("std"), alpha=0.15, color=reference.color)
                     else:
                         raise Exception("Unknown style")
 
-            proposed_label = "%s (%s)" % (output, these_series[0].unit_string)
+            proposed_label = "%s (%s)" % (output, reference.unit_string)
             if ax.yaxis.get_label().get_text():
                 assert proposed_label == ax.yaxis.get_label().get_text(), "The outputs being superimposed have different units"
             else:
@@ -1300,7 +2368,7 @@ class Ensemble(NamedItem):
 
         """
 
-        if not self.samples:
+        if not self.n_samples:
             raise Exception("Cannot plot samples because no samples have been added yet")
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
@@ -1320,22 +2388,16 @@ class Ensemble(NamedItem):
             else:
                 offset = np.floor(max(ax.get_xlim())) + 1
 
-        series_lookup = self._get_series()
-
-        x = []
+        sample_errors = []
         baselines = []
         labels = []
 
         base_order = ("years", "results", "outputs", "pops")
         for year, result, output, pop in nested_loop([years, results, outputs, pops], map(base_order.index, order)):
 
-            if year is None:
-                vals = np.array([x.vals[0] for x in series_lookup[result, pop, output]])
-                year_val = series_lookup[result, pop, output][0].tvec[0]
-                labels.append("%s: %s-%s-%s (%g)" % (self.name, result, pop, output, year_val))
-            else:
-                vals = np.array([x.interpolate(year) for x in series_lookup[result, pop, output]])
-                labels.append("%s: %s-%s-%s (%g)" % (self.name, result, pop, output, year))
+            # Interpolating onto the first time point returns the first value exactly
+            year_val = self._reference[result, pop, output].tvec[0] if year is None else year
+            labels.append("%s: %s-%s-%s (%g)" % (self.name, result, pop, output, year_val))
 
             if self.baseline:
                 if year is None:
@@ -1343,13 +2405,11 @@ class Ensemble(NamedItem):
                 else:
                     baselines.append(self.baseline[result, pop, output].interpolate(year)[0])
             else:
-                baselines.append(np.mean(vals))
+                baselines.append(self._get_stat(result, pop, output, "mean", year_val)[0])
 
-            x.append(vals.ravel())
+            sample_errors.append(self._get_stat(result, pop, output, "std", year_val)[0])
 
-        locations = offset + np.arange(len(x))
-        sample_array = np.vstack(x).T
-        sample_errors = np.std(sample_array, axis=0)
+        locations = offset + np.arange(len(labels))
 
         for location, baseline, error, label in zip(locations, baselines, sample_errors, labels):
             if horizontal:
@@ -1359,7 +2419,7 @@ class Ensemble(NamedItem):
 
         ax.legend()
 
-        proposed_label = "%s (%s)" % (output, series_lookup[result, pop, output][0].unit_string)
+        proposed_label = "%s (%s)" % (output, self._reference[result, pop, output].unit_string)
 
         if horizontal:
             ax.set_ylim(-0.5, locations[-1] + 0.5)
@@ -1397,8 +2457,9 @@ class Ensemble(NamedItem):
 
         """
 
-        if not self.samples:
+        if not self.n_samples:
             raise Exception("Cannot plot samples because no samples have been added yet")
+        assert not self.streaming, "Streaming Ensembles do not store samples, so boxplots are not available"
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
         pops = sc.promotetolist(pops) if pops is not None else self.pops
@@ -1414,8 +2475,6 @@ class Ensemble(NamedItem):
             ax = fig.axes[0]
             offset = len(ax.get_xticks())
 
-        series_lookup = self._get_series()
-
         x = []
         baseline = []
         labels = []
@@ -1431,11 +2490,11 @@ class Ensemble(NamedItem):
                                 baseline.append(self.baseline[result, pop, output].interpolate(year)[0])
 
                         if year is None:
-                            vals = np.array([x.vals[0] for x in series_lookup[result, pop, output]])
-                            year_val = series_lookup[result, pop, output][0].tvec[0]
+                            vals = self._get_samples(result, pop, output)[:, 0]
+                            year_val = self._reference[result, pop, output].tvec[0]
                             labels.append("%s: %s-%s-%s (%g)" % (self.name, result, pop, output, year_val))
                         else:
-                            vals = np.array([x.interpolate(year) for x in series_lookup[result, pop, output]])
+                            vals = self._get_samples(result, pop, output, year)
                             labels.append("%s: %s-%s-%s (%g)" % (self.name, result, pop, output, year))
                         x.append(vals.ravel())
 
@@ -1458,7 +2517,7 @@ class Ensemble(NamedItem):
             ax.set_xticks(np.arange(locations[-1] + 1))
             ax.set_xticklabels(new_labels)
 
-        proposed_label = "%s (%s)" % (output, series_lookup[result, pop, output][0].unit_string)
+        proposed_label = "%s (%s)" % (output, self._reference[result, pop, output].unit_string)
         if ax.yaxis.get_label().get_text():
             assert proposed_label == ax.yaxis.get_label().get_text(), "The outputs being superimposed have different units"
         else:
@@ -1467,7 +2526,21 @@ class Ensemble(NamedItem):
         return fig
 
     def summary_statistics(self, years=None, results=None, outputs=None, pops=None):
-        if not self.samples:
+        """
+        Return summary statistics
+
+        For non-streaming Ensembles, each statistic is computed for all results, populations and outputs
+        at once, and the statistics are cached until further samples are added.
+
+        :param years: Optionally specify years - otherwise, the first time point will be used. Data is interpolated onto these years
+        :param results: Optionally specify list of result names
+        :param outputs: Optionally specify list of outputs
+        :param pops: Optionally specify list of pops
+        :return: A DataFrame indexed by year, result, output, population and quantity
+
+        """
+
+        if not self.n_samples:
             raise Exception("Cannot plot samples because no samples have been added yet")
         results = sc.promotetolist(results) if results is not None else self.results
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
@@ -1477,7 +2550,7 @@ class Ensemble(NamedItem):
         else:
             years = sc.promotetolist(years)
 
-        series_lookup = self._get_series()
+        quantities = [("mean", "mean"), ("median", "median"), ("max", "max"), ("min", "min"), ("Q1", 0.25), ("Q3", 0.75)]
         records = list()
 
         for year in years:
@@ -1492,21 +2565,15 @@ class Ensemble(NamedItem):
                                 baseline = self.baseline[result, pop, output].interpolate(year)[0]
                             records.append((year, result, output, pop, "baseline", baseline))
 
-                        if year is None:
-                            vals = np.array([x.vals[0] for x in series_lookup[result, pop, output]])
-                        else:
-                            vals = np.array([x.interpolate(year) for x in series_lookup[result, pop, output]])
+                        year_val = self._reference[result, pop, output].tvec[0] if year is None else year
+                        if not self.streaming:
+                            self._compute_stats([stat for _, stat in quantities], year_val)  # Computes all statistics at once the first time a year is used
+                        for quantity, stat in quantities:
+                            records.append((year, result, output, pop, quantity, self._get_stat(result, pop, output, stat, year_val)[0]))
 
-                        records.append((year, result, output, pop, "mean", np.mean(vals)))
-                        records.append((year, result, output, pop, "median", np.median(vals)))
-                        records.append((year, result, output, pop, "max", np.max(vals)))
-                        records.append((year, result, output, pop, "min", np.min(vals)))
-                        records.append((year, result, output, pop, "Q1", np.quantile(vals, 0.25)))
-                        records.append((year, result, output, pop, "Q3", np.quantile(vals, 0.75)))
-
-                df = pd.DataFrame.from_records(records, columns=["year", "result", "output", "pop", "quantity", "value"])
-                df = df.set_index(["year", "result", "output", "pop", "quantity"])
-                return df
+        df = pd.DataFrame.from_records(records, columns=["year", "result", "output", "pop", "quantity", "value"])
+        df = df.set_index(["year", "result", "output", "pop", "quantity"])
+        return df
 
     def pairplot(self, year=None, outputs=None, pops=None):
         # Paired plot for different outputs
@@ -1517,13 +2584,12 @@ class Ensemble(NamedItem):
         # One plot for each population
         # Different colours for each result
 
-        if not self.samples:
+        if not self.n_samples:
             raise Exception("Cannot plot samples because no samples have been added yet")
+        assert not self.streaming, "Streaming Ensembles do not store samples, so pair plots are not available"
         outputs = sc.promotetolist(outputs) if outputs is not None else self.outputs
         pops = sc.promotetolist(pops) if pops is not None else self.pops
 
-        series_lookup = self._get_series()
-
         figs = []
 
         # Put all the values in a DataFrame
@@ -1533,7 +2599,7 @@ class Ensemble(NamedItem):
                 df_dict = dict()
                 # Construct a dataframe with all of the outputs, with categorical results
                 for output in self.outputs:
-                    df_dict[output] = [x.vals[0] for x in series_lookup[result, pop, output]]
+                    df_dict[output] = self._get_samples(result, pop, output)[:, 0]
                 df = pd.DataFrame.from_dict(df_dict)
                 df["result"] = result
                 dfs.append(df)
@@ -1569,3 +2635,38 @@ def _sample_and_map(proj, parset, progset, progset_instructions, result_names, m
 
     # Finally, return the plotdata instead of the result
     return plotdata
+
+
+def _sample_and_store(slots: list, store, **kwargs) -> None:
+    """
+    Helper function to write samples to disk
+
+    This function is used by :meth:`Ensemble.run_sims` when running in parallel for Ensembles that store
+    their samples on disk. Each worker writes its samples directly into the memory-mapped array, so the
+    samples do not need to be returned to the parent process.
+
+    :param slots: List of sample indices to run
+    :param store: The Ensemble's :class:`_SampleStore`
+    :param kwargs: Arguments for :func:`_sample_and_map`
+
+    """
+
+    for slot in slots:
+        store.write(slot, _sample_and_map(**kwargs))
+
+
+def _sample_and_accumulate(n_samples: int, mapping_function, compression: int, **kwargs):
+    """
+    Helper function to sample into a streaming Ensemble
+
+    This function runs sampled simulations and accumulates them into a new streaming
+    :class:`Ensemble`. Used when performing parallel simulations via `Ensemble.run_sims()`
+    with a streaming Ensemble, where each worker returns only its summary statistics, which
+    are then merged.
+
+    """
+
+    ensemble = Ensemble(mapping_function=mapping_function, streaming=True, compression=compression)
+    for _ in range(n_samples):
+        ensemble._accumulate(_sample_and_map(mapping_function=mapping_function, **kwargs))
+    return ensemble
@@ -4,12 +4,14 @@ Define utility classes used throughout Atomica
 """
 
 import ast
+import hashlib
 import inspect
 import itertools
 import logging
 import os
 import re
 import time
+import types
 import zlib
 from bisect import bisect_right, bisect_left
 from datetime import datetime
@@ -17,6 +19,7 @@ from functools import partial
 from pathlib import Path
 
 import numpy as np
+import pandas as pd
 import scipy.interpolate
 from tqdm import tqdm
 
@@ -37,6 +40,7 @@ __all__ = [
     "start_logging",
     "stop_logging",
     "get_sigfigs_necessary",
+    "content_hash",
 ]
 
 
@@ -55,7 +59,29 @@ def parent_dir() -> Path:
     return Path(inspect.stack()[1][1]).parent
 
 
-class NamedItem:
+class _ReadOnly:
+    """
+    Mixin for objects that can be made read-only
+
+    Snapshots that are shared by multiple models (see ``model._shared_snapshot``) are made read-only
+    with :func:`_freeze`, so that modifying the snapshot through one result cannot change any other
+    result. Private attributes (which store cached values) can still be set. Copies of a read-only
+    object, and objects loaded from a pickle, can be modified as normal.
+
+    """
+
+    def __setattr__(self, name, value):
+        if not name.startswith("_") and self.__dict__.get("_readonly"):
+            raise AttributeError(f'Cannot set "{name}" because this {type(self).__name__} is a read-only snapshot that may be shared by other results. Modify a copy instead')
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self):
+        d = dict(self.__dict__)
+        d.pop("_readonly", None)
+        return d
+
+
+class NamedItem(_ReadOnly):
     def __init__(self, name: str = None):
         """
         NamedItem constructor
@@ -129,6 +155,9 @@ class NDict(sc.odict):
         return self[new]
 
 
+_INTERPOLATION_CACHE_SIZE = 8  # Maximum number of interpolated arrays stored by each TimeSeries
+
+
 class TimeSeries:
     """
     Class to store time-series data
@@ -149,7 +178,10 @@ class TimeSeries:
 
     # Use slots here to guarantee that __deepcopy__() and __eq__() only have to check these
     # specific fields - otherwise, would need to do a more complex recursive dict comparison
-    __slots__ = ["t", "vals", "units", "assumption", "sigma", "_sampled"]
+    # The ``_cache`` slot caches the output of :meth:`interpolate` together with the time points and values it was
+    # computed from. The ``_readonly`` slot is set by :func:`_freeze`
+    __slots__ = ["t", "vals", "units", "assumption", "sigma", "_sampled", "_cache", "_readonly"]
+    _transient = {"_cache", "_readonly"}  # Slots that are not part of the content
 
     def __init__(self, t=None, vals=None, units: str = None, assumption: float = None, sigma: float = None):
 
@@ -159,6 +191,8 @@ class TimeSeries:
         self.assumption = assumption  #: The time-independent scalar assumption
         self.sigma = sigma  #: Uncertainty value, assumed to be a standard deviation
         self._sampled = False  #: Flag to indicate whether sampling has been performed. Once sampling has been performed, cannot sample again
+        self._cache = None
+        self._readonly = False
 
         # Using insert() means that array/list inputs containing None or duplicate entries will
         # be sanitized via insert()
@@ -180,7 +214,18 @@ class TimeSeries:
         :return:
         """
 
-        return all(getattr(self, x) == getattr(other, x) for x in self.__slots__)
+        return all(getattr(self, x) == getattr(other, x) for x in self.__slots__ if x not in self._transient)
+
+    def __setattr__(self, name, value):
+        # Any change to the content invalidates the cached interpolated values
+        if name not in self._transient:
+            self._check_writeable()
+            object.__setattr__(self, "_cache", None)
+        object.__setattr__(self, name, value)
+
+    def _check_writeable(self) -> None:
+        if getattr(self, "_readonly", False):
+            raise AttributeError("Cannot modify this TimeSeries because it is part of a read-only snapshot that may be shared by other results. Modify a copy instead")
 
     def __deepcopy__(self, memodict={}):
         new = TimeSeries.__new__(TimeSeries)
@@ -190,12 +235,16 @@ class TimeSeries:
         new.assumption = self.assumption
         new.sigma = self.sigma
         new._sampled = self._sampled
+        new._cache = None
+        new._readonly = False
         return new
 
     def __getstate__(self):
-        return dict([(k, getattr(self, k, None)) for k in self.__slots__])
+        return dict([(k, getattr(self, k, None)) for k in self.__slots__ if k not in self._transient])
 
     def __setstate__(self, data):
+        self._cache = None
+        self._readonly = False
 
         if "format" in data:
             # 'format' was changed to 'units' but the attribute was not dropped, however now this is a
@@ -334,6 +383,20 @@ class TimeSeries:
     #
     #     return new
 
+    @property
+    def digest(self) -> str:
+        """
+        Return a digest of the contents
+
+        The digest is computed from the current contents each time it is accessed, so it reflects
+        any changes including those made in-place (e.g., ``ts.vals[0] = 1``).
+
+        :return: A hexadecimal digest string
+
+        """
+
+        return _state_digest(self)
+
     def copy(self):
         """
         Return a copy of the ``TimeSeries``
@@ -407,6 +470,8 @@ class TimeSeries:
             self.assumption = v
             return
 
+        self._check_writeable()
+        self._cache = None
         idx = bisect_left(self.t, t)
         if idx < len(self.t) and self.t[idx] == t:
             # Overwrite an existing entry
@@ -475,9 +540,11 @@ class TimeSeries:
         if t is None:
             self.assumption = None
         elif t in self.t:
+            self._check_writeable()
             idx = self.t.index(t)
             del self.t[idx]
             del self.vals[idx]
+            self._cache = None
         else:
             raise Exception("Item not found")
 
@@ -549,6 +616,12 @@ class TimeSeries:
             - If only one finite time value remains, then that value will be returned for all requested time points
             - Otherwise, the specified interpolation method will be used
 
+        The interpolated values are cached, so repeated calls with the same time values and method (e.g.,
+        when a model is built many times from the same ``ParameterSet``) do not need to perform the interpolation
+        again. The cache stores a copy of ``t`` and ``vals``, and is discarded if they no longer match, so
+        modifying them in-place (e.g., ``ts.vals[0] = 1``) is detected. The cache is also cleared by assigning an
+        attribute, and is not copied or saved. Interpolation using a callable ``method`` is not cached.
+
         :param t2: float, list, or array, with times
         :param method: A string 'linear', 'pchip' or 'previous' OR a callable item that returns an Interpolator
         :return: array the same length as t2, with interpolated values
@@ -557,6 +630,27 @@ class TimeSeries:
 
         t2 = sc.promotetoarray(t2)  # Deal with case where user prompts for single time point
 
+        if not sc.isstring(method) or kwargs:
+            return self._interpolate(t2, method, **kwargs)
+
+        state = (list(self.t), list(self.vals))
+        if self._cache is None or self._cache[0] != state:
+            self._cache = (state, dict())
+        cache = self._cache[1]
+
+        key = (method, t2.dtype.str, t2.shape, t2.tobytes())
+        if key in cache:
+            return cache[key].copy()
+
+        vals = self._interpolate(t2, method)
+        if len(cache) >= _INTERPOLATION_CACHE_SIZE:
+            del cache[next(iter(cache))]  # Discard the oldest entry
+        cache[key] = vals
+        return vals.copy()
+
+    def _interpolate(self, t2: np.array, method="linear", **kwargs) -> np.array:
+        # Perform the interpolation for :meth:`interpolate`, without caching
+
         # Deal with not having time-specific data first
         if not self.has_data:
             return np.full(t2.shape, np.nan)
@@ -622,8 +716,7 @@ class TimeSeries:
                 new.vals = [v + delta for v in new.vals]
             else:
                 # Sample again for each data point
-                for i, (v, delta) in enumerate(zip(new.vals, self.sigma * np.random.randn(len(new.vals)))):
-                    new.vals[i] = v + delta
+                new.vals = [v + delta for v, delta in zip(new.vals, self.sigma * np.random.randn(len(new.vals)))]
 
         # Sampling flag only needs to be set if the TimeSeries had data to change
         if new.has_data:
@@ -1024,3 +1117,196 @@ def get_sigfigs_necessary(x, y, min_sigfigs: int = 2) -> int:
         while sc.sigfig(x=x, sigfigs=msf) == sc.sigfig(x=y, sigfigs=msf):
             msf += 1
         return msf
+
+
+# Attributes that record provenance rather than content. These are skipped when hashing objects so
+# that (for example) a copy of a ParameterSet with a new creation time still has the same digest. Cached
+# values derived from the content are skipped as well
+_HASH_EXCLUDE = {"uid", "created", "modified", "version", "gitinfo", "spreadsheet", "_lookup", "_cache", "_readonly"}
+
+
+def _hash_update(h, obj) -> None:
+    """
+    Recursively add an object to a hash
+
+    This is the internal implementation for :func:`content_hash`. Each item is prefixed with a
+    type tag so that for example ``'1'`` and ``1`` produce different digests.
+
+    :param h: A ``hashlib`` hash object that will be updated in-place
+    :param obj: The object to add to the hash
+
+    """
+
+    # Check the most common exact types first, since this function is called for every item
+    if type(obj) is str:
+        b = obj.encode("utf-8")
+        h.update(b"S%d:" % len(b) + b)
+    elif type(obj) is float:
+        h.update(b"F" + repr(obj).encode() + b";")
+    elif obj is None:
+        h.update(b"N;")
+    elif isinstance(obj, (bool, np.bool_)):
+        h.update(b"B%d;" % bool(obj))
+    elif isinstance(obj, (int, np.integer)) and float(obj) != obj:
+        h.update(b"I%d;" % int(obj))
+    elif isinstance(obj, (int, float, np.integer, np.floating)):
+        # Integers are hashed as floats so that e.g., a y-factor of 1 is equivalent to 1.0
+        h.update(b"F" + repr(float(obj)).encode() + b";")
+    elif isinstance(obj, str):
+        b = obj.encode("utf-8")
+        h.update(b"S%d:" % len(b) + b)
+    elif isinstance(obj, bytes):
+        h.update(b"Y%d:" % len(obj) + obj)
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            h.update(b"O%d:" % obj.size)
+            for x in obj.ravel():
+                _hash_update(h, x)
+        else:
+            h.update(b"A" + obj.dtype.str.encode() + repr(obj.shape).encode())
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(b"P" + type(obj).__name__.encode())
+        _hash_update(h, list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name)
+        _hash_update(h, list(obj.index))
+        for _, column in obj.items() if isinstance(obj, pd.DataFrame) else [(obj.name, obj)]:
+            values = column.to_numpy()
+            if values.dtype.kind in "biufcmM":
+                _hash_update(h, values)
+            else:
+                # Hashing the repr of each value is much faster than using ``pd.util.hash_pandas_object``
+                h.update(b"R" + "\x1f".join(map(repr, values)).encode("utf-8") + b";")
+    elif isinstance(obj, dict):
+        h.update(b"D%d:" % len(obj))
+        for k, v in obj.items():
+            _hash_update(h, k)
+            _hash_update(h, v)
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"L%d:" % len(obj))
+        for x in obj:
+            _hash_update(h, x)
+    elif isinstance(obj, (set, frozenset)):
+        h.update(b"E%d:" % len(obj))
+        for x in sorted(content_hash(x) for x in obj):
+            h.update(x.encode())
+    elif isinstance(obj, datetime):
+        h.update(b"T" + obj.isoformat().encode() + b";")
+    elif isinstance(obj, (type, partial, types.FunctionType, types.BuiltinFunctionType, types.MethodType)):
+        h.update(b"U" + getattr(obj, "__module__", "").encode() + b"." + getattr(obj, "__qualname__", repr(obj)).encode() + b";")
+    elif isinstance(getattr(type(obj), "digest", None), property):
+        # Objects that provide their own digest are hashed using it
+        h.update(b"H" + obj.digest.encode() + b";")
+    elif hasattr(obj, "__dict__") or hasattr(obj, "__slots__"):
+        _hash_state(h, obj)
+    else:
+        try:
+            items = list(obj)
+        except TypeError:
+            raise Exception(f'Cannot compute a content hash for object of type "{type(obj)}"')
+        _hash_update(h, items)
+
+
+def _hash_state(h, obj, exclude=None) -> None:
+    """
+    Add the attributes of an object to a hash
+
+    :param h: A ``hashlib`` hash object that will be updated in-place
+    :param obj: An object with a ``__dict__`` or ``__slots__``
+    :param exclude: Optionally specify additional attribute names to skip
+
+    """
+
+    h.update(b"C" + type(obj).__qualname__.encode() + b":")
+    if hasattr(obj, "__dict__"):
+        state = obj.__dict__
+    else:
+        state = {k: getattr(obj, k, None) for k in obj.__slots__}
+    for k, v in state.items():
+        if k not in _HASH_EXCLUDE and not (exclude and k in exclude):
+            _hash_update(h, k)
+            _hash_update(h, v)
+
+
+def _state_digest(obj, exclude=None) -> str:
+    """
+    Return a digest of an object's attributes
+
+    This is used to implement the ``digest`` property on classes like :class:`TimeSeries` and
+    :class:`ParameterSet`. Nested objects that have their own ``digest`` contribute that digest.
+    The digest is always computed from the current contents, so it reflects in-place changes.
+
+    :param obj: An object with a ``__dict__`` or ``__slots__``
+    :param exclude: Optionally specify additional attribute names to skip
+    :return: A hexadecimal digest string
+
+    """
+
+    h = hashlib.sha256()
+    _hash_state(h, obj, exclude)
+    return h.hexdigest()
+
+
+def _freeze(obj, memo=None) -> None:
+    """
+    Make an object read-only
+
+    The data in numpy arrays and DataFrames is made read-only, and :class:`TimeSeries` instances
+    and classes derived from ``_ReadOnly`` are flagged so that they cannot be modified. Containers
+    and the attributes of ``_ReadOnly`` objects are traversed recursively, although the containers
+    themselves are not made read-only.
+
+    :param obj: The object to make read-only
+    :param memo: Set of IDs of objects that have already been visited
+
+    """
+
+    if memo is None:
+        memo = set()
+    if id(obj) in memo:
+        return
+    memo.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        obj.flags.writeable = False
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        for block in obj._mgr.blocks:
+            values = getattr(block.values, "_ndarray", block.values)  # Extension arrays such as strings store their data in ``_ndarray``
+            if isinstance(values, np.ndarray):
+                values.flags.writeable = False
+    elif isinstance(obj, TimeSeries):
+        obj._readonly = True
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            _freeze(v, memo)
+    elif isinstance(obj, (list, tuple, set)):
+        for v in obj:
+            _freeze(v, memo)
+    elif isinstance(obj, _ReadOnly):
+        for v in obj.__dict__.values():
+            _freeze(v, memo)
+        obj._readonly = True
+
+
+def content_hash(*objs) -> str:
+    """
+    Return a digest of the content of one or more objects
+
+    The digest is computed by recursively walking the objects and hashing their contents, so
+    two objects with the same values (e.g., a ``ParameterSet`` and a deep copy of it) have the
+    same digest, and the digest is stable across sessions. Metadata that does not affect the
+    content such as UIDs and creation/modification times is ignored.
+
+    Example usage:
+
+    >>> content_hash(P.settings, P.framework, P.parsets[0])
+
+    :param objs: Objects to hash. Supported types include scalars, strings, numpy arrays, pandas
+                 DataFrames, containers, and arbitrary objects with a ``__dict__`` or ``__slots__``
+    :return: A hexadecimal SHA-256 digest string
+
+    """
+
+    h = hashlib.sha256()
+    for obj in objs:
+        _hash_update(h, obj)
+    return h.hexdigest()
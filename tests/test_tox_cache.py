@@ -0,0 +1,277 @@
+# Test caching of simulation results
+
+import shutil
+import numpy as np
+import sciris as sc
+import pytest
+import atomica as at
+
+testdir = at.parent_dir()
+tmpdir = testdir / "temp"
+
+
+def test_content_hash():
+    P = at.demo("sir", do_run=False)
+    parset = P.parsets[0]
+
+    # Copies have the same content, even though their metadata differs
+    assert at.content_hash(parset) == at.content_hash(sc.dcp(parset))
+    assert at.content_hash(P.framework) == at.content_hash(sc.dcp(P.framework))
+
+    # Changing a value or a y-factor changes the hash
+    p2 = sc.dcp(parset)
+    p2.pars[0].ts[0].insert(2020, 1e6)
+    assert at.content_hash(parset) != at.content_hash(p2)
+
+    p2 = sc.dcp(parset)
+    p2.pars[0].y_factor[0] = 2
+    assert at.content_hash(parset) != at.content_hash(p2)
+
+    assert at.content_hash(1) != at.content_hash("1")
+    assert at.content_hash(np.arange(3)) != at.content_hash(np.arange(4))
+
+
+def test_digests():
+    P = at.demo("tb", do_run=False)
+    parset = P.parsets[0]
+    progset = P.progsets[0]
+
+    # Digests depend only on content, not on names or metadata
+    p2 = parset.copy("other")
+    assert p2.digest == parset.digest
+    p2.pars["b_rate"].y_factor[0] = 2
+    assert p2.digest != parset.digest
+    p2.pars["b_rate"].y_factor[0] = 1
+    assert p2.digest == parset.digest
+    p2.pars["b_rate"].ts[0].insert(2030, 1)
+    assert p2.digest != parset.digest
+
+    ps2 = progset.copy("other")
+    assert ps2.digest == progset.digest
+    ps2.programs[0].unit_cost.insert(2030, 1)
+    assert ps2.programs[0].digest != progset.programs[0].digest
+    assert ps2.digest != progset.digest
+
+    ps2 = progset.copy()
+    ps2.covouts[0].baseline += 1
+    assert ps2.covouts[0].digest != progset.covouts[0].digest
+    assert ps2.digest != progset.digest
+
+    instructions = at.ProgramInstructions(start_year=2018, alloc=progset)
+    assert instructions.digest == at.ProgramInstructions(start_year=2018, alloc=progset).digest
+    assert instructions.scale_alloc(2).digest != instructions.digest
+
+
+def test_interpolation_cache():
+    ts = at.TimeSeries([2018, 2020], [1, 3])
+    tvec = np.arange(2015, 2025, 0.25)
+    expected = np.interp(tvec, [2018, 2020], [1, 3])
+
+    # Repeated interpolation reuses the cached values, and modifying the output does not affect the cache
+    vals = ts.interpolate(tvec)
+    vals[:] = 0
+    assert np.array_equal(ts.interpolate(tvec), expected)
+    assert len(ts._cache[1]) == 1
+    assert not np.array_equal(ts.interpolate(tvec, method="previous"), expected)
+    assert len(ts._cache[1]) == 2
+
+    # Inserting or removing values clears the cache
+    ts.insert(2022, 5)
+    assert ts.interpolate(tvec)[tvec == 2022] == 5
+    ts.remove(2022)
+    assert np.array_equal(ts.interpolate(tvec), expected)
+    ts.vals = [2, 3]
+    assert ts.interpolate(2018)[0] == 2
+
+    # Modifying the values in-place is detected
+    ts.vals[0] = 4
+    assert ts.interpolate(2018)[0] == 4
+    ts.t[:] = [2017, 2020]
+    assert ts.interpolate(2017)[0] == 4
+    ts.t[:] = [2018, 2020]
+    ts.vals[0] = 2
+
+    # Copies do not share the cache
+    ts2 = sc.dcp(ts)
+    assert ts2._cache is None
+    ts2.vals[0] = 10
+    assert ts.interpolate(2018)[0] == 2
+    assert ts2.interpolate(2018)[0] == 10
+    ts2 = ts.copy()
+    ts2.insert(2019, 10)
+    assert ts.interpolate(2019)[0] == 2.5
+    assert ts2.interpolate(2019)[0] == 10
+    assert at.content_hash(ts) == at.content_hash(at.TimeSeries([2018, 2020], [2, 3]))
+
+    # Changing the parameters after running a model is reflected in subsequent runs
+    P = at.demo("sir", do_run=False)
+    r1 = P.run_sim()
+    P.parsets[0].pars["transpercontact"].ts[0].insert(2020, 0.5)
+    r2 = P.run_sim()
+    assert not np.array_equal(r1.get_variable("inf")[0].vals, r2.get_variable("inf")[0].vals)
+
+    # Including changes made in-place
+    ts = P.parsets[0].pars["transpercontact"].ts[0]
+    ts.vals[:] = [2 * x for x in ts.vals]
+    r3 = P.run_sim()
+    r4 = P.run_sim(parset=sc.dcp(P.parsets[0]))
+    assert not np.array_equal(r2.get_variable("inf")[0].vals, r3.get_variable("inf")[0].vals)
+    assert np.array_equal(r3.get_variable("inf")[0].vals, r4.get_variable("inf")[0].vals)
+
+
+def test_result_cache():
+    P = at.demo("tb", do_run=False)
+    instructions = at.ProgramInstructions(start_year=2018)
+    cache = at.ResultCache(max_size=2)
+
+    r1 = P.run_sim(cache=cache, result_name="r1")
+    r2 = P.run_sim(cache=cache, result_name="r2")
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+    assert r1.name == "r1" and r2.name == "r2"
+    assert r1.uid != r2.uid
+    assert np.array_equal(r1.get_variable("alive")[0].vals, r2.get_variable("alive")[0].vals)
+
+    # Modifying the parset results in a cache miss
+    parset = sc.dcp(P.parsets[0])
+    parset.pars["b_rate"].meta_y_factor = 2
+    r3 = P.run_sim(parset=parset, cache=cache)
+    assert cache.misses == 2
+    assert not np.array_equal(r1.get_variable("alive")[0].vals, r3.get_variable("alive")[0].vals)
+
+    # Running with programs is cached separately, and evicts the least recently used result
+    P.run_sim(progset="default", progset_instructions=instructions, cache=cache)
+    assert len(cache) == 2
+    P.run_sim(cache=cache)
+    assert cache.misses == 4
+
+
+def test_result_cache_disk():
+    P = at.demo("sir", do_run=False)
+    path = tmpdir / "result_cache"
+    cache = at.ResultCache(path=path)
+    cache.clear(disk=True)
+    r1 = P.run_sim(cache=cache)
+    assert len(list(path.glob("*.res"))) == 1
+    assert not list(path.glob("*.tmp"))
+
+    # A new cache with the same path can retrieve results from disk
+    cache2 = at.ResultCache(path=path)
+    r2 = P.run_sim(cache=cache2)
+    assert cache2.disk_hits == 1
+    assert np.array_equal(r1.get_variable("sus")[0].vals, r2.get_variable("sus")[0].vals)
+    cache2.clear(disk=True)
+
+
+def test_framework_cache():
+    path = tmpdir / "workbook_cache"
+    at.set_workbook_cache(path)
+    try:
+        F1 = at.ProjectFramework(at.LIBRARY_PATH / "sir_framework.xlsx")
+        assert len(list(path.glob("*.pkl"))) >= 1
+        F2 = at.ProjectFramework(at.LIBRARY_PATH / "sir_framework.xlsx", name="cached")
+        assert F2.name == "cached"
+        assert F1.name != "cached"
+        assert F1.uid != F2.uid
+        F2.name = F1.name
+        assert at.content_hash(F1) == at.content_hash(F2)
+
+        # The cached framework can be used to run simulations and saved back to Excel
+        P = at.Project(framework=F2, databook=at.LIBRARY_PATH / "sir_databook.xlsx", do_run=False)
+        P.run_sim()
+        F2.save(tmpdir / "framework_cache_test.xlsx")
+    finally:
+        at.set_workbook_cache(None)
+
+
+def test_databook_cache():
+    path = tmpdir / "workbook_cache_databook"
+    shutil.rmtree(path, ignore_errors=True)
+    at.set_workbook_cache(path)
+    try:
+        P1 = at.Project(framework=at.LIBRARY_PATH / "tb_framework.xlsx", databook=at.LIBRARY_PATH / "tb_databook.xlsx", do_run=False)
+        P1.load_progbook(at.LIBRARY_PATH / "tb_progbook.xlsx")
+        P2 = at.Project(framework=at.LIBRARY_PATH / "tb_framework.xlsx", databook=at.LIBRARY_PATH / "tb_databook.xlsx", do_run=False)
+        P2.load_progbook(at.LIBRARY_PATH / "tb_progbook.xlsx")
+        assert at.content_hash(P1.data) == at.content_hash(P2.data)
+        assert P1.progsets[0].digest == P2.progsets[0].digest
+        assert P2.progsets[0].name == P1.progsets[0].name
+
+        # Loading the progbook against different data is not a cache hit. A cache hit would return the progset parsed
+        # against the original data, whereas parsing the progbook again detects the mismatched population label
+        n_cached = len(list(path.glob("*.pkl")))
+        data = sc.dcp(P1.data)
+        data.pops[0]["label"] = "Children"
+        with pytest.raises(at.InvalidProgramBook, match="mismatch between the populations"):
+            at.ProgramSet.from_spreadsheet(at.LIBRARY_PATH / "tb_progbook.xlsx", framework=P1.framework, data=data)
+
+        # Data changes that do not affect the progbook are parsed again and stored as a new entry
+        data = sc.dcp(P1.data)
+        data.tdve["b_rate"].ts[0].insert(2000, 1.0)
+        progset = at.ProgramSet.from_spreadsheet(at.LIBRARY_PATH / "tb_progbook.xlsx", framework=P1.framework, data=data)
+        assert progset.digest == P1.progsets[0].digest
+        assert len(list(path.glob("*.pkl"))) == n_cached + 1
+
+        P2.data.save(tmpdir / "databook_cache_test.xlsx")
+        P2.progsets[0].save(tmpdir / "progbook_cache_test.xlsx")
+    finally:
+        at.set_workbook_cache(None)
+
+
+def test_shared_snapshots():
+    P = at.demo("tb", do_run=False)
+    instructions = at.ProgramInstructions(start_year=2018)
+    r1 = P.run_sim(progset="default", progset_instructions=instructions)
+    r2 = P.run_sim(progset="default", progset_instructions=instructions)
+
+    # Models run with the same inputs share one copy of them
+    assert r1.framework is r2.framework
+    assert r1.model.progset is r2.model.progset
+    assert r1.model.program_instructions is r2.model.program_instructions
+    assert r1.framework is not P.framework
+
+    # Modifying the inputs does not affect existing results
+    P.progsets[0].programs[0].unit_cost.insert(2018, 1e6)
+    r3 = P.run_sim(progset="default", progset_instructions=instructions)
+    assert r3.model.progset is not r1.model.progset
+    assert r1.model.progset.programs[0].unit_cost.get(2018) != 1e6
+    assert r3.model.progset.programs[0].unit_cost.get(2018) == 1e6
+
+    # Modifying values in-place also results in a new snapshot
+    spend_data = P.progsets[0].programs[0].spend_data
+    spend_data.vals[:] = [2 * x for x in spend_data.vals]
+    r4 = P.run_sim(progset="default", progset_instructions=instructions)
+    assert r4.model.progset is not r3.model.progset
+    assert r4.model.progset.programs[0].spend_data.vals == spend_data.vals
+    assert r3.model.progset.programs[0].spend_data.vals != spend_data.vals
+    prog = P.progsets[0].programs[0].name
+    assert not np.allclose(r4.get_coverage("capacity")[prog], r3.get_coverage("capacity")[prog])
+
+    # Shared snapshots are read-only, while copies can be modified
+    assert r1.framework.spreadsheet is None
+    assert P.framework.spreadsheet is not None
+    with pytest.raises(ValueError):
+        r1.framework.pars.at[r1.framework.pars.index[0], "default value"] = 1
+    with pytest.raises(AttributeError):
+        r1.model.progset.programs[0].unit_cost.insert(2018, 1)
+    with pytest.raises(AttributeError):
+        r1.model.program_instructions.start_year = 2020
+    progset = sc.dcp(r1.model.progset)
+    progset.programs[0].unit_cost.insert(2018, 1)
+    framework = sc.dcp(r1.framework)
+    framework.pars.at[framework.pars.index[0], "default value"] = 1
+
+    # Results saved together keep sharing their inputs
+    r6, r7 = sc.loadobj(sc.saveobj(tmpdir / "shared_results.obj", [r1, r2]))
+    assert r6.framework is r7.framework
+
+
+if __name__ == "__main__":
+    test_content_hash()
+    test_digests()
+    test_interpolation_cache()
+    test_result_cache()
+    test_result_cache_disk()
+    test_framework_cache()
+    test_databook_cache()
+    test_shared_snapshots()
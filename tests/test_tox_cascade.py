@@ -1,3 +1,4 @@
+import numpy as np
 import atomica as at
 from atomica import ProjectFramework
 import sciris as sc
@@ -170,6 +171,35 @@ def test_cascade_sir():
     at.plot_single_cascade_series(par_results, cascade="main", pops="adults", data=P.data)
 
 
+def test_cascade_vals():
+    # Cascade values computed directly from compartments should match PlotData
+    P = at.demo("tb")
+    result = P.results[0]
+    years = [2016.5, 2020, 2023]
+
+    _, cascade_dict, _ = at.sanitize_cascade(result.framework, "SP treatment")
+    for pops in [None, "0-4", ["0-4", "5-14"]]:
+        vals, t = at.get_cascade_vals(result, "SP treatment", pops=pops, year=years)
+        pops = at.sanitize_pops(pops, result, "default")
+        d = at.PlotData(result, outputs=cascade_dict, pops=pops).interpolate(years)
+        assert np.array_equal(t, years)
+        for stage in cascade_dict:
+            assert np.allclose(vals[stage], d[d.results[0], d.pops[0], stage].vals)
+
+    # Stages containing characteristics with denominators fall back to PlotData
+    vals, _ = at.get_cascade_vals(result, {"Alive": ["alive"], "Prevalence": ["ac_prev"]}, year=2020)
+    d = at.PlotData(result, outputs={"Alive": ["alive"], "Prevalence": ["ac_prev"]}, pops=[{"Entire population": [x.name for x in result.model.pops]}]).interpolate(2020)
+    assert np.allclose(vals["Prevalence"], d[d.results[0], "Entire population", "Prevalence"].vals)
+
+    # Multiple results and years can be evaluated together
+    result2 = P.run_sim(result_name="scen")
+    at.plot_multi_cascade([result, result2], cascade="SP treatment", year=years)
+    ens = at.CascadeEnsemble(P.framework, "SP treatment", years=years, pops="total")
+    ens.add([result, result2])
+    d = at.PlotData([result, result2], outputs=cascade_dict, pops="total").interpolate(years)
+    assert np.allclose(ens.samples[0]._stack(), d._stack())
+
+
 if __name__ == "__main__":
     test_cascade_validate()
     test_cascade_basic_tb()
@@ -178,3 +208,4 @@ if __name__ == "__main__":
     test_cascade_scen_udt()
     test_cascade_dynamic()
     test_cascade_sir()
+    test_cascade_vals()
@@ -3,9 +3,11 @@
 
 import atomica as at
 import numpy as np
+import pandas as pd
 from scipy import stats
 import matplotlib.pyplot as plt
 import sciris as sc
+import pytest
 
 
 def test_ensemble_cascade():
@@ -92,5 +94,152 @@ def test_ensemble_cascade():
     plt.title("Difference between doubled budget and default budget")
 
 
+def test_streaming_ensemble():
+    testdir = at.parent_dir()
+    P = at.Project(framework=testdir / "test_uncertainty_framework.xlsx", databook=testdir / "test_uncertainty_databook.xlsx")
+    results = [x[0] for x in P.run_sampled_sims(parset="default", n_samples=50)]
+
+    ensemble = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023])
+    ensemble.update(results)
+
+    # Streaming Ensembles accumulated separately can be merged. With only 50 samples, no compression takes place so
+    # the quantiles are exact
+    streaming = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023], streaming=True, compression=25)
+    streaming.update(results[:20])
+    other = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023], streaming=True, compression=25)
+    other.update(results[20:])
+    streaming.merge(other)
+    assert streaming.n_samples == 50
+    assert not streaming.samples
+    df1 = ensemble.summary_statistics(years=2020)
+    df2 = streaming.summary_statistics(years=2020)
+    assert np.allclose(df1["value"].values, df2["value"].values)
+    vals1, uncertainty1, _ = ensemble.get_vals()
+    vals2, uncertainty2, _ = streaming.get_vals()
+    for result in vals1:
+        for stage in vals1[result]:
+            assert np.allclose(vals1[result][stage], vals2[result][stage])
+            assert np.allclose(uncertainty1[result][stage], uncertainty2[result][stage])
+
+    # Once the sketches are compressed, the quantiles are approximate but memory does not grow
+    streaming = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023], streaming=True, compression=5)
+    streaming.update(results)
+    assert all(x.centroids.shape[0] <= 10 for x in streaming.statistics.values())
+    df2 = streaming.summary_statistics(years=2020)
+    assert np.allclose(df1.xs("mean", level="quantity")["value"], df2.xs("mean", level="quantity")["value"])
+    assert np.all(df2.xs("Q1", level="quantity")["value"].values <= df2.xs("Q3", level="quantity")["value"].values)
+
+    streaming.plot_multi_cascade(years=2020)
+    streaming.plot_series(style="ci", pops=streaming.pops[0])
+    streaming.plot_distribution(year=2020, outputs=streaming.outputs[-1], pops=streaming.pops[0])
+    with pytest.raises(Exception):
+        streaming.boxplot()
+    plt.close("all")
+
+
+def test_ensemble_statistics():
+    testdir = at.parent_dir()
+    P = at.Project(framework=testdir / "test_uncertainty_framework.xlsx", databook=testdir / "test_uncertainty_databook.xlsx")
+    results = [x[0] for x in P.run_sampled_sims(parset="default", n_samples=20)]
+
+    ensemble = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023])
+    ensemble.update(results[:10])
+
+    # Statistics are computed over all samples at once and match the individual samples
+    result, pop, output = ensemble.results[0], ensemble.pops[0], ensemble.outputs[-1]
+    samples = np.array([x[result, pop, output].vals for x in ensemble.samples])
+    assert np.allclose(ensemble._get_stat(result, pop, output, "mean"), samples.mean(axis=0))
+    assert np.allclose(ensemble._get_stat(result, pop, output, 0.25), np.quantile(samples, 0.25, axis=0))
+    assert np.allclose(ensemble._get_stat(result, pop, output, "std", 2021), np.std([np.interp(2021, [2018, 2020, 2023], x) for x in samples]))
+
+    df = ensemble.summary_statistics(years=[2020, 2023])
+    assert len(df) == 2 * len(ensemble.results) * len(ensemble.outputs) * len(ensemble.pops) * 6
+    assert np.isclose(df.loc[(2023, result, output, pop, "median"), "value"], np.median(samples[:, 2]))
+
+    # Adding samples discards the cached statistics
+    ensemble.update(results[10:])
+    samples = np.array([x[result, pop, output].vals for x in ensemble.samples])
+    assert np.allclose(ensemble._get_stat(result, pop, output, "max"), samples.max(axis=0))
+    df = ensemble.summary_statistics(years=2020)
+    assert np.isclose(df.loc[(2020, result, output, pop, "Q3"), "value"], np.quantile(samples[:, 1], 0.75))
+
+    # Replacing or modifying the list of samples also discards the cached statistics
+    ensemble.samples = ensemble.samples[1:] + ensemble.samples[:1]
+    assert np.allclose(ensemble._get_stat(result, pop, output, "mean"), samples.mean(axis=0))
+    ensemble.samples = [ensemble.samples[0]] * ensemble.n_samples
+    assert np.allclose(ensemble._get_stat(result, pop, output, "max"), samples[1])
+    ensemble.samples[0] = ensemble.samples.pop()
+    ensemble.samples.append(sc.dcp(ensemble.samples[0]))
+    ensemble.samples[-1][result, pop, output].vals = samples[0]
+    assert np.allclose(ensemble._get_stat(result, pop, output, "max"), np.maximum(samples[0], samples[1]))
+    ensemble2 = sc.loadstr(sc.dumpstr(ensemble))
+    assert ensemble2.n_samples == ensemble.n_samples
+
+
+def test_stored_ensemble():
+    testdir = at.parent_dir()
+    path = testdir / "temp" / "ensemble_store"
+    P = at.Project(framework=testdir / "test_uncertainty_framework.xlsx", databook=testdir / "test_uncertainty_databook.xlsx")
+    results = [x[0] for x in P.run_sampled_sims(parset="default", n_samples=6)]
+
+    ensemble = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023])
+    ensemble.update(results)
+
+    # Samples written to disk are retained, and can be added to by another Ensemble using the same path
+    stored = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023], path=path)
+    stored.run_sims(P, parset="default", n_samples=1)
+    stored.run_sims(P, parset="default", n_samples=0)
+    assert stored.n_samples == 0
+    stored.update(results[:4])
+    assert not stored.samples
+    stored = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023], path=path)
+    assert stored.n_samples == 4
+    stored.update(results[4:])
+    assert np.allclose(ensemble.summary_statistics(years=2020)["value"].values, stored.summary_statistics(years=2020)["value"].values)
+    assert isinstance(stored._sample_values()[1][0], np.memmap)
+
+    # Resuming only runs the missing samples
+    stored.run_sims(P, parset="default", n_samples=8, resume=True)
+    assert stored.n_samples == 8
+    assert np.allclose(stored._get_samples(stored.results[0], stored.pops[0], stored.outputs[0])[:6], ensemble._get_samples(ensemble.results[0], ensemble.pops[0], ensemble.outputs[0]))
+
+    # Stored samples are exported from the store
+    df = pd.read_csv(at.export_long(stored, testdir / "temp" / "ensemble_store_export.csv"))
+    assert len(df) == 8 * len(stored.store.keys) * len(stored.tvec)
+    assert set(df["sample"]) == set(range(8))
+    df_memory = pd.read_csv(at.export_long(ensemble, testdir / "temp" / "ensemble_export.csv"))
+    assert np.allclose(df[df["sample"] < 6]["value"].values, df_memory["value"].values)
+
+    stored.plot_series(style="samples", pops=stored.pops[0])
+    stored.boxplot(pops=stored.pops[0])
+    stored.plot_multi_cascade(years=2020)
+    plt.close("all")
+
+    # Parallel workers write their samples directly to the store
+    path = testdir / "temp" / "ensemble_store_parallel"
+    parallel = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023], path=path)
+    parallel.run_sims(P, parset="default", n_samples=6, parallel=True)
+    assert parallel.n_samples == 6
+    assert not parallel.samples
+    values = np.array(parallel.store.values())
+    assert len(np.unique(values.reshape(6, -1), axis=0)) == 6
+
+    # Resuming fills any rows that were not completed before sampling was interrupted, and then adds new samples
+    parallel.store._done[[2, 4]] = 0  # Simulate samples that were not completed
+    parallel.store._done.flush()
+    parallel = at.CascadeEnsemble(P.framework, "main", [2018, 2020, 2023], path=path)
+    assert parallel.n_samples == 4
+    parallel.run_sims(P, parset="default", n_samples=9, parallel=True, resume=True)
+    assert parallel.n_samples == 9
+    new_values = np.array(parallel.store.values())
+    assert np.array_equal(new_values[[0, 1, 3, 5]], values[[0, 1, 3, 5]])
+    assert len(np.unique(new_values.reshape(9, -1), axis=0)) == 9
+    result, pop, output = parallel.results[0], parallel.pops[0], parallel.outputs[-1]
+    assert np.allclose(parallel._get_stat(result, pop, output, "mean"), new_values[:, parallel.store.keys.index((result, pop, output))].mean(axis=0))
+
+
 if __name__ == "__main__":
     test_ensemble_cascade()
+    test_streaming_ensemble()
+    test_ensemble_statistics()
+    test_stored_ensemble()
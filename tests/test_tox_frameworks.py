@@ -4,6 +4,7 @@ import atomica as at
 import numpy as np
 import pytest
 import pandas as pd
+import pickle
 
 testdir = at.parent_dir()
 tmpdir = testdir / "temp"
@@ -80,6 +81,55 @@ def test_framework_comments():
     assert pd.isna(F1.characs.at["ch_propnewinf", "default value"])  # This will not be NaN if the #ignore was ignored
 
 
+def test_framework_lookup():
+    F = at.ProjectFramework(at.LIBRARY_PATH / "sir_framework.xlsx")
+
+    # Variables can be retrieved by code name or display name
+    spec, item_type = F.get_variable("sus")
+    assert item_type == "comp"
+    assert spec.name == "sus"
+    assert F.get_variable(spec["display name"])[0].name == "sus"
+    assert F.get_label("sus") == spec["display name"]
+    assert F.get_label(spec["display name"]) == spec["display name"]
+    with pytest.raises(at.NotFoundError):
+        F.get_variable("not_a_variable")
+
+    # Modifying the returned row does not affect the framework
+    spec["display name"] = "Modified"
+    assert F.get_variable("sus")[0]["display name"] != "Modified"
+
+    # Assigning a new DataFrame updates the lookup
+    old_label = F.get_label("sus")
+    comps = F.comps.copy()
+    comps.at["sus", "display name"] = "Renamed compartment"
+    F.comps = comps
+    assert F.get_label("sus") == "Renamed compartment"
+    assert F.get_variable("Renamed compartment")[0].name == "sus"
+    with pytest.raises(at.NotFoundError):
+        F.get_variable(old_label)
+
+    # In-place edits are reflected in retrieved rows
+    F.get_variable("sus")
+    F.comps.at["sus", "is source"] = "y"
+    assert F.get_variable("sus")[0]["is source"] == "y"
+    F.comps.at["sus", "display name"] = "Edited compartment"
+    assert F.get_label("sus") == "Edited compartment"
+
+    # The lookup is not saved with the framework
+    assert "_lookup" in F.__dict__
+    assert "_lookup" not in pickle.loads(pickle.dumps(F)).__dict__
+
+
+def test_framework_lookup_shared():
+    # Looking up variables between runs does not prevent the framework snapshot from being shared
+    P = at.demo("sir", do_run=False)
+    r1 = P.run_sim()
+    P.framework.get_label("sus")
+    P.framework.get_variable("sus")
+    r2 = P.run_sim()
+    assert r1.model.framework is r2.model.framework
+
+
 if __name__ == "__main__":
 
     for fname in frameworks:
@@ -88,3 +138,5 @@ if __name__ == "__main__":
     test_framework_par_min_max()
     test_framework_single_char()
     test_framework_spaces()
+    test_framework_lookup()
+    test_framework_lookup_shared()
@@ -39,5 +39,32 @@ def test_migration():
     P.data.add_interaction("test_interaction", "test_interaction")
 
 
+def test_lazy_result_migration():
+    testdir = at.parent_dir()
+    tmpdir = testdir / "temp"
+
+    # Results are migrated when they are first used, rather than when the project is loaded
+    P = at.Project.load(testdir / "migration_test_with_result.prj")
+    result = P.results[0]
+    assert "_unmigrated_model" in result.__dict__
+    assert result.pop_names  # Stored metadata is available without migrating
+    assert "_unmigrated_model" in result.__dict__
+
+    # Accessing the model runs the result migrations, and then the deferred project migrations
+    assert result.model.pops[0].type == at.FrameworkSettings.DEFAULT_POP_TYPE
+    assert result.version == P.version
+    assert "_unmigrated_model" not in result.__dict__
+    assert "_deferred_migrations" not in result.__dict__
+    at.PlotData(result)
+
+    # Saving the project migrates any results that have not been used
+    P = at.Project.load(testdir / "migration_test_with_result.prj")
+    P.save(tmpdir / "migration_test_resave.prj")
+    P2 = at.Project.load(tmpdir / "migration_test_resave.prj")
+    assert "_unmigrated_model" not in P2.results[0].__dict__
+    at.PlotData(P2.results[0])
+
+
 if __name__ == "__main__":
     test_migration()
+    test_lazy_result_migration()
@@ -1,4 +1,6 @@
 # Test safe division in function_parser
+import os
+import shutil
 import pytest
 import atomica as at
 import numpy as np
@@ -16,3 +18,171 @@ def test_plot(n_cols, legend_mode, axis):
 
     for fig in figs:
         plt.close(fig)
+
+
+def test_plotdata_operations():
+    P = at.demo("sir", do_run=False)
+    r1 = P.run_sim(result_name="r1")
+    r2 = P.run_sim(result_name="r2")
+    d = at.PlotData([r1, r2], outputs=["sus", "inf", "foi"])
+    t = d.series[0].tvec.copy()
+    raw = {(s.result, s.pop, s.output): s.vals.copy() for s in d.series}
+
+    # Series are retrieved by name, including after renaming
+    assert d["r2", "adults", "inf"].output == "inf"
+    d["r2", "adults", "inf"].output = "renamed"
+    assert d["r2", "adults", "renamed"].result == "r2"
+    with pytest.raises(Exception):
+        d["r2", "adults", "inf"]
+    d["r2", "adults", "renamed"].output = "inf"
+
+    # All series are interpolated together
+    d2 = at.PlotData([r1, r2], outputs=["sus", "inf", "foi"]).interpolate([t[0], 2010.3, t[-1]])
+    for s in d2.series:
+        assert np.allclose(s.vals, np.interp([t[0], 2010.3, t[-1]], t, raw[s.result, s.pop, s.output]))
+    assert d2.series[0].vals[-1] == raw[d2.series[0].result, d2.series[0].pop, d2.series[0].output][-1]
+
+    d3 = at.PlotData([r1, r2], outputs=["sus", "foi"], accumulate="integrate")
+    for s in d3.series:
+        assert np.isclose(s.vals[-1], np.trapezoid(raw[s.result, s.pop, s.output], t))
+
+    # Arithmetic matches series by name
+    a = at.PlotData(r1, outputs=["sus", "inf"])
+    b = at.PlotData([r1, r2], outputs=["inf", "sus"])
+    c = b - a
+    assert list(c.results) == ["r1-r1", "r2-r1"]
+    assert np.allclose(c["r2-r1", "adults", "sus"].vals, r2.get_variable("sus", "adults")[0].vals - r1.get_variable("sus", "adults")[0].vals)
+    c = a / b
+    assert list(c.results) == ["r1/r1", "r1/r2"]
+    assert np.allclose(c["r1/r2", "adults", "inf"].vals, r1.get_variable("inf", "adults")[0].vals / r2.get_variable("inf", "adults")[0].vals)
+    assert c["r1/r2", "adults", "inf"].units == ""
+
+
+def test_plotdata_aggregation():
+    P = at.demo("tb", do_run=False)
+    res = P.run_sim()
+    pops = list(res.pop_names[:2])
+
+    def get(output, pop):
+        return res.get_variable(output, pop)[0].vals
+
+    # Output aggregations are computed alongside outputs with denominators
+    d = at.PlotData(res, outputs=["lt_prev", {"tot": ["sus", "vac"]}], pops=pops)
+    for pop in pops:
+        assert np.allclose(d[res.name, pop, "tot"].vals, get("sus", pop) + get("vac", pop))
+        assert np.allclose(d[res.name, pop, "lt_prev"].vals, get("lt_prev", pop))
+
+    d = at.PlotData(res, outputs={"avg": ["sus", "vac"]}, output_aggregation="average", pops=pops)
+    assert np.allclose(d[res.name, pops[0], "avg"].vals, (get("sus", pops[0]) + get("vac", pops[0])) / 2)
+
+    # Population aggregations sum, average, or weight by population size
+    d = at.PlotData(res, outputs=["sus"], pops=[{"both": pops}])
+    assert np.allclose(d[res.name, "both", "sus"].vals, get("sus", pops[0]) + get("sus", pops[1]))
+    d = at.PlotData(res, outputs=["sus"], pops=[{"both": pops}], pop_aggregation="average")
+    assert np.allclose(d[res.name, "both", "sus"].vals, (get("sus", pops[0]) + get("sus", pops[1])) / 2)
+    d = at.PlotData(res, outputs=["lt_prev"], pops=[{"both": pops}])
+    popsize = [res.model.get_pop(pop).popsize() for pop in pops]
+    expected = (get("lt_prev", pops[0]) * popsize[0] + get("lt_prev", pops[1]) * popsize[1]) / (popsize[0] + popsize[1])
+    assert np.allclose(d[res.name, "both", "lt_prev"].vals, expected)
+
+
+def test_function_outputs():
+    P = at.demo("tb", do_run=False)
+    res = P.run_sim()
+    pops = list(res.pop_names[:2])
+
+    # Function outputs are evaluated for all populations at once, and match the raw values
+    d = at.PlotData(res, outputs=[{"frac": "sus/alive"}, {"t2": "t*2"}], pops=pops)
+    for pop in pops:
+        expected = res.get_variable("sus", pop)[0].vals / res.get_variable("alive", pop)[0].vals
+        assert np.allclose(d[res.name, pop, "frac"].vals, expected)
+        assert np.allclose(d[res.name, pop, "t2"].vals, res.t * 2)
+
+    # Values are cached in the Result, and the cache is reset if the model changes
+    vals = res.evaluate_function("sus/alive", pops)
+    assert vals.shape == (2, len(res.t))
+    assert ("sus/alive", pops[0]) in res._function_cache
+    res.model.get_pop(pops[0]).get_variable("sus")[0].vals[:] = 0
+    assert np.array_equal(res.evaluate_function("sus/alive", pops), vals)
+    res.clear_cache()
+    assert np.all(res.evaluate_function("sus/alive", pops)[0] == 0)
+    res.compact()
+    assert "_function_cache" not in res.__dict__
+    assert np.all(at.PlotData(res, outputs={"frac": "sus/alive"}, pops=pops[0]).series[0].vals == 0)
+
+
+def test_time_aggregation():
+    P = at.demo("sir", do_run=False)
+    res = P.run_sim()
+    t = res.t
+    vals = res.get_variable("sus", "adults")[0].vals
+
+    # Bins that don't line up with the simulation time points are integrated using interpolated values
+    edges = [t[0], 2010.3, 2020.7]
+    d = at.PlotData(res, outputs="sus", pops="adults").time_aggregate(edges, "integrate", "linear")
+    for i in range(2):
+        t2 = np.concatenate([[edges[i]], t[(t > edges[i]) & (t < edges[i + 1])], [edges[i + 1]]])
+        assert np.isclose(d.series[0].vals[i], np.trapezoid(np.interp(t2, t, vals), t2))
+
+    d = at.PlotData(res, outputs="sus", pops="adults").time_aggregate(edges, "average", "previous")
+    for i in range(2):
+        t2 = np.concatenate([[edges[i]], t[(t > edges[i]) & (t < edges[i + 1])], [edges[i + 1]]])
+        v2 = vals[np.searchsorted(t, t2[:-1], side="right") - 1]
+        assert np.isclose(d.series[0].vals[i], np.sum(v2 * np.diff(t2)) / (edges[i + 1] - edges[i]))
+
+    # Bins outside the simulation, or containing missing values, are NaN
+    d = at.PlotData(res, outputs="sus", pops="adults")
+    d.series[0].vals[np.searchsorted(t, 2015)] = np.nan
+    d.time_aggregate([t[0] - 1, t[0], 2010, 2020, t[-1]], "integrate")
+    assert np.isnan(d.series[0].vals[0]) and np.isnan(d.series[0].vals[2])
+    assert np.all(np.isfinite(d.series[0].vals[[1, 3]]))
+
+
+def test_interpolate_nan():
+    from atomica.plotting import _interpolate_rows
+
+    # Values at the time points are returned exactly, even if a neighbouring value is NaN
+    xp = np.array([0.0, 1.0, 2.0, 3.0])
+    fp = np.array([[1.0, np.nan, 3.0, 4.0], [np.nan, 2.0, np.nan, 5.0], [1.0, 2.0, 3.0, np.nan]])
+    x = np.array([-1, 0, 0.5, 1, 1.5, 2, 2.5, 3, 4])
+    expected = np.array([np.interp(x, xp, row, left=np.nan, right=np.nan) for row in fp])
+    assert np.array_equal(_interpolate_rows(x, xp, fp), expected, equal_nan=True)
+
+    # Missing values in PlotData are only propagated to the adjacent intervals
+    P = at.demo("sir", do_run=False)
+    res = P.run_sim()
+    d = at.PlotData(res, outputs=["sus", "inf"], pops="adults")
+    d.series[0].vals[10] = np.nan
+    t = d.series[0].tvec
+    new_t = np.concatenate([t[8:13], [t[9] + 0.1]])
+    expected = [np.interp(new_t, t, s.vals) for s in d.series]
+    d.interpolate(new_t)
+    for s, vals in zip(d.series, expected):
+        assert np.array_equal(s.vals, vals, equal_nan=True)
+
+
+def test_plot_batch():
+    P = at.demo("sir")
+    result = P.results[0]
+    path = at.parent_dir() / "temp" / "plot_batch"
+    specs = [{"plotdata": at.PlotData(result, outputs=["sus", "inf"], pops=pop.name), "prefix": pop.name + "_", "legend_mode": "separate"} for pop in result.model.pops]
+    specs.append({"plotdata": at.PlotData(result, outputs="sus", t_bins=5), "plot_function": "bars", "fnames": "sus_bars"})
+
+    fnames = at.plot_batch(specs, path=path, parallel=False)
+    assert len(fnames) == len(specs)
+    assert len(fnames[0]) == 2  # The figure and its legend
+    assert fnames[-1] == [str(path / "sus_bars.png")]
+    for fname in sum(fnames, []):
+        assert (path / fname).exists()
+
+    # In parallel, figures with the same name are not overwritten, and a plot that fails does not prevent the others from being saved
+    path = path / "parallel"
+    shutil.rmtree(path, ignore_errors=True)
+    specs = [{"plotdata": at.PlotData(result, outputs=output, t_bins=5), "plot_function": "bars"} for output in ["sus", "inf"]]
+    specs.append({"plotdata": specs[0]["plotdata"], "axis": "invalid"})
+    fnames = at.plot_batch(specs, path=path, parallel=True)
+    assert fnames == [[str(path / "bars.png")], [str(path / "bars_1.png")], []]
+    assert sorted(os.listdir(path)) == ["bars.png", "bars_1.png"]
+
+    with pytest.raises(Exception):
+        at.plot_batch([{"plotdata": specs[0]["plotdata"], "plot_function": "pie"}], path=path, parallel=False)
@@ -36,5 +36,208 @@ def test_export():
     P.results["progset1"].export_raw(tmpdir / "export_raw_progset.xlsx")
 
 
+def test_buffer():
+    P = at.demo("tb", do_run=False)
+    res = P.run_sim()
+    ref = sc.dcp(res)
+
+    # Consolidating the model does not change any values
+    buffer = res.model.consolidate()
+    assert buffer.shape[1] == res.t.size
+    assert res.model.consolidate() is buffer
+    alive = res.get_variable("alive")[0]
+    assert np.array_equal(alive.vals, ref.get_variable("alive")[0].vals)
+    assert np.array_equal(res.get_variable("b_rate")[0].vals, ref.get_variable("b_rate")[0].vals)
+
+    # The buffer is retained when the model is copied
+    res2 = sc.dcp(res)
+    assert res2.model._buffer is not None
+    assert np.array_equal(res2.get_variable("lt_inf")[1].vals, ref.get_variable("lt_inf")[1].vals)
+
+    # Memory-mapped results can be plotted and pickled without copying the values
+    fname = res.model.save_buffer(tmpdir / "test_buffer")
+    ref.model.load_buffer(fname)
+    assert isinstance(ref.model._buffer, np.memmap)
+    with at.buffer_references():
+        s = sc.dumpstr(ref)
+    res3 = sc.loadstr(s)
+    assert isinstance(res3.model._buffer, np.memmap)
+
+    # By default, pickled models store their values so they do not depend on the file
+    res4 = sc.loadstr(sc.dumpstr(ref))
+    assert not isinstance(res4.model._buffer, np.memmap)
+    assert isinstance(ref.model._buffer, np.memmap)
+    assert np.array_equal(res4.get_variable("alive")[0].vals, alive.vals)
+    d1 = at.PlotData(res, outputs=["alive", {"ratio": "lt_inf/alive"}])
+    d2 = at.PlotData(res3, outputs=["alive", {"ratio": "lt_inf/alive"}])
+    for s1, s2 in zip(d1.series, d2.series):
+        assert np.array_equal(s1.vals, s2.vals)
+
+    # The buffer must match the model
+    np.save(tmpdir / "test_buffer_invalid.npy", buffer[:-1])
+    with pytest.raises(at.ModelError):
+        res.model.load_buffer(tmpdir / "test_buffer_invalid.npy")
+
+
+def test_record():
+    P = at.demo("tb", do_run=False)
+    full = P.run_sim()
+    record = at.RecordSpec(outputs=["alive", "b_rate", "pd_div:flow", {"prev": "ac_inf/alive"}], pops=["0-4", "15-64"])
+    res = P.run_sim(record=record)
+
+    # Recorded outputs are identical to the full result
+    for output in ["alive", "b_rate", "pd_div:flow", {"prev": "ac_inf/alive"}]:
+        d1 = at.PlotData(full, outputs=output, pops=["0-4", "15-64"])
+        d2 = at.PlotData(res, outputs=output, pops=["0-4", "15-64"])
+        for s1, s2 in zip(d1.series, d2.series):
+            assert np.allclose(s1.vals, s2.vals)
+
+    # Population aggregations use the stored population sizes
+    d1 = at.PlotData(full, outputs="b_rate", pops=[{"total": ["0-4", "15-64"]}], pop_aggregation="weighted")
+    d2 = at.PlotData(res, outputs="b_rate", pops=[{"total": ["0-4", "15-64"]}], pop_aggregation="weighted")
+    assert np.allclose(d1.series[0].vals, d2.series[0].vals)
+
+    # Other outputs and populations are discarded
+    assert res.get_variable("sus", "0-4")[0].vals is None
+    assert res.get_variable("alive", "5-14")[0].vals is None
+    with pytest.raises(Exception, match="partial results"):
+        at.PlotData(res, outputs="sus", pops="0-4")
+
+    # Decimated results keep every nth timestep
+    res = P.run_sim(record=at.RecordSpec(outputs="alive", stride=4))
+    assert np.array_equal(res.t, full.t[::4])
+    assert np.array_equal(res.get_variable("alive")[0].vals, full.get_variable("alive")[0].vals[::4])
+
+    with pytest.raises(at.NotFoundError):
+        P.run_sim(record=at.RecordSpec(outputs="not_an_output"))
+
+    # Program coverage can be computed from results with programs
+    instructions = at.ProgramInstructions(start_year=2018)
+    full = P.run_sim(progset="default", progset_instructions=instructions)
+    res = P.run_sim(progset="default", progset_instructions=instructions, record=at.RecordSpec(outputs="alive", pops="0-4"))
+    for quantity in ["fraction", "eligible", "number"]:
+        c1 = full.get_coverage(quantity)
+        c2 = res.get_coverage(quantity)
+        assert c1.keys() == c2.keys()
+        for prog in c1:
+            assert np.allclose(c1[prog], c2[prog], equal_nan=True)
+    d = at.PlotData.programs(res, quantity="coverage_fraction")
+    assert np.allclose(d.series[0].vals, at.PlotData.programs(full, quantity="coverage_fraction").series[0].vals, equal_nan=True)
+
+
+def test_downcast():
+    P = at.demo("tb", do_run=False)
+    full = P.run_sim()
+    res = P.run_sim(record=at.RecordSpec(dtype=np.float32))
+    assert res.get_variable("sus", "0-4")[0].vals.dtype == np.float32
+    assert res.get_variable("b_rate", "0-4")[0].vals.dtype == np.float32
+
+    # Plotting and exporting converts values back to double precision
+    d1 = at.PlotData(full, outputs=["alive", "b_rate", "pd_div:flow"])
+    d2 = at.PlotData(res, outputs=["alive", "b_rate", "pd_div:flow"])
+    for s1, s2 in zip(d1.series, d2.series):
+        assert s2.vals.dtype == np.float64
+        assert np.allclose(s1.vals, s2.vals, rtol=1e-6)
+    assert all(res.export_raw().dtypes == np.float64)
+
+    # Quantization retains the requested number of significant figures
+    full.model.consolidate()
+    full.model.downcast(sigfigs=3)
+    assert full.model._buffer.dtype == np.float32
+    vals = full.get_variable("sus", "0-4")[0].vals
+    assert np.allclose(vals, res.get_variable("sus", "0-4")[0].vals, rtol=1e-3)
+    assert np.sum(vals.view(np.uint32) & 0x3FF) == 0
+
+
+def test_export_long():
+    import pandas as pd
+
+    P = at.demo("sir", do_run=False)
+    res1 = P.run_sim(result_name="r1")
+    res2 = P.run_sim(result_name="r2")
+
+    # Rows are written in small chunks to exercise appending to the compressed file
+    fname = at.export_long([res1, res2], tmpdir / "export_long.csv.gz", chunksize=50)
+    df = pd.read_csv(fname)
+    assert list(df.columns) == ["result", "pop", "variable", "time", "value"]
+    assert set(df["result"]) == {"r1", "r2"}
+    d = df[(df["result"] == "r1") & (df["pop"] == "adults") & (df["variable"] == "sus")]
+    assert np.allclose(d["time"], res1.t)
+    assert np.allclose(d["value"], res1.get_variable("sus", "adults")[0].vals)
+
+    # Flow rates are annualized and summed over duplicate links
+    links = res1.get_variable("susdeath:flow", "adults")
+    assert len(links) > 1
+    d = df[(df["result"] == "r1") & (df["pop"] == "adults") & (df["variable"] == "susdeath:flow")]
+    assert np.allclose(d["value"], sum(link.vals for link in links) / res1.dt)
+
+    # Filter outputs and pops
+    fname = at.export_long(res1, tmpdir / "export_long.csv", outputs=["sus", "inf"], pops="adults")
+    df = pd.read_csv(fname)
+    assert set(df["variable"]) == {"sus", "inf"}
+    assert len(df) == 2 * len(res1.t)
+
+    # Ensembles include the sample index
+    ensemble = at.Ensemble(lambda x: at.PlotData(x, outputs=["sus", "inf"]))
+    ensemble.update([res1, res2])
+    df = pd.read_csv(at.export_long(ensemble, tmpdir / "export_long_ensemble.csv"))
+    assert list(df.columns) == ["sample", "result", "pop", "variable", "time", "value"]
+    assert set(df["sample"]) == {0, 1}
+
+    # Streaming Ensembles do not store the samples, so they cannot be exported
+    streaming = at.Ensemble(lambda x: at.PlotData(x, outputs=["sus", "inf"]), streaming=True)
+    streaming.update([res1, res2])
+    with pytest.raises(Exception, match="Streaming Ensembles"):
+        at.export_long(streaming, tmpdir / "export_long_streaming.csv")
+
+
+def test_compact():
+    P = at.demo("tb", do_run=False)
+    instructions = at.ProgramInstructions(start_year=2018)
+    res = P.run_sim(progset="default", progset_instructions=instructions, result_name="full")
+    compact = P.run_sim(progset="default", progset_instructions=instructions, result_name="compact").compact()
+    assert "model" not in compact.__dict__
+    assert compact.framework is compact._compact.framework  # The framework is shared rather than stored in the compact model
+
+    # Compact results work with the same functions as normal results
+    assert np.array_equal(res.get_variable("alive", "0-4")[0].vals, compact.get_variable("alive", "0-4")[0].vals)
+    d1 = at.PlotData(res, outputs=["alive", "b_rate", {"total": "sus+vac"}], pops="total")
+    d2 = at.PlotData(compact, outputs=["alive", "b_rate", {"total": "sus+vac"}], pops="total")
+    for s1, s2 in zip(d1.series, d2.series):
+        assert np.allclose(s1.vals, s2.vals)
+    cov1 = res.get_coverage("number")
+    cov2 = compact.get_coverage("number")
+    for prog in cov1:
+        assert np.allclose(cov1[prog], cov2[prog], equal_nan=True)
+    assert res.export_raw().equals(compact.export_raw())
+
+    # Compact results remain compact when copied or saved
+    compact2 = sc.loadobj(sc.saveobj(tmpdir / "compact.res", compact))
+    assert "_compact" in compact2.__dict__
+    assert np.array_equal(compact2.get_variable("alive", "0-4")[0].vals, compact.get_variable("alive", "0-4")[0].vals)
+
+    # The rebuilt model is read-only, so changes are not silently discarded when it is rebuilt
+    with pytest.raises(ValueError):
+        compact.get_variable("sus", "0-4")[0].vals[0] = 0
+    with pytest.raises(AttributeError):
+        compact.model.t = None
+    with pytest.raises(ValueError):
+        compact2.get_variable("sus", "0-4")[0].vals[0] = 0
+
+    # A copy of the model can be modified and assigned to the result
+    vals = compact.get_variable("sus", "0-4")[0].vals.copy()
+    compact.model = sc.dcp(compact.model)
+    assert "_compact" not in compact.__dict__
+    compact.get_variable("sus", "0-4")[0].vals[0] = 0
+    compact.model.t = compact.model.t.copy()
+    assert compact.get_variable("sus", "0-4")[0].vals[0] == 0
+    assert np.array_equal(compact.get_variable("sus", "0-4")[0].vals[1:], vals[1:])
+
+
 if __name__ == "__main__":
     test_export()
+    test_buffer()
+    test_record()
+    test_downcast()
+    test_export_long()
+    test_compact()
@@ -1,4 +1,8 @@
+import json
+import os
+import zipfile
 import numpy as np
+import pytest
 import atomica as at
 
 testdir = at.parent_dir()
@@ -13,5 +17,129 @@ def test_save():
     P2.run_sim()
 
 
+def test_save_container():
+
+    P = at.demo("sir")
+    P.run_sim(result_name="second", store_results=True)
+    fname = P.save(tmpdir / "test_project_container.prj", container=True)
+
+    # Results are not read from the container until their model is accessed
+    P2 = at.Project.load(fname)
+    assert list(P2.results.keys()) == list(P.results.keys())
+    assert all("_model_ref" in r.__dict__ for r in P2.results.values())
+    assert P2.results[0].name == P.results[0].name
+    assert "_model_ref" in P2.results[1].__dict__
+
+    for r1, r2 in zip(P.results.values(), P2.results.values()):
+        assert np.array_equal(r1.get_variable("sus")[0].vals, r2.get_variable("sus")[0].vals)
+        assert np.array_equal(r1.get_variable("foi")[0].vals, r2.get_variable("foi")[0].vals)
+    assert "_model_ref" not in P2.results[0].__dict__
+
+    # Saving back to the same file copies results that have not been loaded
+    P2 = at.Project.load(fname)
+    P2.results[0].get_variable("sus")
+    P2.make_parset("new")
+    P2.save(fname, container=True)
+    P3 = at.Project.load(fname)
+    assert "new" in P3.parsets
+    for r1, r2, r3 in zip(P.results.values(), P2.results.values(), P3.results.values()):
+        assert np.array_equal(r1.get_variable("sus")[0].vals, r2.get_variable("sus")[0].vals)
+        assert np.array_equal(r1.get_variable("sus")[0].vals, r3.get_variable("sus")[0].vals)
+
+    # Copies of lazily loaded results are complete
+    P3 = at.Project.load(fname)
+    r = P3.results[1].copy("copy")
+    assert np.array_equal(r.get_variable("sus")[0].vals, P.results[1].get_variable("sus")[0].vals)
+    P3.run_sim("new")
+
+    # Container projects can also be saved in the standard format
+    P3.save(tmpdir / "test_project_container_converted.prj")
+    P4 = at.Project.load(tmpdir / "test_project_container_converted.prj")
+    assert np.array_equal(P4.results[1].get_variable("sus")[0].vals, P.results[1].get_variable("sus")[0].vals)
+
+
+def test_save_incremental():
+
+    P = at.demo("sir")
+    fname = P.save(tmpdir / "test_project_incremental.prj", container=True)
+
+    # Saving an unchanged project only appends the manifest and project. Components are identified by a hash of their pickled
+    # content, which can differ between a newly created object and one that has been loaded, so this applies once it has been loaded
+    P2 = at.Project.load(fname)
+    P2.save(fname, incremental=True)
+    with zipfile.ZipFile(fname) as zf:
+        n_members = len(zf.namelist())
+    P2 = at.Project.load(fname)
+    P2.save(fname, incremental=True)
+    with zipfile.ZipFile(fname) as zf:
+        names = zf.namelist()
+    assert len(names) == n_members + 2
+
+    # New results and modified components are appended to the existing content
+    P2 = at.Project.load(fname)
+    P2.parsets[0].pars["transpercontact"].meta_y_factor = 2
+    P2.run_sim(result_name="new", store_results=True)
+    with zipfile.ZipFile(fname) as zf:
+        offsets = [(x.filename, x.header_offset, x.CRC) for x in zf.infolist()]
+    P2.save(fname, incremental=True)
+    assert not list(tmpdir.glob(os.path.basename(fname) + ".*.tmp"))
+    with zipfile.ZipFile(fname) as zf:
+        assert [(x.filename, x.header_offset, x.CRC) for x in zf.infolist()][: len(offsets)] == offsets
+    with zipfile.ZipFile(fname) as zf:
+        new_names = zf.namelist()
+        manifest = json.loads(zf.read("manifest.json"))
+    assert new_names[: len(names)] == names
+    assert new_names[-1] == "manifest.json"
+    assert sum(x.endswith("model.pkl") for x in new_names) == 2
+    assert sum(x.startswith("components/") for x in new_names) == sum(x.startswith("components/") for x in names) + 1
+
+    # The manifest records the components used by each result
+    for info in manifest["results"].values():
+        assert info["components"]
+        assert all(f"components/{digest}.pkl" in new_names for digest in info["components"])
+
+    # If saving is interrupted, the existing file is unchanged and the previously saved project can still be loaded
+    P2.run_sim(result_name="broken", store_results=True)
+    P2.results["broken"].model.unpicklable = lambda: None
+    with open(fname, "rb") as f:
+        saved = f.read()
+    with pytest.raises(Exception):
+        P2.save(fname, incremental=True)
+    with open(fname, "rb") as f:
+        assert f.read() == saved
+    assert not list(tmpdir.glob(os.path.basename(fname) + ".*.tmp"))
+    assert list(at.Project.load(fname).results.keys()) == [P.results[0].name, "new"]
+    P2.results.pop("broken")
+
+    P3 = at.Project.load(fname)
+    assert P3.parsets[0].pars["transpercontact"].meta_y_factor == 2
+    assert list(P3.results.keys()) == [P.results[0].name, "new"]
+    assert np.array_equal(P3.results[0].get_variable("sus")[0].vals, P.results[0].get_variable("sus")[0].vals)
+    assert np.array_equal(P3.results["new"].get_variable("sus")[0].vals, P2.results["new"].get_variable("sus")[0].vals)
+
+    # A full save removes items that are no longer used
+    P3.save(fname, container=True)
+    with zipfile.ZipFile(fname) as zf:
+        assert len(zf.namelist()) == len(set(zf.namelist()))
+        assert sum(x.startswith("components/") for x in zf.namelist()) < sum(x.startswith("components/") for x in new_names)
+    P4 = at.Project.load(fname)
+    assert np.array_equal(P4.results["new"].get_variable("sus")[0].vals, P2.results["new"].get_variable("sus")[0].vals)
+
+    # Incremental saves compact the container once most of it is no longer used
+    for i in range(1, 20):
+        P4.parsets[0].pars["transpercontact"].meta_y_factor = 1 + i / 10
+        P4.results["new"] = P4.run_sim(result_name="new")
+        P4.save(fname, incremental=True)
+        with zipfile.ZipFile(fname) as zf:
+            names = zf.namelist()
+        if len(names) == len(set(names)):
+            break
+    assert i > 1
+    assert len(names) == len(set(names))
+    P5 = at.Project.load(fname)
+    assert np.array_equal(P5.results["new"].get_variable("sus")[0].vals, P4.results["new"].get_variable("sus")[0].vals)
+
 if __name__ == "__main__":
     test_save()
+    test_save_container()
+    test_save_incremental()
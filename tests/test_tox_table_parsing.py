@@ -36,6 +36,35 @@ def test_table_parsing2():
     assert len(F.sheets["extra 4"][1]) == 1
 
 
+def test_read_tables():
+    import openpyxl
+    from atomica.excel import read_tables, cell_get_number, ValueCell
+
+    # Tables are read as lightweight cells that retain their coordinates for error messages
+    wb = openpyxl.load_workbook(at.LIBRARY_PATH / "sir_databook.xlsx", read_only=True, data_only=True)
+    tables, start_rows = read_tables(wb["Population Definitions"])
+    assert start_rows[0] == 1
+    cell = tables[0][1][0]
+    assert cell.coordinate == "A2"
+    assert cell.data_type == "s"
+
+    tables, start_rows = read_tables(wb["Parameters"])
+    for table, start_row in zip(tables, start_rows):
+        assert table[0][0].row == start_row
+
+    # The cells behave like openpyxl cells in the cell parsing functions
+    assert cell_get_number(ValueCell(2, 1, 1)) == 2.0
+    assert cell_get_number(ValueCell("-", 1, 1)) is None
+    assert ValueCell("#N/A", 1, 1).data_type == "e"
+    try:
+        cell_get_number(ValueCell("foo", 3, 28))
+    except Exception as e:
+        assert "AB3" in str(e)
+    else:
+        raise AssertionError("Expected an error for a non-numeric cell")
+
+
 if __name__ == "__main__":
     # test_table_parsing()
     test_table_parsing2()
+    test_read_tables()
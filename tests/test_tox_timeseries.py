@@ -90,9 +90,39 @@ def test_insert_sorting():
     assert a.vals == [4, 4, 2, 2.5, 4]
 
 
+def test_digest():
+    a = at.TimeSeries([1, 2], [1, 2], units="number")
+    b = a.copy()
+    d = a.digest
+    assert b.digest == d
+
+    # Modifying the TimeSeries invalidates the digest
+    a.insert(3, 3)
+    assert a.digest != d
+    a.remove(3)
+    assert a.digest == d
+    a.insert(2, 5)
+    assert a.digest != d
+    a.insert(2, 2)
+    a.assumption = 1
+    assert a.digest != d
+    a.assumption = None
+    a.units = "probability"
+    assert a.digest != d
+    a.units = "number"
+    assert a.digest == d
+
+    # The digest reflects in-place changes
+    a.vals[0] = 10
+    assert a.digest != d
+    a.vals[0] = 1
+    assert a.digest == d
+
+
 if __name__ == "__main__":
 
     test_constructor()
     test_printing()
     test_equality()
     test_insert_sorting()
+    test_digest()